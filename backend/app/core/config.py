@@ -16,11 +16,27 @@ class Settings(BaseSettings):
 
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
+    CARDS_CACHE_TTL: int = 300  # seconds; safety net behind write-through invalidation
+    IDEMPOTENCY_TTL: int = 86400  # seconds a stored response can be replayed
+    SETTLEMENT_PREVIEW_CACHE_TTL: int = 600  # seconds; safety net behind invalidation
+
+    # Commission rates / goals snapshot
+    RATES_REFRESH_SECONDS: int = 60  # how often a worker checks rate_version
+
+    # Card affinity rebalance
+    AFFINITY_CARD_CAP: int = 0  # max cards per collector; 0 = use collector.receipt_limit
+    AFFINITY_STICKINESS: float = 0.15  # distance discount for a card's current holder
 
     # JWT
     JWT_PRIVATE_KEY_PATH: str = "keys/private.pem"
     JWT_PUBLIC_KEY_PATH: str = "keys/public.pem"
     JWT_ALGORITHM: str = "RS256"
+    JWT_PUBLIC_KEYS_DIR: str = ""  # extra *.pem public keys still accepted (rotation)
+    JWT_KEYS_RELOAD_SECONDS: int = 30  # how often key files are checked for changes
+    JWT_KEYS_FORCE_RELOAD_SECONDS: int = 5  # min gap between re-checks triggered by an unknown kid
+    PASSWORD_HASH_WORKERS: int = 2  # Argon2 threads per process (64 MiB each while hashing)
+    PASSWORD_HASH_QUEUE: int = 16  # logins waiting for a worker before answering 503
+    PERMISSIONS_REFRESH_SECONDS: int = 5  # how often a worker checks permission_version
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS_WEB: int = 7
     REFRESH_TOKEN_EXPIRE_DAYS_MOBILE: int = 30
@@ -29,6 +45,10 @@ class Settings(BaseSettings):
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
 
+    # Exports / background reports
+    EXPORT_DIR: str = "exports"
+    REPORT_JOB_TTL: int = 86400  # seconds a finished report can be downloaded
+
     # Rate Limiting
     LOGIN_RATE_LIMIT_USER: int = 5
     LOGIN_RATE_LIMIT_IP: int = 10
@@ -47,10 +47,31 @@ class ValidationError(AppException):
         )
 
 
+class ServiceUnavailableError(AppException):
+    def __init__(self, detail: str = "Servicio saturado, intenta de nuevo", retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            code="service_unavailable",
+        )
+        self.headers = {"Retry-After": str(retry_after)}
+
+
+class TooManyRequestsError(AppException):
+    def __init__(self, detail: str, retry_after: int, code: str = "rate_limited"):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            code=code,
+        )
+        self.headers = {"Retry-After": str(retry_after)}
+
+
 async def app_exception_handler(request: Request, exc: AppException) -> JSONResponse:
     return JSONResponse(
         status_code=exc.status_code,
         content={"error": exc.code, "detail": exc.detail},
+        headers=exc.headers,
     )
 
 
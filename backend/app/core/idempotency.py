@@ -0,0 +1,165 @@
+"""
+Idempotency-Key support for POSTs that mobile clients retry.
+
+Redis keeps `idempotency:{scope}:{key}` -> {"hash", "response"} for
+IDEMPOTENCY_TTL, so a retry is answered with one GET. The durable copy is a
+row in `idempotency_key`, inserted in the same transaction as the work it
+describes: a committed payment always has its response on record, and a
+replay still works after Redis loses the entry (one primary-key lookup).
+
+While the first request runs, the Redis entry holds an in-progress marker
+with a short TTL; a concurrent retry with the same key gets 409 instead of
+processing the payment twice. Without Redis there is no marker: both
+attempts run, and the primary key of `idempotency_key` decides. The loser's
+`stage` finds the winner's row, rolls its own transaction back and replays
+the winner's response.
+
+Rows older than IDEMPOTENCY_TTL are ignored by lookups, replaced in place
+when their key is reused, and deleted nightly (app.tasks.idempotency).
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from typing import Any, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.exceptions import ConflictError, ValidationError
+from app.models.idempotency import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "idempotency:"
+IN_PROGRESS = "__in_progress__"
+IN_PROGRESS_TTL = 30  # seconds; frees the key if the worker dies mid-request
+
+
+def request_hash(*parts: Any) -> str:
+    """Fingerprint of the request payload, to reject a key reused for another request."""
+    raw = json.dumps(parts, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, redis: Redis, session: AsyncSession):
+        self.redis = redis
+        self.session = session
+        self.ttl = get_settings().IDEMPOTENCY_TTL
+
+    @staticmethod
+    def _redis_key(scope: str, key: str) -> str:
+        return f"{KEY_PREFIX}{scope}:{key}"
+
+    @staticmethod
+    def _replay(stored_hash: str, response: dict, req_hash: str) -> dict:
+        if stored_hash != req_hash:
+            raise ValidationError("Idempotency-Key ya usada con otra solicitud")
+        return response
+
+    async def begin(self, scope: str, key: str, req_hash: str) -> Optional[dict]:
+        """
+        Stored response to replay, or None once the key is reserved for
+        this request (the caller then processes it and calls `stage` +
+        `publish`, or `release` on failure).
+        """
+        redis_key = self._redis_key(scope, key)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(redis_key, IN_PROGRESS, nx=True, ex=IN_PROGRESS_TTL)
+                pipe.get(redis_key)
+                reserved, current = await pipe.execute()
+        except RedisError:
+            logger.warning("Redis no disponible; Idempotency-Key %s desde BD", key)
+            reserved, current = True, None
+
+        if not reserved:
+            if current == IN_PROGRESS:
+                raise ConflictError("Solicitud en proceso; reintente en unos segundos")
+            if current is not None:
+                entry = json.loads(current)
+                return self._replay(entry["hash"], entry["response"], req_hash)
+
+        # Redis had nothing (restart, eviction): the Postgres copy decides
+        return await self.committed(scope, key, req_hash)
+
+    async def committed(self, scope: str, key: str, req_hash: str) -> Optional[dict]:
+        """Response committed under the key within the TTL (replayed), or None."""
+        result = await self.session.execute(
+            select(IdempotencyKey.request_hash, IdempotencyKey.response)
+            .where(IdempotencyKey.scope == scope)
+            .where(IdempotencyKey.key == key)
+            .where(IdempotencyKey.created_at > func.now() - timedelta(seconds=self.ttl))
+        )
+        row = result.first()
+        if row is None:
+            return None
+
+        # Backfill Redis (replacing any in-progress marker) before replaying
+        await self.publish(scope, key, row.request_hash, row.response)
+        return self._replay(row.request_hash, row.response, req_hash)
+
+    async def stage(self, scope: str, key: str, req_hash: str, response: dict) -> Optional[dict]:
+        """
+        Record the response in the caller's transaction (commits with the
+        work). An expired row under the same key is replaced.
+
+        Returns None once recorded. If another request committed the key
+        first (possible only while Redis is down), the caller's transaction
+        is rolled back so its work is discarded, and the winner's response
+        is returned to replay instead.
+        """
+        stmt = pg_insert(IdempotencyKey).values(
+            scope=scope, key=key, request_hash=req_hash, response=response,
+        )
+        table = IdempotencyKey.__table__
+        result = await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[table.c.scope, table.c.key],
+                set_={
+                    "request_hash": stmt.excluded.request_hash,
+                    "response": stmt.excluded.response,
+                    "created_at": func.now(),
+                },
+                where=table.c.created_at <= func.now() - timedelta(seconds=self.ttl),
+            ).returning(table.c.key)
+        )
+        if result.first() is not None:
+            return None
+
+        await self.session.rollback()
+        logger.warning("Idempotency-Key %s ya registrada por otra solicitud; se reenvía", key)
+        replay = await self.committed(scope, key, req_hash)
+        if replay is None:
+            raise ConflictError("Solicitud en proceso; reintente en unos segundos")
+        return replay
+
+    async def publish(self, scope: str, key: str, req_hash: str, response: dict) -> None:
+        """Cache the committed response in Redis for cheap replays."""
+        payload = json.dumps({"hash": req_hash, "response": response}, default=str)
+        try:
+            await self.redis.set(self._redis_key(scope, key), payload, ex=self.ttl)
+        except RedisError:
+            pass
+
+    async def release(self, scope: str, key: str) -> None:
+        """Drop the in-progress marker after a failed attempt so it can be retried."""
+        try:
+            await self.redis.delete(self._redis_key(scope, key))
+        except RedisError:
+            pass
+
+
+async def purge_expired(session: AsyncSession, ttl: Optional[int] = None) -> int:
+    """Delete rows older than the TTL; returns how many were removed."""
+    ttl = ttl if ttl is not None else get_settings().IDEMPOTENCY_TTL
+    result = await session.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.created_at <= func.now() - timedelta(seconds=ttl))
+    )
+    return result.rowcount
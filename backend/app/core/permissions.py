@@ -1,6 +1,142 @@
-from functools import wraps
+"""
+Permission checks against an in-memory role → permission index.
+
+The `role`, `permission` and `role_permission` tables (plus each user's
+`app_user.role_id`) are compiled into a PermissionIndex: per role, the set
+of exact permissions, the set of modules granted with "module.*", and
+whether it has "*". A check is a couple of set lookups; the JWT only
+carries the user id.
+
+The index is stamped with `permission_version`, a row that triggers bump on
+any change to those tables (migration 016). Each process checks the version
+at most every PERMISSIONS_REFRESH_SECONDS, with one primary-key read on the
+request's own session, and rebuilds the index only when it changed. Roles
+are edited outside the API, so that check is the only invalidation: a
+change takes effect within PERMISSIONS_REFRESH_SECONDS.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Mapping, Optional
+
 from fastapi import Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.database import get_db
 from app.core.dependencies import get_current_user
+from app.models.user import AppUser, Permission, PermissionVersion, RolePermission
+
+WILDCARD = "*"
+
+
+@dataclass(frozen=True)
+class RoleGrants:
+    exact: frozenset
+    modules: frozenset  # modules granted as "module.*"
+    everything: bool = False
+
+    def allows(self, permission: str, module: str) -> bool:
+        return self.everything or permission in self.exact or module in self.modules
+
+
+NO_GRANTS = RoleGrants(exact=frozenset(), modules=frozenset())
+
+
+@dataclass(frozen=True)
+class PermissionIndex:
+    version: int
+    loaded_at: datetime
+    roles: Mapping[int, RoleGrants]
+    role_by_user: Mapping[int, int]
+
+    def grants_for(self, user_id: int) -> RoleGrants:
+        role_id = self.role_by_user.get(user_id)
+        return self.roles.get(role_id, NO_GRANTS) if role_id is not None else NO_GRANTS
+
+
+async def load_index(session: AsyncSession, version: int) -> PermissionIndex:
+    """Compile the index (one query for grants, one for user roles)."""
+    grants = (await session.execute(
+        select(RolePermission.role_id, Permission.name)
+        .join(Permission, RolePermission.permission_id == Permission.id)
+    )).all()
+    users = (await session.execute(
+        select(AppUser.id, AppUser.role_id).where(AppUser.role_id.is_not(None))
+    )).all()
+
+    by_role: dict[int, tuple[set, set, bool]] = {}
+    for role_id, name in grants:
+        exact, modules, everything = by_role.setdefault(role_id, (set(), set(), False))
+        if name == WILDCARD:
+            by_role[role_id] = (exact, modules, True)
+        elif name.endswith(".*"):
+            modules.add(name[:-2])
+        else:
+            exact.add(name)
+
+    return PermissionIndex(
+        version=version,
+        loaded_at=datetime.utcnow(),
+        roles=MappingProxyType({
+            role_id: RoleGrants(frozenset(exact), frozenset(modules), everything)
+            for role_id, (exact, modules, everything) in by_role.items()
+        }),
+        role_by_user=MappingProxyType(dict(users)),
+    )
+
+
+class PermissionProvider:
+    """Index shared by the process; rebuilt when permission_version changes."""
+
+    def __init__(self, refresh_seconds: Optional[float] = None):
+        self.refresh_seconds = refresh_seconds
+        self._index: Optional[PermissionIndex] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self.reloads = 0
+
+    def _refresh_seconds(self) -> float:
+        if self.refresh_seconds is None:
+            self.refresh_seconds = get_settings().PERMISSIONS_REFRESH_SECONDS
+        return self.refresh_seconds
+
+    def _fresh(self) -> bool:
+        return self._index is not None and time.monotonic() - self._checked_at < self._refresh_seconds()
+
+    async def get(self, session: AsyncSession) -> PermissionIndex:
+        if self._fresh():
+            return self._index
+
+        async with self._lock:
+            # Another request may have checked while we waited
+            if self._fresh():
+                return self._index
+            version = await session.scalar(
+                select(PermissionVersion.version).where(PermissionVersion.id == 1)
+            ) or 0
+            if self._index is None or self._index.version != version:
+                self._index = await load_index(session, version)
+                self.reloads += 1
+            self._checked_at = time.monotonic()
+            return self._index
+
+    def stats(self) -> dict:
+        index = self._index
+        return {
+            "version": index.version if index else None,
+            "loaded_at": index.loaded_at if index else None,
+            "roles": len(index.roles) if index else 0,
+            "reloads": self.reloads,
+            "refresh_seconds": self._refresh_seconds(),
+        }
+
+
+# One per process
+permission_provider = PermissionProvider()
 
 
 def require_permission(permission: str):
@@ -8,22 +144,15 @@ def require_permission(permission: str):
 
     Usage: current_user = Depends(require_permission("payments.edit"))
     """
+    # Resolved once per route, not per request
+    module = permission.split(".")[0]
+
     async def _check_permission(
         current_user: dict = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db),
     ) -> dict:
-        user_permissions: list[str] = current_user.get("permissions", [])
-
-        # Admin wildcard
-        if "*" in user_permissions:
-            return current_user
-
-        # Check exact match
-        if permission in user_permissions:
-            return current_user
-
-        # Check module wildcard (e.g., "payments.*" matches "payments.edit")
-        module = permission.split(".")[0]
-        if f"{module}.*" in user_permissions:
+        index = await permission_provider.get(db)
+        if index.grants_for(int(current_user["sub"])).allows(permission, module):
             return current_user
 
         raise HTTPException(
@@ -0,0 +1,18 @@
+from functools import lru_cache
+
+from redis.asyncio import Redis
+
+from app.core.config import get_settings
+
+
+@lru_cache
+def get_redis() -> Redis:
+    """Shared async Redis client (connection pool per process)."""
+    settings = get_settings()
+    return Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+async def close_redis() -> None:
+    if get_redis.cache_info().currsize:
+        await get_redis().aclose()
+        get_redis.cache_clear()
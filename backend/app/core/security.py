@@ -1,14 +1,26 @@
+import asyncio
+import glob
 import hashlib
+import logging
+import os
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 
 from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
-from jose import jwt
+from cryptography.hazmat.primitives import serialization
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
 from passlib.context import CryptContext
 
 from app.core.config import get_settings
+from app.core.exceptions import ServiceUnavailableError
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
 # Argon2id as primary, bcrypt as fallback for migrated passwords
@@ -35,6 +47,68 @@ def needs_rehash(hashed: str) -> bool:
     return ph.check_needs_rehash(hashed)
 
 
+class PasswordHashPool:
+    """
+    Runs Argon2 off the event loop, in a dedicated bounded thread pool
+    (argon2-cffi releases the GIL while hashing).
+
+    At most PASSWORD_HASH_WORKERS hashes run at once and at most
+    PASSWORD_HASH_QUEUE more wait for a worker. Past that, `run` raises
+    ServiceUnavailableError at once: a login burst gets fast 503s instead
+    of queueing behind 64 MiB hashes and holding memory.
+    """
+
+    def __init__(self):
+        self._executor: ThreadPoolExecutor | None = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="argon2"
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        # Only touched from the event loop thread, so a plain counter is enough
+        if self.pending >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE:
+            self.rejected += 1
+            raise ServiceUnavailableError("Demasiados inicios de sesión, intenta de nuevo")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": settings.PASSWORD_HASH_WORKERS,
+            "queue_limit": settings.PASSWORD_HASH_QUEUE,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hash_pool = PasswordHashPool()
+
+
+async def hash_password_async(password: str) -> str:
+    return await hash_pool.run(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await hash_pool.run(verify_password, password, hashed)
+
+
 def generate_refresh_token() -> tuple[str, str]:
     """Generate a UUID refresh token and its SHA-256 hash."""
     token = str(uuid.uuid4())
@@ -47,6 +121,131 @@ def hash_refresh_token(token: str) -> str:
     return hashlib.sha256(token.encode()).hexdigest()
 
 
+@dataclass(frozen=True)
+class _KeySet:
+    signing_kid: str
+    signing_key: Key
+    public_keys: dict[str, Key]
+    mtimes: tuple
+
+
+def _kid(public_key) -> str:
+    """Key id: SHA-256 of the DER public key (same for the private and public PEM)."""
+    der = public_key.public_bytes(
+        serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return hashlib.sha256(der).hexdigest()[:16]
+
+
+class JWTKeyStore:
+    """
+    Parsed JWT keys, loaded once and kept in memory.
+
+    Signs with JWT_PRIVATE_KEY_PATH and puts its `kid` in the header.
+    Verifies against JWT_PUBLIC_KEY_PATH plus every *.pem in
+    JWT_PUBLIC_KEYS_DIR, so tokens signed with a retired key stay valid
+    while its public key is kept there. Files are re-stat'ed at most every
+    JWT_KEYS_RELOAD_SECONDS and reparsed only when one changed.
+
+    A token with an unknown kid forces an early re-check (the key may have
+    just been rotated in), but at most once every
+    JWT_KEYS_FORCE_RELOAD_SECONDS: a flood of forged kids cannot turn every
+    request into a directory scan. If the kid is still unknown the token is
+    rejected.
+    """
+
+    def __init__(self):
+        self._keys: _KeySet | None = None
+        self._checked_at = 0.0
+        self._forced_at = float("-inf")
+        self._lock = threading.Lock()
+        self.forced_reloads = 0
+
+    def _paths(self) -> list[str]:
+        paths = [settings.JWT_PRIVATE_KEY_PATH, settings.JWT_PUBLIC_KEY_PATH]
+        if settings.JWT_PUBLIC_KEYS_DIR:
+            paths += sorted(glob.glob(os.path.join(settings.JWT_PUBLIC_KEYS_DIR, "*.pem")))
+        return paths
+
+    def _mtimes(self) -> tuple:
+        return tuple((path, os.stat(path).st_mtime_ns) for path in self._paths())
+
+    def _load(self, mtimes: tuple) -> _KeySet:
+        with open(settings.JWT_PRIVATE_KEY_PATH, "rb") as f:
+            private_pem = f.read()
+        private = serialization.load_pem_private_key(private_pem, password=None)
+
+        public_keys = {}
+        for path in self._paths()[1:]:
+            with open(path, "rb") as f:
+                pem = f.read()
+            kid = _kid(serialization.load_pem_public_key(pem))
+            public_keys[kid] = jwk.construct(pem, settings.JWT_ALGORITHM)
+
+        signing_kid = _kid(private.public_key())
+        if signing_kid not in public_keys:
+            public_keys[signing_kid] = jwk.construct(
+                private.public_key().public_bytes(
+                    serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+                ),
+                settings.JWT_ALGORITHM,
+            )
+        logger.info("Llaves JWT cargadas: firma %s, %d públicas", signing_kid, len(public_keys))
+        return _KeySet(
+            signing_kid=signing_kid,
+            signing_key=jwk.construct(private_pem, settings.JWT_ALGORITHM),
+            public_keys=public_keys,
+            mtimes=mtimes,
+        )
+
+    def _throttled(self, force: bool) -> bool:
+        return force and time.monotonic() - self._forced_at < settings.JWT_KEYS_FORCE_RELOAD_SECONDS
+
+    def get(self, force: bool = False) -> _KeySet:
+        keys = self._keys
+        if self._throttled(force):
+            force = False
+        if (
+            keys is not None and not force
+            and time.monotonic() - self._checked_at < settings.JWT_KEYS_RELOAD_SECONDS
+        ):
+            return keys
+
+        with self._lock:
+            if self._keys is not None and force:
+                # Another thread may have forced a check while we waited
+                if self._throttled(force):
+                    return self._keys
+                self._forced_at = time.monotonic()
+                self.forced_reloads += 1
+            mtimes = self._mtimes()
+            if self._keys is None or self._keys.mtimes != mtimes:
+                try:
+                    self._keys = self._load(mtimes)
+                except (OSError, ValueError):
+                    # A half-written key during rotation: keep serving the old set
+                    if self._keys is None:
+                        raise
+                    logger.exception("No se pudieron recargar las llaves JWT")
+            self._checked_at = time.monotonic()
+            return self._keys
+
+    def verification_keys(self, kid: str | None) -> list[Key]:
+        keys = self.get()
+        if kid is None:
+            # Tokens issued before kid was added
+            return list(keys.public_keys.values())
+        if kid not in keys.public_keys:
+            # Maybe rotated since the last check; throttled, see the class docstring
+            keys = self.get(force=True)
+        if kid not in keys.public_keys:
+            raise JWTError("Unknown key id")
+        return [keys.public_keys[kid]]
+
+
+jwt_keys = JWTKeyStore()
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (
@@ -54,15 +253,13 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     )
     to_encode.update({"exp": expire, "iat": datetime.now(timezone.utc)})
 
-    # Read private key
-    with open(settings.JWT_PRIVATE_KEY_PATH) as f:
-        private_key = f.read()
-
-    return jwt.encode(to_encode, private_key, algorithm=settings.JWT_ALGORITHM)
+    keys = jwt_keys.get()
+    return jwt.encode(
+        to_encode, keys.signing_key, algorithm=settings.JWT_ALGORITHM,
+        headers={"kid": keys.signing_kid},
+    )
 
 
 def decode_access_token(token: str) -> dict:
-    with open(settings.JWT_PUBLIC_KEY_PATH) as f:
-        public_key = f.read()
-
-    return jwt.decode(token, public_key, algorithms=[settings.JWT_ALGORITHM])
+    kid = jwt.get_unverified_header(token).get("kid")
+    return jwt.decode(token, jwt_keys.verification_keys(kid), algorithms=[settings.JWT_ALGORITHM])
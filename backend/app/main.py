@@ -6,6 +6,8 @@ from fastapi import FastAPI
 from app.core.config import get_settings
 from app.core.exceptions import AppException, app_exception_handler, unhandled_exception_handler
 from app.core.middleware import setup_middleware
+from app.core.redis import close_redis
+from app.core.security import hash_pool, jwt_keys
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -14,7 +16,13 @@ settings = get_settings()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Iniciando %s v%s", settings.APP_NAME, settings.APP_VERSION)
+    try:
+        jwt_keys.get()  # parse the keys once, before the first request
+    except OSError:
+        logger.warning("Llaves JWT no disponibles al iniciar; se reintentará por request")
     yield
+    hash_pool.shutdown()
+    await close_redis()
     logger.info("Deteniendo %s", settings.APP_NAME)
 
 
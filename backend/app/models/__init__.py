@@ -4,13 +4,15 @@ Models package — Export all models for easy imports.
 
 from .base import Base, TimestampMixin
 
-from .user import AppUser
+from .user import AppUser, DeviceSession, Role, Permission, RolePermission, PermissionVersion
+
+from .idempotency import IdempotencyKey
 
 from .client import Municipality, Address, Client
 
 from .policy import (
     Seller, Collector, Vehicle, Coverage,
-    Policy, Payment, Card,
+    Policy, Payment, Card, CollectionAssignment, CollectorDailyCounter,
     PolicyStatus, PaymentStatus, PaymentMethod,
     CardStatus, EntityStatus, SellerClass,
 )
@@ -26,16 +28,18 @@ from .employee import (
 
 from .settlement import (
     Settlement, SettlementDeduction, SettlementPayment,
-    EmployeeLoan, SettlementStatus, SettlementMethod,
+    EmployeeLoan, LoanInstallment, FuelLoad,
+    SettlementRate, CollectorGoal, RateVersion, SettlementStatus, SettlementMethod,
     DeductionType, LoanStatus,
 )
 
 __all__ = [
     "Base", "TimestampMixin",
-    "AppUser",
+    "AppUser", "DeviceSession", "Role", "Permission", "RolePermission", "PermissionVersion",
+    "IdempotencyKey",
     "Municipality", "Address", "Client",
     "Seller", "Collector", "Vehicle", "Coverage",
-    "Policy", "Payment", "Card",
+    "Policy", "Payment", "Card", "CollectionAssignment", "CollectorDailyCounter",
     "PolicyStatus", "PaymentStatus", "PaymentMethod",
     "CardStatus", "EntityStatus", "SellerClass",
     "Employee", "EmployeeRole", "SellerProfile", "CollectorProfile",
@@ -44,6 +48,7 @@ __all__ = [
     "DepartmentType", "RoleLevelType",
     "GenderType", "SellerClassType",
     "Settlement", "SettlementDeduction", "SettlementPayment",
-    "EmployeeLoan", "SettlementStatus", "SettlementMethod",
+    "EmployeeLoan", "LoanInstallment", "FuelLoad",
+    "SettlementRate", "CollectorGoal", "RateVersion", "SettlementStatus", "SettlementMethod",
     "DeductionType", "LoanStatus",
 ]
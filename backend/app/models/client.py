@@ -1,5 +1,6 @@
 from datetime import date, datetime
 from typing import Optional
+from geoalchemy2 import Geometry, WKBElement
 from sqlalchemy import String, Date, BigInteger, ForeignKey, DateTime, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .base import Base, TimestampMixin
@@ -26,6 +27,10 @@ class Address(Base):
     neighborhood: Mapped[Optional[str]] = mapped_column(String(100))
     municipality_id: Mapped[Optional[int]] = mapped_column(BigInteger, ForeignKey("municipality.id"))
     postal_code: Mapped[Optional[str]] = mapped_column(String(10))
+    # WGS84 point; deferred so regular address loads don't ship the WKB
+    geom: Mapped[Optional[WKBElement]] = mapped_column(
+        Geometry("POINT", srid=4326, spatial_index=False), deferred=True
+    )
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     municipality: Mapped[Optional["Municipality"]] = relationship(lazy="joined")
@@ -255,5 +255,37 @@ class Card(Base, TimestampMixin):
     policy: Mapped["Policy"] = relationship(lazy="joined")
 
 
+class CollectionAssignment(Base):
+    """History of who was assigned to collect each card (zone/route)."""
+    __tablename__ = "collection_assignment"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    card_id: Mapped[int] = mapped_column(Integer, ForeignKey("card.id", ondelete="CASCADE"))
+    policy_id: Mapped[int] = mapped_column(Integer, ForeignKey("policy.id"))
+    assigned_to: Mapped[str] = mapped_column(String(50))
+    zone: Mapped[Optional[str]] = mapped_column(String(50))
+    route: Mapped[Optional[str]] = mapped_column(String(50))
+    assignment_date: Mapped[date] = mapped_column(Date)
+    observations: Mapped[Optional[str]] = mapped_column(String)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class CollectorDailyCounter(Base):
+    """
+    Per-collector, per-day dashboard counters, maintained incrementally in
+    the same transaction as each payment change and reconciled nightly.
+    """
+    __tablename__ = "collector_daily_counter"
+
+    collector_id: Mapped[int] = mapped_column(Integer, ForeignKey("collector.id", ondelete="CASCADE"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    collections_count: Mapped[int] = mapped_column(Integer, server_default="0")
+    collected_amount: Mapped[float] = mapped_column(Numeric(12, 2), server_default="0")
+    cash_amount: Mapped[float] = mapped_column(Numeric(12, 2), server_default="0")
+    commission_amount: Mapped[float] = mapped_column(Numeric(12, 2), server_default="0")
+    pending_approval: Mapped[int] = mapped_column(Integer, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 # Need to import Client for relationship resolution
 from .client import Client  # noqa: E402
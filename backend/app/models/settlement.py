@@ -20,6 +20,7 @@ from sqlalchemy import (
     UniqueConstraint,
     CheckConstraint,
     Index,
+    BigInteger,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -89,6 +90,7 @@ class EmployeeLoan(Base, TimestampMixin):
     # Relationships
     employee: Mapped[Optional["Employee"]] = relationship(back_populates="loans")
     deductions: Mapped[List["SettlementDeduction"]] = relationship(back_populates="loan")
+    installments: Mapped[List["LoanInstallment"]] = relationship(back_populates="loan")
     
     __table_args__ = (
         Index("idx_employee_loan_employee", "employee_id", postgresql_where="employee_id IS NOT NULL"),
@@ -96,6 +98,130 @@ class EmployeeLoan(Base, TimestampMixin):
     )
 
 
+class LoanInstallment(Base):
+    """
+    Ledger de cuotas cobradas a un préstamo, una fila por liquidación.
+    
+    (loan_id, settlement_id) es único: volver a aplicar una liquidación no
+    cobra dos veces la misma cuota. El saldo de un préstamo es
+    total_amount - SUM(amount). Los préstamos con cuotas pagadas antes del
+    ledger tienen una fila de apertura sin settlement_id (migración 012).
+    """
+    
+    __tablename__ = "loan_installment"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    loan_id: Mapped[int] = mapped_column(ForeignKey("employee_loan.id"))
+    settlement_id: Mapped[Optional[int]] = mapped_column(ForeignKey("settlement.id"))
+    
+    installment_number: Mapped[int]  # acumulado: número de la última cuota que cubre esta fila
+    amount: Mapped[Decimal] = mapped_column(Numeric(12, 2))
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    
+    # Relationships
+    loan: Mapped["EmployeeLoan"] = relationship(back_populates="installments")
+    settlement: Mapped[Optional["Settlement"]] = relationship()
+    
+    __table_args__ = (
+        UniqueConstraint("loan_id", "settlement_id", name="uq_loan_installment_settlement"),
+        UniqueConstraint("loan_id", "installment_number", name="uq_loan_installment_number"),
+        # Saldo y cuotas pagadas por préstamo con index-only scan
+        Index(
+            "idx_loan_installment_loan",
+            "loan_id",
+            postgresql_include=["installment_number", "amount"],
+        ),
+        Index("idx_loan_installment_settlement", "settlement_id"),
+    )
+
+
+class FuelLoad(Base):
+    """
+    Carga de combustible de un empleado (ticket de gasolinera).
+    
+    Se captura desde la app móvil (lote JSON) o por CSV. La suma del
+    período, por empleado, es la base de la deducción de gasolina.
+    ticket identifica la carga para que un reintento no la duplique; es
+    obligatorio en las cargas del móvil (ck_fuel_load_mobile_ticket).
+    """
+    
+    __tablename__ = "fuel_load"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    employee_id: Mapped[int] = mapped_column(ForeignKey("employee.id"))
+    
+    load_date: Mapped[date]
+    amount: Mapped[Decimal] = mapped_column(Numeric(12, 2))
+    liters: Mapped[Optional[Decimal]] = mapped_column(Numeric(8, 2))
+    odometer: Mapped[Optional[int]]
+    ticket: Mapped[Optional[str]] = mapped_column(String(50))
+    source: Mapped[str] = mapped_column(String(10))  # mobile, csv
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("employee_id", "ticket", name="uq_fuel_load_ticket"),
+        CheckConstraint("amount > 0", name="ck_fuel_load_amount"),
+        CheckConstraint("source <> 'mobile' OR ticket IS NOT NULL", name="ck_fuel_load_mobile_ticket"),
+        # Total del período por empleado con index-only scan
+        Index("idx_fuel_load_employee_date", "employee_id", "load_date", postgresql_include=["amount"]),
+    )
+
+
+class SettlementRate(Base):
+    """
+    Tasas de liquidación con vigencia: comisión normal y de contado,
+    monto fijo por entrega, porcentaje de gasolina y meta por defecto.
+    Rige la fila con el effective_from más reciente <= fecha.
+    """
+    
+    __tablename__ = "settlement_rate"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(30))
+    effective_from: Mapped[date]
+    value: Mapped[Decimal] = mapped_column(Numeric(12, 4))
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("name", "effective_from", name="uq_settlement_rate"),
+        CheckConstraint(
+            "name IN ('commission_regular', 'commission_cash', 'commission_delivery', "
+            "'fuel_deduction', 'goal_amount')",
+            name="ck_settlement_rate_name",
+        ),
+    )
+
+
+class CollectorGoal(Base):
+    """Meta de cobranza por quincena de un cobrador, con vigencia (sustituye la meta por defecto)."""
+    
+    __tablename__ = "collector_goal"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    employee_role_id: Mapped[int] = mapped_column(ForeignKey("employee_role.id"))
+    effective_from: Mapped[date]
+    amount: Mapped[Decimal] = mapped_column(Numeric(12, 2))
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("employee_role_id", "effective_from", name="uq_collector_goal"),
+    )
+
+
+class RateVersion(Base):
+    """
+    Fila única con la versión de las tablas de tasas y metas. La suben
+    triggers en cada cambio (migración 014); el proveedor de tasas recarga
+    su snapshot cuando la ve distinta.
+    """
+    
+    __tablename__ = "rate_version"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger)
+    updated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+
+
 class Settlement(Base, TimestampMixin):
     """
     Liquidación quincenal de un cobrador.
@@ -172,6 +298,12 @@ class Settlement(Base, TimestampMixin):
         UniqueConstraint("employee_role_id", "period_start", "period_end", name="uq_settlement_period_role"),
         Index("idx_settlement_employee_role", "employee_role_id", postgresql_where="employee_role_id IS NOT NULL"),
         Index("idx_settlement_period", "period_start", "period_end"),
+        # Historial por cobrador: keyset (period_end, id) y SUM(amount_paid) solo con el índice
+        Index(
+            "idx_settlement_role_history",
+            "employee_role_id", "period_end", "id",
+            postgresql_include=["amount_paid"],
+        ),
         Index("idx_settlement_status", "status"),
     )
     
@@ -212,7 +344,7 @@ class SettlementPayment(Base):
     
     id: Mapped[int] = mapped_column(primary_key=True)
     settlement_id: Mapped[int] = mapped_column(ForeignKey("settlement.id", ondelete="CASCADE"))
-    payment_id: Mapped[int] = mapped_column(ForeignKey("payment.id"), unique=True)
+    payment_id: Mapped[int] = mapped_column(ForeignKey("payment.id"))
     
     commission_type: Mapped[str] = mapped_column(String(20))  # regular, cash, delivery
     amount_collected: Mapped[Decimal] = mapped_column(Numeric(12, 2))
@@ -224,6 +356,8 @@ class SettlementPayment(Base):
     payment: Mapped["Payment"] = relationship()
     
     __table_args__ = (
+        # Un pago aporta a lo más una comisión de cobro y una de entrega
+        UniqueConstraint("payment_id", "commission_type", name="uq_settlement_payment_type"),
         Index("idx_settlement_payment_settlement", "settlement_id"),
         Index("idx_settlement_payment_payment", "payment_id"),
     )
@@ -1,10 +1,58 @@
-from sqlalchemy import ForeignKey, String, Boolean, DateTime, Index
+from sqlalchemy import (
+    ForeignKey, String, Boolean, DateTime, Index, Enum as SAEnum, func, text,
+    BigInteger, Text,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
 from typing import Optional
 
 from .base import Base, TimestampMixin
 
+class Role(Base):
+    """Roles de usuario en el sistema."""
+    
+    __tablename__ = "role"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(50), unique=True)
+    description: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class Permission(Base):
+    """
+    Permisos individuales: "modulo.accion", "modulo.*" (todo el módulo)
+    o "*" (todo).
+    """
+    
+    __tablename__ = "permission"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True)
+    description: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class RolePermission(Base):
+    __tablename__ = "role_permission"
+    
+    role_id: Mapped[int] = mapped_column(ForeignKey("role.id", ondelete="CASCADE"), primary_key=True)
+    permission_id: Mapped[int] = mapped_column(ForeignKey("permission.id", ondelete="CASCADE"), primary_key=True)
+
+
+class PermissionVersion(Base):
+    """
+    Fila única con la versión de roles y permisos. La suben triggers en cada
+    cambio (migración 016); el índice de permisos se recarga al verla distinta.
+    """
+    
+    __tablename__ = "permission_version"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
 class AppUser(Base, TimestampMixin):
     """
     Usuarios de la aplicación móvil y web.
@@ -21,6 +69,7 @@ class AppUser(Base, TimestampMixin):
     
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     last_login: Mapped[Optional[datetime]]
+    role_id: Mapped[Optional[int]] = mapped_column(ForeignKey("role.id", ondelete="SET NULL"))
     
     # Relationships
     employee: Mapped["Employee"] = relationship(back_populates="user")
@@ -30,3 +79,28 @@ class AppUser(Base, TimestampMixin):
     __table_args__ = (
         Index("idx_app_user_employee", "employee_id"),
     )
+
+
+class DeviceSession(Base, TimestampMixin):
+    """
+    Sesión de un usuario en un dispositivo (app móvil o navegador).
+    `token` identifica la sesión en Redis (auth:session:{token}), donde vive
+    el hash del refresh token vigente; revocar la sesión borra esa llave.
+    """
+    
+    __tablename__ = "device_session"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("app_user.id", ondelete="CASCADE"))
+    device_id: Mapped[str] = mapped_column(String(255))
+    device_type: Mapped[str] = mapped_column(SAEnum('android', 'ios', 'web', name='device_type_enum', create_type=False))
+    app_type: Mapped[str] = mapped_column(SAEnum('collector_app', 'seller_app', 'adjuster_app', 'desktop', name='app_type_enum', create_type=False))
+    app_version: Mapped[Optional[str]] = mapped_column(String(20))
+    push_token: Mapped[Optional[str]] = mapped_column(String(500))
+    token: Mapped[str] = mapped_column(String(255), unique=True)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    last_activity_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("idx_device_session_user_active", "user_id", "device_id", postgresql_where=text("is_active")),
+    )
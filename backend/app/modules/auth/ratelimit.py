@@ -0,0 +1,238 @@
+"""
+Auth Module — Login rate limiter and lockout (Redis)
+
+Every login attempt runs one Lua script before any DB query or password
+hash: it checks the username lockout and the sliding windows of attempts
+per username and per IP (sorted sets of timestamps, trimmed to
+LOGIN_RATE_LIMIT_WINDOW), and only records the attempt if it is allowed.
+Being a single script, concurrent attempts cannot both slip under a limit.
+
+Only failed logins stay in the windows: once the credentials check out,
+`reset` removes the attempt from both windows (and `release` does the same
+when the attempt ended for another reason, e.g. a busy hash pool), so a
+shared office IP full of users who type their password right is never
+throttled.
+
+Failed logins are also counted per username over LOGIN_LOCKOUT_DURATION; at
+LOGIN_LOCKOUT_ATTEMPTS the username is locked for LOGIN_LOCKOUT_DURATION.
+A successful login clears the failure count.
+
+The IP is `request.client.host`, which behind a reverse proxy is the
+proxy's address unless uvicorn trusts its X-Forwarded-For (see
+FORWARDED_ALLOW_IPS in the Dockerfile).
+
+If Redis is down the limiter lets the attempt through (logged and counted)
+rather than taking login down with it.
+"""
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import List, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import get_settings
+from app.core.exceptions import TooManyRequestsError
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "auth:login:"
+LOCKOUT_PREFIX = "auth:lockout:"
+
+# KEYS: lockout, user attempts, ip attempts
+# ARGV: now_ms, window_ms, user_limit, ip_limit, member
+# Returns {0, 0} if allowed, else {reason, retry_after_ms}
+# (1 = username locked, 2 = username over limit, 3 = IP over limit)
+CHECK_SCRIPT = """
+local locked = redis.call('PTTL', KEYS[1])
+if locked > 0 then
+    return {1, locked}
+end
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limits = {tonumber(ARGV[3]), tonumber(ARGV[4])}
+for i = 2, 3 do
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', now - window)
+    if redis.call('ZCARD', KEYS[i]) >= limits[i - 1] then
+        local oldest = redis.call('ZRANGE', KEYS[i], 0, 0, 'WITHSCORES')
+        return {i, tonumber(oldest[2]) + window - now}
+    end
+end
+for i = 2, 3 do
+    redis.call('ZADD', KEYS[i], now, ARGV[5])
+    redis.call('PEXPIRE', KEYS[i], window)
+end
+return {0, 0}
+"""
+
+# KEYS: failures, lockout
+# ARGV: now_ms, lockout_ms, lockout_attempts, member
+# Returns {failures, locked}
+FAILURE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local duration = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - duration)
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('PEXPIRE', KEYS[1], duration)
+local failures = redis.call('ZCARD', KEYS[1])
+if failures >= tonumber(ARGV[3]) then
+    redis.call('SET', KEYS[2], failures, 'PX', duration)
+    redis.call('DEL', KEYS[1])
+    return {failures, 1}
+end
+return {failures, 0}
+"""
+
+_REASONS = {
+    1: "Cuenta bloqueada temporalmente por intentos fallidos",
+    2: "Demasiados intentos para este usuario, intenta más tarde",
+    3: "Demasiados intentos desde esta dirección, intenta más tarde",
+}
+
+
+@dataclass
+class LimiterStats:
+    allowed: int = 0
+    rejected: int = 0
+    lockouts: int = 0
+    errors: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "lockouts": self.lockouts,
+            "errors": self.errors,
+        }
+
+
+# Per-process counters
+stats = LimiterStats()
+
+
+def _username(username: str) -> str:
+    return username.strip().lower()
+
+
+def _member(now_ms: int) -> str:
+    # Unique per attempt: two attempts in the same millisecond both count
+    return f"{now_ms}:{uuid.uuid4().hex[:8]}"
+
+
+class LoginRateLimiter:
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.settings = get_settings()
+        self._check = redis.register_script(CHECK_SCRIPT)
+        self._failure = redis.register_script(FAILURE_SCRIPT)
+
+    async def check(self, username: str, ip: Optional[str]) -> Optional[str]:
+        """
+        Record the attempt or raise TooManyRequestsError (with Retry-After).
+        Returns the attempt id to pass to `reset` / `release` (None if Redis
+        is down).
+        """
+        user = _username(username)
+        now_ms = int(time.time() * 1000)
+        attempt = _member(now_ms)
+        try:
+            reason, retry_ms = await self._check(
+                keys=[LOCKOUT_PREFIX + user, f"{KEY_PREFIX}user:{user}", f"{KEY_PREFIX}ip:{ip or '-'}"],
+                args=[
+                    now_ms,
+                    self.settings.LOGIN_RATE_LIMIT_WINDOW * 1000,
+                    self.settings.LOGIN_RATE_LIMIT_USER,
+                    self.settings.LOGIN_RATE_LIMIT_IP,
+                    attempt,
+                ],
+            )
+        except RedisError:
+            stats.errors += 1
+            logger.warning("Redis no disponible; login de %s sin límite de intentos", user)
+            return None
+
+        if reason:
+            stats.rejected += 1
+            raise TooManyRequestsError(
+                _REASONS[int(reason)],
+                retry_after=max(1, -(-int(retry_ms) // 1000)),
+                code="account_locked" if int(reason) == 1 else "rate_limited",
+            )
+        stats.allowed += 1
+        return attempt
+
+    async def record_failure(self, username: str) -> None:
+        user = _username(username)
+        now_ms = int(time.time() * 1000)
+        try:
+            failures, locked = await self._failure(
+                keys=[f"{KEY_PREFIX}fail:{user}", LOCKOUT_PREFIX + user],
+                args=[
+                    now_ms,
+                    self.settings.LOGIN_LOCKOUT_DURATION * 1000,
+                    self.settings.LOGIN_LOCKOUT_ATTEMPTS,
+                    _member(now_ms),
+                ],
+            )
+        except RedisError:
+            stats.errors += 1
+            return
+        if locked:
+            stats.lockouts += 1
+            logger.warning("Usuario %s bloqueado tras %s intentos fallidos", user, failures)
+
+    async def release(self, username: str, ip: Optional[str], attempt: Optional[str]) -> None:
+        """Take an attempt that was not a wrong password back out of the windows."""
+        await self._forget(username, ip, attempt, clear_failures=False)
+
+    async def reset(self, username: str, ip: Optional[str], attempt: Optional[str]) -> None:
+        """Successful login: the attempt does not count and the failures are forgotten."""
+        await self._forget(username, ip, attempt, clear_failures=True)
+
+    async def _forget(
+        self, username: str, ip: Optional[str], attempt: Optional[str], clear_failures: bool
+    ) -> None:
+        user = _username(username)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                if attempt:
+                    pipe.zrem(f"{KEY_PREFIX}user:{user}", attempt)
+                    pipe.zrem(f"{KEY_PREFIX}ip:{ip or '-'}", attempt)
+                if clear_failures:
+                    pipe.delete(f"{KEY_PREFIX}fail:{user}")
+                await pipe.execute()
+        except RedisError:
+            stats.errors += 1
+
+    async def status(self, username: str) -> dict:
+        """Lockout and counters of a username (admin)."""
+        user = _username(username)
+        window_floor = int(time.time() * 1000) - self.settings.LOGIN_RATE_LIMIT_WINDOW * 1000
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.pttl(LOCKOUT_PREFIX + user)
+            pipe.zcard(f"{KEY_PREFIX}fail:{user}")
+            pipe.zcount(f"{KEY_PREFIX}user:{user}", window_floor, "+inf")
+            locked_ms, failures, attempts = await pipe.execute()
+        return {
+            "username": user,
+            "locked": locked_ms > 0,
+            "locked_seconds": max(0, -(-locked_ms // 1000)),
+            "failed_attempts": failures,
+            "attempts_in_window": attempts,
+        }
+
+    async def locked_usernames(self) -> List[str]:
+        return sorted([
+            key[len(LOCKOUT_PREFIX):]
+            async for key in self.redis.scan_iter(match=LOCKOUT_PREFIX + "*", count=500)
+        ])
+
+    async def unlock(self, username: str) -> bool:
+        """Lift a lockout and clear the username's counters. True if there was anything to clear."""
+        user = _username(username)
+        removed = await self.redis.delete(
+            LOCKOUT_PREFIX + user, f"{KEY_PREFIX}fail:{user}", f"{KEY_PREFIX}user:{user}"
+        )
+        return removed > 0
@@ -4,21 +4,148 @@ Authentication Router
 Claudy ✨ — 2026-02-27
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.modules.auth.schemas import LoginRequest, TokenResponse
-from app.modules.auth.service import authenticate_user, create_user_tokens
+from app.core.dependencies import get_current_user
+from app.core.exceptions import AppException
+from app.core.permissions import require_permission
+from app.core.redis import get_redis
+from app.modules.auth.ratelimit import LoginRateLimiter
+from app.modules.auth.schemas import (
+    DeviceSessionResponse, LockoutStatus, LoginRequest, LogoutRequest,
+    RefreshRequest, TokenResponse,
+)
+from app.modules.auth.service import (
+    authenticate_user, create_user_tokens, list_device_sessions,
+    open_device_session, refresh_user_tokens, revoke_device_sessions,
+)
+from app.modules.auth.sessions import RefreshTokenStore
 
 router = APIRouter()
 
+
+def get_limiter() -> LoginRateLimiter:
+    return LoginRateLimiter(get_redis())
+
+
+def get_token_store() -> RefreshTokenStore:
+    return RefreshTokenStore(get_redis())
+
+
 @router.post("/login", response_model=TokenResponse)
-async def login(data: LoginRequest, db: Session = Depends(get_db)):
-    """Autentica al usuario y devuelve el token de acceso."""
-    user = await authenticate_user(db, data.username, data.password)
-    return create_user_tokens(user)
+async def login(
+    data: LoginRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    limiter: LoginRateLimiter = Depends(get_limiter),
+    store: RefreshTokenStore = Depends(get_token_store),
+):
+    """Autentica al usuario y devuelve el token de acceso y el refresh token del dispositivo."""
+    # Antes de tocar la BD o Argon2: un intento de más se rechaza aquí
+    ip = request.client.host if request.client else None
+    attempt = await limiter.check(data.username, ip)
+    try:
+        user = await authenticate_user(db, data.username, data.password)
+    except AppException as e:
+        # Solo los intentos con credenciales incorrectas quedan en las ventanas
+        if e.status_code == 401:
+            await limiter.record_failure(data.username)
+        else:
+            await limiter.release(data.username, ip, attempt)
+        raise
+    await limiter.reset(data.username, ip, attempt)
+    session, refresh_token = await open_device_session(db, store, user, data)
+    return create_user_tokens(user, session, refresh_token)
+
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh(
+    data: RefreshRequest,
+    store: RefreshTokenStore = Depends(get_token_store),
+):
+    """Cambia el refresh token por uno nuevo y un access token (sin BD)."""
+    return await refresh_user_tokens(store, data.refresh_token)
 
 @router.post("/logout", status_code=204)
-async def logout():
-    """Cierra la sesión (invalida el token en el cliente)."""
+async def logout(
+    data: LogoutRequest | None = None,
+    db: Session = Depends(get_db),
+    store: RefreshTokenStore = Depends(get_token_store),
+):
+    """Cierra la sesión del dispositivo; sin refresh token solo se olvida en el cliente."""
+    if data and data.refresh_token:
+        session_token = await store.owns(data.refresh_token)
+        if session_token:
+            await revoke_device_sessions(db, store, session_token=session_token)
+    return None
+
+
+# ─── Device sessions ───────────────────────────────────────────────────────────
+
+@router.get("/sessions", response_model=List[DeviceSessionResponse])
+async def get_my_sessions(
+    db: Session = Depends(get_db),
+    store: RefreshTokenStore = Depends(get_token_store),
+    current_user = Depends(get_current_user),
+):
+    """Dispositivos con sesión abierta del usuario actual."""
+    return await list_device_sessions(db, store, int(current_user["sub"]))
+
+@router.delete("/sessions/{session_id}", status_code=204)
+async def revoke_my_session(
+    session_id: int,
+    db: Session = Depends(get_db),
+    store: RefreshTokenStore = Depends(get_token_store),
+    current_user = Depends(get_current_user),
+):
+    """Cierra la sesión de uno de mis dispositivos."""
+    revoked = await revoke_device_sessions(
+        db, store, user_id=int(current_user["sub"]), session_id=session_id
+    )
+    if not revoked:
+        raise HTTPException(status_code=404, detail=f"Sesión {session_id} no encontrada")
+    return None
+
+@router.delete("/users/{user_id}/sessions", status_code=204)
+async def revoke_user_sessions(
+    user_id: int,
+    db: Session = Depends(get_db),
+    store: RefreshTokenStore = Depends(get_token_store),
+    current_user = Depends(require_permission("users.sessions")),
+):
+    """Cierra todas las sesiones de un usuario (administración)."""
+    await revoke_device_sessions(db, store, user_id=user_id)
+    return None
+
+
+# ─── Lockouts (admin) ──────────────────────────────────────────────────────────
+
+@router.get("/lockouts", response_model=List[str])
+async def list_lockouts(
+    limiter: LoginRateLimiter = Depends(get_limiter),
+    current_user = Depends(require_permission("users.lockouts")),
+):
+    """Usuarios bloqueados en este momento por intentos fallidos."""
+    return await limiter.locked_usernames()
+
+@router.get("/lockouts/{username}", response_model=LockoutStatus)
+async def get_lockout(
+    username: str,
+    limiter: LoginRateLimiter = Depends(get_limiter),
+    current_user = Depends(require_permission("users.lockouts")),
+):
+    """Estado de bloqueo e intentos recientes de un usuario."""
+    return await limiter.status(username)
+
+@router.delete("/lockouts/{username}", status_code=204)
+async def unlock_user(
+    username: str,
+    limiter: LoginRateLimiter = Depends(get_limiter),
+    current_user = Depends(require_permission("users.lockouts")),
+):
+    """Levanta el bloqueo de un usuario y borra sus intentos fallidos."""
+    if not await limiter.unlock(username):
+        raise HTTPException(status_code=404, detail=f"El usuario {username} no tiene bloqueo")
     return None
@@ -1,10 +1,25 @@
-from typing import Optional
-from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class LoginRequest(BaseModel):
     username: str = Field(..., min_length=3, max_length=50)
     password: str = Field(..., min_length=1)
+    # Dispositivo (app móvil); un navegador puede omitirlos
+    device_id: Optional[str] = Field(None, max_length=255)
+    device_type: Literal["android", "ios", "web"] = "web"
+    app_type: Literal["collector_app", "seller_app", "adjuster_app", "desktop"] = "desktop"
+    app_version: Optional[str] = Field(None, max_length=20)
+    push_token: Optional[str] = Field(None, max_length=500)
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str = Field(..., min_length=3, max_length=200)
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = Field(None, max_length=200)
 
 
 class UserInfo(BaseModel):
@@ -16,5 +31,26 @@ class UserInfo(BaseModel):
 class TokenResponse(BaseModel):
     access_token: str
     expires_in: int = 900
+    refresh_token: Optional[str] = None
+    refresh_expires_in: Optional[int] = None
     token_type: str = "bearer"
     user: Optional[UserInfo] = None
+
+
+class DeviceSessionResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    device_id: str
+    device_type: str
+    app_type: str
+    app_version: Optional[str] = None
+    created_at: datetime
+
+
+class LockoutStatus(BaseModel):
+    username: str
+    locked: bool
+    locked_seconds: int = 0
+    failed_attempts: int = 0
+    attempts_in_window: int = 0
@@ -5,15 +5,19 @@ Claudy ✨ — 2026-02-27 (fixed async 2026-03-02)
 """
 
 import logging
+import secrets
+import uuid
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from app.models.user import AppUser
-from app.core.security import verify_password, create_access_token
+from app.models.user import AppUser, DeviceSession
+from app.core.security import verify_password_async, create_access_token
 from app.core.exceptions import AppException
+from app.modules.auth.schemas import LoginRequest
+from app.modules.auth.sessions import RefreshTokenStore, refresh_ttl
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +40,7 @@ async def authenticate_user(
         logger.warning(f"Intento de login: usuario {username} está inactivo")
         raise AppException(status_code=403, detail="Usuario inactivo")
         
-    if not verify_password(password, user.password_hash):
+    if not await verify_password_async(password, user.password_hash):
         logger.warning(f"Intento de login fallido: contraseña incorrecta para {username}")
         raise AppException(status_code=401, detail="Credenciales incorrectas")
         
@@ -45,16 +49,66 @@ async def authenticate_user(
     
     return user
 
-def create_user_tokens(user: AppUser) -> dict:
-    """Genera los tokens de acceso para el usuario."""
-    access_token = create_access_token(data={
+async def open_device_session(
+    db: AsyncSession,
+    store: RefreshTokenStore,
+    user: AppUser,
+    data: LoginRequest,
+) -> tuple[DeviceSession, str]:
+    """
+    Registra la sesión del dispositivo y emite su refresh token. Un nuevo
+    login en el mismo dispositivo cierra la sesión anterior.
+    """
+    device_id = data.device_id or uuid.uuid4().hex
+    replaced = (await db.execute(
+        update(DeviceSession)
+        .where(DeviceSession.user_id == user.id)
+        .where(DeviceSession.device_id == device_id)
+        .where(DeviceSession.is_active.is_(True))
+        .values(is_active=False)
+        .returning(DeviceSession.token)
+    )).scalars().all()
+
+    session = DeviceSession(
+        user_id=user.id,
+        device_id=device_id,
+        device_type=data.device_type,
+        app_type=data.app_type,
+        app_version=data.app_version,
+        push_token=data.push_token,
+        token=secrets.token_urlsafe(24),
+    )
+    db.add(session)
+    await db.commit()
+
+    await store.revoke(replaced)
+    refresh_token = await store.issue(
+        session.token, _claims(user, session), refresh_ttl(session.device_type)
+    )
+    return session, refresh_token
+
+def _claims(user: AppUser, session: Optional[DeviceSession] = None) -> dict:
+    claims = {
         "sub": str(user.id),
         "username": user.username,
         "employee_id": user.employee_id,
-    })
+    }
+    if session is not None:
+        claims["sid"] = session.id
+    return claims
+
+def create_user_tokens(
+    user: AppUser,
+    session: Optional[DeviceSession] = None,
+    refresh_token: Optional[str] = None,
+) -> dict:
+    """Genera los tokens de acceso para el usuario."""
+    access_token = create_access_token(data=_claims(user, session))
     
     return {
         "access_token": access_token,
+        "refresh_token": refresh_token,
+        "refresh_expires_in": refresh_ttl(session.device_type) if session else None,
         "token_type": "bearer",
         "user": {
             "id": user.id,
@@ -62,3 +116,83 @@ def create_user_tokens(user: AppUser) -> dict:
             "name": user.username,  # TODO: join employee for full_name
         }
     }
+
+async def refresh_user_tokens(store: RefreshTokenStore, refresh_token: str) -> dict:
+    """Rota el refresh token y emite un access token nuevo (solo Redis)."""
+    new_refresh, claims, ttl = await store.rotate(refresh_token)
+    access_token = create_access_token(data={
+        "sub": claims["sub"],
+        "username": claims["username"],
+        "employee_id": int(claims["employee_id"]) if claims["employee_id"] else None,
+        "sid": int(claims["sid"]),
+    })
+    
+    return {
+        "access_token": access_token,
+        "refresh_token": new_refresh,
+        "refresh_expires_in": ttl,
+        "token_type": "bearer",
+        "user": {
+            "id": int(claims["sub"]),
+            "username": claims["username"],
+            "name": claims["username"],
+        }
+    }
+
+async def revoke_device_sessions(
+    db: AsyncSession,
+    store: RefreshTokenStore,
+    user_id: Optional[int] = None,
+    session_id: Optional[int] = None,
+    session_token: Optional[str] = None,
+) -> int:
+    """Cierra sesiones (de un usuario, una por id o por token). Devuelve cuántas."""
+    stmt = update(DeviceSession).where(DeviceSession.is_active.is_(True))
+    if user_id is not None:
+        stmt = stmt.where(DeviceSession.user_id == user_id)
+    if session_id is not None:
+        stmt = stmt.where(DeviceSession.id == session_id)
+    if session_token is not None:
+        stmt = stmt.where(DeviceSession.token == session_token)
+    tokens = (await db.execute(
+        stmt.values(is_active=False).returning(DeviceSession.token)
+    )).scalars().all()
+    await db.commit()
+    
+    await store.revoke(tokens)
+    return len(tokens)
+
+async def revoke_inactive_user_sessions(db: AsyncSession, store: RefreshTokenStore) -> int:
+    """
+    Cierra las sesiones abiertas de usuarios desactivados. El refresh solo
+    lee Redis (no revisa app_user.is_active), así que desactivar un usuario
+    (desde la BD o cualquier otra vía) surte efecto cuando esto corre
+    (app.tasks.sessions, cada 5 min). Devuelve cuántas sesiones cerró.
+    """
+    inactive = select(AppUser.id).where(AppUser.is_active.is_(False))
+    tokens = (await db.execute(
+        update(DeviceSession)
+        .where(DeviceSession.is_active.is_(True))
+        .where(DeviceSession.user_id.in_(inactive))
+        .values(is_active=False)
+        .returning(DeviceSession.token)
+    )).scalars().all()
+    await db.commit()
+    
+    await store.revoke(tokens)
+    return len(tokens)
+
+async def list_device_sessions(
+    db: AsyncSession,
+    store: RefreshTokenStore,
+    user_id: int,
+) -> List[dict]:
+    """Sesiones activas del usuario; las revocadas en Redis (reuso) no cuentan."""
+    sessions = (await db.execute(
+        select(DeviceSession)
+        .where(DeviceSession.user_id == user_id)
+        .where(DeviceSession.is_active.is_(True))
+        .order_by(DeviceSession.created_at.desc())
+    )).scalars().all()
+    alive = await store.alive(s.token for s in sessions)
+    return [s for s in sessions if alive.get(s.token)]
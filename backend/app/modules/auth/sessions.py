@@ -0,0 +1,139 @@
+"""
+Auth Module — Refresh tokens in Redis
+
+A refresh token is `{session}.{secret}`: `session` is device_session.token
+and `secret` a random UUID. Redis keeps one hash per session,
+`auth:session:{session}`, with the SHA-256 of the current secret, the
+previous one and the claims needed to mint an access token. Its TTL is
+REFRESH_TOKEN_EXPIRE_DAYS_WEB or _MOBILE and restarts on every refresh.
+
+Refreshing is one Lua script (one round trip, no Postgres, no Argon2):
+compare the presented hash with the current one, swap in the new hash and
+return the claims. Presenting the *previous* secret means a rotated token
+was reused (stolen copy or replay), so the whole session is revoked.
+
+Revoking a device (logout, admin, new login on the same device) deletes
+the session hash; device_session.is_active records it in Postgres.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from redis.asyncio import Redis
+
+from app.core.config import get_settings
+from app.core.exceptions import AppException
+from app.core.security import generate_refresh_token, hash_refresh_token
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "auth:session:"
+
+# KEYS: session; ARGV: presented_hash, new_hash, now
+# Returns {1, HGETALL} if rotated, {0} if unknown/expired, {-1} if reused
+ROTATE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'token_hash')
+if not current then
+    return {0}
+end
+if current ~= ARGV[1] then
+    if redis.call('HGET', KEYS[1], 'prev_hash') == ARGV[1] then
+        redis.call('DEL', KEYS[1])
+        return {-1}
+    end
+    return {0}
+end
+redis.call('HSET', KEYS[1], 'token_hash', ARGV[2], 'prev_hash', ARGV[1], 'refreshed_at', ARGV[3])
+redis.call('EXPIRE', KEYS[1], tonumber(redis.call('HGET', KEYS[1], 'ttl')))
+return {1, redis.call('HGETALL', KEYS[1])}
+"""
+
+# Lo que el hash guarda además del estado del token
+CLAIM_FIELDS = ("sub", "username", "employee_id", "sid")
+
+
+def refresh_ttl(device_type: str) -> int:
+    """Segundos de vida del refresh token: web o móvil."""
+    settings = get_settings()
+    days = (
+        settings.REFRESH_TOKEN_EXPIRE_DAYS_WEB if device_type == "web"
+        else settings.REFRESH_TOKEN_EXPIRE_DAYS_MOBILE
+    )
+    return days * 86400
+
+
+def _split(refresh_token: str) -> Tuple[str, str]:
+    session, _, secret = refresh_token.partition(".")
+    if not session or not secret:
+        raise AppException(status_code=401, detail="Refresh token inválido", code="invalid_token")
+    return session, secret
+
+
+class RefreshTokenStore:
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self._rotate = redis.register_script(ROTATE_SCRIPT)
+
+    async def issue(self, session_token: str, claims: Dict[str, object], ttl: int) -> str:
+        """Guarda la sesión con su primer secreto y devuelve el refresh token."""
+        secret, secret_hash = generate_refresh_token()
+        key = KEY_PREFIX + session_token
+        fields = {
+            **{name: "" if claims.get(name) is None else str(claims[name]) for name in CLAIM_FIELDS},
+            "token_hash": secret_hash,
+            "prev_hash": "",
+            "ttl": ttl,
+            "refreshed_at": datetime.now(timezone.utc).isoformat(),
+        }
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, ttl)
+            await pipe.execute()
+        return f"{session_token}.{secret}"
+
+    async def rotate(self, refresh_token: str) -> Tuple[str, Dict[str, Optional[str]], int]:
+        """
+        Cambia el refresh token por uno nuevo.
+        Devuelve (nuevo token, claims, ttl en segundos).
+        """
+        session_token, secret = _split(refresh_token)
+        new_secret, new_hash = generate_refresh_token()
+        reply = await self._rotate(
+            keys=[KEY_PREFIX + session_token],
+            args=[hash_refresh_token(secret), new_hash, datetime.now(timezone.utc).isoformat()],
+        )
+        status = int(reply[0])
+        if status == -1:
+            logger.warning("Refresh token reutilizado; sesión %s revocada", session_token[:8])
+            raise AppException(status_code=401, detail="Sesión revocada", code="token_reused")
+        if status != 1:
+            raise AppException(status_code=401, detail="Refresh token inválido o expirado", code="invalid_token")
+
+        values = reply[1]
+        data = dict(zip(values[::2], values[1::2]))
+        claims = {name: data.get(name) or None for name in CLAIM_FIELDS}
+        return f"{session_token}.{new_secret}", claims, int(data["ttl"])
+
+    async def owns(self, refresh_token: str) -> Optional[str]:
+        """La sesión del token si es el vigente; None si no."""
+        session_token, secret = _split(refresh_token)
+        current = await self.redis.hget(KEY_PREFIX + session_token, "token_hash")
+        return session_token if current == hash_refresh_token(secret) else None
+
+    async def revoke(self, session_tokens: Iterable[str]) -> int:
+        keys = [KEY_PREFIX + token for token in set(session_tokens) if token]
+        if not keys:
+            return 0
+        return await self.redis.delete(*keys)
+
+    async def alive(self, session_tokens: Iterable[str]) -> Dict[str, bool]:
+        """Qué sesiones siguen en Redis (una revocada por reuso ya no está)."""
+        tokens = list(session_tokens)
+        if not tokens:
+            return {}
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for token in tokens:
+                pipe.exists(KEY_PREFIX + token)
+            found = await pipe.execute()
+        return {token: bool(n) for token, n in zip(tokens, found)}
@@ -0,0 +1,126 @@
+"""
+Collections Module — Redis snapshot cache for the card list
+
+Each collector has one Redis hash `collections:cards:{code}` whose fields
+are the serialized FolioPage for a (status, sort, cursor, limit) combination.
+Serving a cached page is a single HGET; invalidating every page of a
+collector (payment registered, card reassigned) is a single DEL.
+CARDS_CACHE_TTL bounds how long a hash can live if an invalidation is missed.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+from pydantic import BaseModel
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import get_settings
+from .schemas import FolioPage
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "collections:cards:"
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stale: int = 0  # entry found but built on a previous day (days_overdue moved)
+    errors: int = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses + self.stale
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Per-process counters, exposed by GET /collections/cache/stats
+stats = CacheStats()
+
+
+class _CachedPage(BaseModel):
+    built_on: date
+    page: FolioPage
+
+
+def _field(
+    status_filter: Optional[str],
+    sort: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+) -> str:
+    return f"{status_filter or ''}|{sort or ''}|{cursor or ''}|{limit}"
+
+
+class CardCache:
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.ttl = get_settings().CARDS_CACHE_TTL
+
+    async def get(
+        self,
+        collector_code: str,
+        status_filter: Optional[str],
+        sort: Optional[str],
+        cursor: Optional[str],
+        limit: int,
+    ) -> Optional[FolioPage]:
+        try:
+            raw = await self.redis.hget(
+                KEY_PREFIX + collector_code, _field(status_filter, sort, cursor, limit)
+            )
+        except RedisError:
+            stats.errors += 1
+            logger.warning("Redis no disponible; cartera de %s desde BD", collector_code)
+            return None
+
+        if raw is None:
+            stats.misses += 1
+            return None
+
+        cached = _CachedPage.model_validate_json(raw)
+        if cached.built_on != date.today():
+            stats.stale += 1
+            return None
+
+        stats.hits += 1
+        return cached.page
+
+    async def set(
+        self,
+        collector_code: str,
+        status_filter: Optional[str],
+        sort: Optional[str],
+        cursor: Optional[str],
+        limit: int,
+        page: FolioPage,
+    ) -> None:
+        key = KEY_PREFIX + collector_code
+        payload = _CachedPage(built_on=date.today(), page=page).model_dump_json()
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(key, _field(status_filter, sort, cursor, limit), payload)
+                # Only arm the TTL on a fresh hash so it bounds the snapshot's age
+                pipe.expire(key, self.ttl, nx=True)
+                await pipe.execute()
+        except RedisError:
+            stats.errors += 1
+
+    async def invalidate(self, *collector_codes: str) -> None:
+        """Drop every cached page of the given collectors."""
+        keys = [KEY_PREFIX + code for code in set(collector_codes) if code]
+        if not keys:
+            return
+        try:
+            await self.redis.delete(*keys)
+        except RedisError:
+            stats.errors += 1
+            logger.warning("No se pudo invalidar la cartera en Redis: %s", keys)
@@ -0,0 +1,65 @@
+"""
+Collections Module — Daily dashboard counters
+
+collector_daily_counter keeps, per collector and day, what the dashboard
+shows. Every payment registration applies a CounterDelta in the same
+transaction as the payment (an upsert that adds to the row), so the
+dashboard is one primary-key read instead of an aggregate over `payment`.
+`reconcile_daily_counters` in the repository rebuilds a day from `payment`
+and fixes any drift; it runs nightly from app.tasks.counters.
+Only registration feeds the counters: there is no approve or revert flow
+for payments yet. pending_approval stays at zero and cash_amount is the
+cash collected today, not cash pending delivery (the dashboard keeps
+cash_pending as a stub). When approval lands, it applies its own deltas
+here and in reconcile_daily_counters.
+"""
+from dataclasses import dataclass, fields
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable, Optional
+
+from app.modules.settlements.rates import SettlementRates
+from app.modules.settlements.service import CASH_PAYMENT_PLANS
+
+CENT = Decimal("0.01")
+
+
+@dataclass
+class CounterDelta:
+    collections_count: int = 0
+    collected_amount: Decimal = Decimal("0")
+    cash_amount: Decimal = Decimal("0")
+    commission_amount: Decimal = Decimal("0")
+    pending_approval: int = 0
+
+    def __add__(self, other: "CounterDelta") -> "CounterDelta":
+        return CounterDelta(**{
+            f.name: getattr(self, f.name) + getattr(other, f.name) for f in fields(self)
+        })
+
+    def as_dict(self) -> dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+def commission_for(amount: Decimal, payment_plan: Optional[str], rates: SettlementRates) -> Decimal:
+    """Collector commission on one payment: cash rate for contado plans, regular otherwise."""
+    rate = rates.commission_cash if payment_plan in CASH_PAYMENT_PLANS else rates.commission_regular
+    # Same rounding as round(numeric, 2) in Postgres, so reconcile matches
+    return (amount * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def registered(amount, method: str, payment_plan: Optional[str], rates: SettlementRates) -> CounterDelta:
+    """A payment registered as collected."""
+    amount = Decimal(str(amount)).quantize(CENT)
+    return CounterDelta(
+        collections_count=1,
+        collected_amount=amount,
+        cash_amount=amount if method == "cash" else Decimal("0"),
+        commission_amount=commission_for(amount, payment_plan, rates),
+    )
+
+
+def total(deltas: Iterable[CounterDelta]) -> CounterDelta:
+    result = CounterDelta()
+    for delta in deltas:
+        result = result + delta
+    return result
@@ -1,18 +1,75 @@
 """
 Collections Module — Repository (DB queries)
 Claudy ✨ + Fer — 2026-03-02
-from sqlalchemy import String
 """
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 from typing import Optional, List, Tuple
-from sqlalchemy import select, func, and_, or_, case, literal
+from sqlalchemy import (
+    Integer, Numeric, Select, String, bindparam, cast, insert, select, update,
+    func, and_, or_, case, literal, tuple_,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm import Load, contains_eager, joinedload, raiseload, selectinload
 
 from app.models.policy import (
-    Policy, Payment, Card, Collector, Seller, Vehicle, Coverage,
+    Policy, Payment, Card, CollectionAssignment, Collector, CollectorDailyCounter,
+    Seller, Vehicle, Coverage,
 )
-from app.models.client import Client
+from app.models.client import Address, Client
+from app.modules.settlements.rates import get_rates
+from app.modules.settlements.service import CASH_PAYMENT_PLANS
+from .counters import CounterDelta
+
+
+# Sentinel so payments without due_date sort last and stay keyset-comparable
+NO_DUE_DATE = date(9999, 12, 31)
+
+
+# Stored statuses of a not-yet-collected payment. Every "open payment"
+# predicate matches on these (never NOT IN paid/cancelled), so Postgres can
+# use the partial indexes idx_payment_pending / idx_payment_late /
+# idx_payment_overdue.
+OPEN_PAYMENT_STATUSES = ('pending', 'late', 'overdue')
+
+OVERDUE_LEVELS = ('on_time', 'low', 'mid', 'high')
+
+
+def _overdue_level_clause(level: str, today: date):
+    """
+    SQL equivalent of service._overdue_level for a pending payment:
+    on_time (not yet due), low (1-5 days), mid (6-15), high (16+).
+    Expressed as due_date ranges so the (policy_id, due_date) indexes apply.
+    """
+    due = Payment.due_date
+    if level == "on_time":
+        return or_(due.is_(None), due >= today)
+    if level == "low":
+        return and_(due < today, due >= today - timedelta(days=5))
+    if level == "mid":
+        return and_(due < today - timedelta(days=5), due >= today - timedelta(days=15))
+    if level == "high":
+        return due < today - timedelta(days=15)
+    raise ValueError(f"Filtro de estado inválido: {level}")
+
+
+def _card_sort_expr(sort: Optional[str]):
+    """
+    SQL sort key for the card list → (expression, descending).
+    `overdue` (most days overdue first) is the same ordering as `due_date`
+    (oldest due date first); `amount` is largest first.
+    """
+    if sort == "amount":
+        return func.coalesce(Payment.amount, literal(0, Numeric(12, 2))), True
+    return func.coalesce(Payment.due_date, NO_DUE_DATE), False
+
+
+def card_sort_key(sort: Optional[str], payment: Payment):
+    """Python value of `_card_sort_expr` for a loaded row (cursor building)."""
+    if sort == "amount":
+        return payment.amount if payment.amount is not None else 0
+    return payment.due_date or NO_DUE_DATE
 
 
 class CollectionRepository:
@@ -31,42 +88,74 @@ class CollectionRepository:
         )
         return result.scalar_one_or_none()
 
-    async def get_cards_for_collector(
+    def _cards_query(
         self,
         collector_code: str,
         status_filter: Optional[str] = None,
         search: Optional[str] = None,
-    ) -> List[Tuple[Card, Policy, Client, Payment]]:
+    ) -> Select:
         """
-        Get all cards assigned to a collector with their current pending payment.
-        Returns tuples of (card, policy, client, next_pending_payment).
+        Base query for a collector's active cards joined to their next
+        pending payment and per-policy payment counters. Cards without a
+        pending payment (fully paid) are excluded.
+
+        `status_filter` is one or more overdue levels separated by commas
+        (e.g. "low,mid,high" for the morosos tab).
         """
-        # Subquery: next pending payment per policy
-        next_payment_sq = (
+        # Policies held by this collector — bounds the payment aggregate below
+        held_policies = (
+            select(Card.policy_id)
+            .where(Card.current_holder == collector_code)
+            .where(Card.status == "active")
+        )
+
+        # Subquery: next pending payment + payment counters per policy
+        payment_stats_sq = (
             select(
                 Payment.policy_id,
-                func.min(Payment.payment_number).label("next_number"),
+                func.min(Payment.payment_number)
+                .filter(Payment.status.in_(OPEN_PAYMENT_STATUSES))
+                .label("next_number"),
+                func.count(Payment.id).label("total_payments"),
+                func.count(Payment.id)
+                .filter(Payment.status == 'paid')
+                .label("paid_payments"),
             )
-            .where(Payment.status.notin_(['paid', 'cancelled']))
+            .where(Payment.policy_id.in_(held_policies))
             .group_by(Payment.policy_id)
             .subquery()
         )
 
         query = (
-            select(Card, Policy, Client, Payment)
+            select(
+                Card,
+                Policy,
+                Client,
+                Payment,
+                payment_stats_sq.c.total_payments,
+                payment_stats_sq.c.paid_payments,
+            )
             .join(Policy, Card.policy_id == Policy.id)
             .join(Client, Policy.client_id == Client.id)
-            .outerjoin(
-                next_payment_sq,
-                next_payment_sq.c.policy_id == Policy.id,
+            .join(
+                payment_stats_sq,
+                payment_stats_sq.c.policy_id == Policy.id,
             )
-            .outerjoin(
+            .join(
                 Payment,
                 and_(
                     Payment.policy_id == Policy.id,
-                    Payment.payment_number == next_payment_sq.c.next_number,
+                    Payment.payment_number == payment_stats_sq.c.next_number,
                 ),
             )
+            .options(
+                # Everything the card list needs comes from the explicit joins
+                # above; skip the models' default eager loads (incl. the full
+                # payment list per policy). Client keeps its address join.
+                raiseload(Card.policy),
+                Load(Policy).raiseload("*"),
+                Load(Payment).raiseload("*"),
+            )
             .where(Card.current_holder == collector_code)
             .where(Card.status == "active")
         )
@@ -80,11 +169,180 @@ class CollectionRepository:
                 )
             )
 
-        query = query.order_by(Payment.due_date.asc().nullslast())
+        if status_filter:
+            levels = {level.strip() for level in status_filter.split(",") if level.strip()}
+            if levels and levels != set(OVERDUE_LEVELS):
+                today = date.today()
+                query = query.where(
+                    Payment.status.in_(OPEN_PAYMENT_STATUSES),
+                    or_(*(_overdue_level_clause(level, today) for level in sorted(levels))),
+                )
+
+        return query
+
+    async def get_cards_for_collector(
+        self,
+        collector_code: str,
+        status_filter: Optional[str] = None,
+        search: Optional[str] = None,
+        sort: Optional[str] = None,
+        after: Optional[Tuple[object, int]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[Card, Policy, Client, Payment, int, int]]:
+        """
+        Get cards assigned to a collector with their current pending payment.
+        Returns tuples of (card, policy, client, next_pending_payment,
+        total_payments, paid_payments) in a single round trip.
+
+        Keyset pagination: `after` is the (sort_key, policy_id) of the last
+        row of the previous page (see `card_sort_key`); pass `limit` to cap
+        the page size.
+        """
+        query = self._cards_query(collector_code, status_filter, search)
+
+        key_expr, descending = _card_sort_expr(sort)
+        if after is not None:
+            after_key, after_id = after
+            past_key = key_expr < after_key if descending else key_expr > after_key
+            query = query.where(
+                or_(past_key, and_(key_expr == after_key, Policy.id > after_id))
+            )
+
+        query = query.order_by(
+            key_expr.desc() if descending else key_expr.asc(),
+            Policy.id.asc(),
+        )
+        if limit is not None:
+            query = query.limit(limit)
 
         result = await self.session.execute(query)
         return result.all()
 
+    async def count_cards_for_collector(
+        self,
+        collector_code: str,
+        status_filter: Optional[str] = None,
+        search: Optional[str] = None,
+    ) -> int:
+        """Total rows get_cards_for_collector would return without paging."""
+        base = self._cards_query(collector_code, status_filter, search).with_only_columns(
+            Card.id, maintain_column_froms=True
+        )
+        result = await self.session.execute(
+            select(func.count()).select_from(base.subquery())
+        )
+        return result.scalar_one()
+
+    # ── Delta sync ──────────────────────────────────────────────────────────
+
+    async def get_db_now(self) -> datetime:
+        result = await self.session.execute(select(func.now()))
+        return result.scalar_one()
+
+    def _held_cards(self, collector_code: str):
+        return (
+            select(Card.id, Card.policy_id, Card.updated_at)
+            .where(Card.current_holder == collector_code)
+            .where(Card.status == "active")
+            .subquery()
+        )
+
+    async def get_changed_cards(
+        self, collector_code: str, since: Optional[datetime]
+    ) -> list:
+        """Active cards of the collector modified after `since` (all if None)."""
+        query = (
+            select(
+                Card.id, Card.status, Card.current_holder,
+                Card.assignment_date, Card.updated_at, Policy.folio,
+            )
+            .join(Policy, Card.policy_id == Policy.id)
+            .where(Card.current_holder == collector_code)
+            .where(Card.status == "active")
+        )
+        if since is not None:
+            query = query.where(Card.updated_at > since)
+        result = await self.session.execute(query.order_by(Card.id))
+        return result.all()
+
+    async def get_changed_policies(
+        self, collector_code: str, since: Optional[datetime]
+    ) -> list:
+        """
+        Policies behind the collector's cards whose policy or client row
+        changed after `since`, plus every policy of a newly (re)assigned card.
+        """
+        held = self._held_cards(collector_code)
+        query = (
+            select(
+                Policy.id, Policy.folio, Policy.status,
+                Policy.effective_date, Policy.expiration_date,
+                func.greatest(
+                    Policy.updated_at, Client.updated_at, type_=Policy.updated_at.type
+                ).label("updated_at"),
+                Client.first_name, Client.paternal_surname, Client.maternal_surname,
+                Client.phone_1,
+            )
+            .join(held, held.c.policy_id == Policy.id)
+            .join(Client, Policy.client_id == Client.id)
+        )
+        if since is not None:
+            query = query.where(or_(
+                Policy.updated_at > since,
+                Client.updated_at > since,
+                held.c.updated_at > since,
+            ))
+        result = await self.session.execute(query.order_by(Policy.id))
+        return result.all()
+
+    async def get_changed_payments(
+        self, collector_code: str, since: Optional[datetime]
+    ) -> list:
+        """Payments of the collector's policies changed after `since`."""
+        held = self._held_cards(collector_code)
+        query = (
+            select(
+                Payment.id, Payment.payment_number, Payment.amount,
+                Payment.due_date, Payment.actual_date, Payment.status,
+                Payment.updated_at, Policy.folio,
+            )
+            .join(held, held.c.policy_id == Payment.policy_id)
+            .join(Policy, Payment.policy_id == Policy.id)
+        )
+        if since is not None:
+            query = query.where(or_(
+                Payment.updated_at > since,
+                held.c.updated_at > since,
+            ))
+        result = await self.session.execute(
+            query.order_by(Payment.policy_id, Payment.payment_number)
+        )
+        return result.all()
+
+    async def get_card_tombstones(
+        self, collector_code: str, since: datetime
+    ) -> list:
+        """
+        Cards once assigned to the collector (collection_assignment) that,
+        since `since`, were reassigned to someone else or left active status.
+        """
+        was_assigned = (
+            select(CollectionAssignment.card_id)
+            .where(CollectionAssignment.assigned_to == collector_code)
+        )
+        result = await self.session.execute(
+            select(Card.id, Policy.folio)
+            .join(Policy, Card.policy_id == Policy.id)
+            .where(Card.id.in_(was_assigned))
+            .where(Card.updated_at > since)
+            .where(or_(
+                Card.current_holder != collector_code,
+                Card.status != "active",
+            ))
+            .order_by(Card.id)
+        )
+        return result.all()
+
     async def get_policy_by_folio(self, folio: int) -> Optional[Policy]:
         """Get a policy with all relationships loaded."""
         result = await self.session.execute(
@@ -120,25 +378,214 @@ class CollectionRepository:
         result = await self.session.execute(query)
         return result.scalars().all()
 
-    async def get_collector_stats(
-        self, collector_id: int, today: date
-    ) -> dict:
-        """Get dashboard stats for a collector for today."""
-        # Collections today
+    async def get_dashboard_counters(
+        self, collector_code: str, day: date
+    ) -> Optional[Tuple[Collector, Optional[CollectorDailyCounter]]]:
+        """Collector plus its counters for `day` in one primary-key lookup."""
         result = await self.session.execute(
+            select(Collector, CollectorDailyCounter)
+            .outerjoin(
+                CollectorDailyCounter,
+                and_(
+                    CollectorDailyCounter.collector_id == Collector.id,
+                    CollectorDailyCounter.day == day,
+                ),
+            )
+            .where(Collector.code_name == collector_code)
+        )
+        row = result.first()
+        return (row.Collector, row.CollectorDailyCounter) if row else None
+
+    async def apply_counter_delta(
+        self, collector_id: int, day: date, delta: CounterDelta
+    ) -> None:
+        """Add `delta` to the collector's row for `day` (created on first use)."""
+        values = delta.as_dict()
+        stmt = pg_insert(CollectorDailyCounter).values(
+            collector_id=collector_id, day=day, **values
+        )
+        table = CollectorDailyCounter.__table__
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[table.c.collector_id, table.c.day],
+                set_={
+                    **{name: table.c[name] + stmt.excluded[name] for name in values},
+                    "updated_at": func.now(),
+                },
+            )
+        )
+
+    async def reconcile_daily_counters(self, day: date) -> int:
+        """
+        Rebuild the collected counters of `day` from `payment` in one
+        upsert and zero rows with no collections left. pending_approval is
+        not derived from payments and is kept. Returns rows corrected.
+        """
+        rates = (await get_rates(self.session)).rates_on(day)
+        commission = func.round(
+            Payment.amount * case(
+                (Policy.payment_plan.in_(CASH_PAYMENT_PLANS), literal(rates.commission_cash)),
+                else_=literal(rates.commission_regular),
+            ),
+            2,
+        )
+        actual = (
             select(
-                func.count(Payment.id).label("count"),
-                func.coalesce(func.sum(Payment.amount), 0).label("total"),
+                Payment.collector_id,
+                literal(day).label("day"),
+                func.count(Payment.id).label("collections_count"),
+                func.sum(Payment.amount).label("collected_amount"),
+                func.coalesce(
+                    func.sum(Payment.amount).filter(Payment.payment_method == "cash"), 0
+                ).label("cash_amount"),
+                func.sum(commission).label("commission_amount"),
             )
-            .where(Payment.collector_id == collector_id)
+            .join(Policy, Payment.policy_id == Policy.id)
             .where(Payment.status == "paid")
-            .where(Payment.actual_date == today)
+            .where(Payment.collector_id.is_not(None))
+            .where(Payment.actual_date == day)
+            .group_by(Payment.collector_id)
+        )
+        columns = ["collector_id", "day", "collections_count",
+                   "collected_amount", "cash_amount", "commission_amount"]
+        counted = columns[2:]
+        table = CollectorDailyCounter.__table__
+        stmt = pg_insert(CollectorDailyCounter).from_select(columns, actual)
+        upsert = stmt.on_conflict_do_update(
+            index_elements=[table.c.collector_id, table.c.day],
+            set_={**{c: stmt.excluded[c] for c in counted}, "updated_at": func.now()},
+            where=tuple_(*[table.c[c] for c in counted]).is_distinct_from(
+                tuple_(*[stmt.excluded[c] for c in counted])
+            ),
+        ).returning(table.c.collector_id)
+        fixed = len((await self.session.execute(upsert)).all())
+
+        has_collections = (
+            select(Payment.id)
+            .where(Payment.collector_id == CollectorDailyCounter.collector_id)
+            .where(Payment.status == "paid")
+            .where(Payment.actual_date == day)
+            .exists()
+        )
+        zeroed = await self.session.execute(
+            update(CollectorDailyCounter)
+            .where(CollectorDailyCounter.day == day)
+            .where(CollectorDailyCounter.collections_count != 0)
+            .where(~has_collections)
+            .values(
+                collections_count=0, collected_amount=0,
+                cash_amount=0, commission_amount=0,
+            )
+        )
+        return fixed + zeroed.rowcount
+
+    async def get_route_stops(self, collector_code: str) -> list:
+        """
+        Cards with a pending payment plus the client's coordinates, in the
+        default (due date) order. lat/lng are NULL for non-geocoded addresses.
+        """
+        key_expr, _ = _card_sort_expr(None)
+        query = (
+            self._cards_query(collector_code)
+            .outerjoin(Address, Client.address_id == Address.id)
+            .add_columns(
+                func.ST_Y(Address.geom).label("lat"),
+                func.ST_X(Address.geom).label("lng"),
+            )
+            .options(contains_eager(Client.address))
+            .order_by(key_expr.asc(), Policy.id.asc())
+        )
+        result = await self.session.execute(query)
+        return result.all()
+
+    async def get_card_holders(self, policy_id: int) -> List[str]:
+        """Collectors currently holding an active card of the policy."""
+        result = await self.session.execute(
+            select(Card.current_holder)
+            .where(Card.policy_id == policy_id)
+            .where(Card.status == "active")
+        )
+        return list(result.scalars().all())
+
+    async def get_active_collectors(self) -> List[Collector]:
+        result = await self.session.execute(
+            select(Collector)
+            .where(Collector.status == "active")
+            .order_by(Collector.id)
+        )
+        return list(result.scalars().all())
+
+    async def get_geocoded_cards(self, holders: List[str]) -> list:
+        """
+        Active cards held by `holders` whose client address is geocoded:
+        (card_id, folio, current_holder, lat, lng). Plain columns, no ORM
+        entities, so 100k rows load in one round trip.
+        """
+        result = await self.session.execute(
+            select(
+                Card.id.label("card_id"),
+                Policy.folio,
+                Card.current_holder,
+                func.ST_Y(Address.geom).label("lat"),
+                func.ST_X(Address.geom).label("lng"),
+            )
+            .join(Policy, Card.policy_id == Policy.id)
+            .join(Client, Policy.client_id == Client.id)
+            .join(Address, Client.address_id == Address.id)
+            .where(Card.status == "active")
+            .where(Card.current_holder.in_(holders))
+            .where(Address.geom.is_not(None))
+            .order_by(Card.id)
+        )
+        return result.all()
+
+    async def reassign_cards(
+        self,
+        card_ids: List[int],
+        from_holders: List[str],
+        to_holders: List[str],
+        observations: str,
+    ) -> List[int]:
+        """
+        Move cards in one statement: UPDATE card FROM unnest(arrays) and
+        record each move in collection_assignment from the UPDATE's
+        RETURNING rows. A card whose holder changed since it was read
+        (from_holder no longer matches) is left alone. Returns moved ids.
+        """
+        if not card_ids:
+            return []
+        moves = (
+            func.unnest(
+                bindparam("card_ids", card_ids, type_=ARRAY(Integer)),
+                bindparam("from_holders", from_holders, type_=ARRAY(String)),
+                bindparam("to_holders", to_holders, type_=ARRAY(String)),
+            )
+            .table_valued("card_id", "from_holder", "to_holder")
+            .render_derived(name="moves")
         )
-        row = result.one()
-        return {
-            "collections_count": row.count,
-            "collected_amount": float(row.total),
-        }
+        today = date.today()
+        moved = (
+            update(Card)
+            .where(Card.id == moves.c.card_id)
+            .where(Card.current_holder == moves.c.from_holder)
+            .where(Card.status == "active")
+            .values(current_holder=moves.c.to_holder, assignment_date=today)
+            .returning(Card.id, Card.policy_id, Card.current_holder)
+            .cte("moved")
+        )
+        stmt = (
+            insert(CollectionAssignment)
+            .from_select(
+                ["card_id", "policy_id", "assigned_to", "assignment_date", "observations"],
+                select(
+                    moved.c.id, moved.c.policy_id, moved.c.current_holder,
+                    literal(today), literal(observations),
+                ),
+            )
+            .returning(CollectionAssignment.card_id)
+        )
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
 
     async def get_total_payments_for_policy(self, policy_id: int) -> int:
         result = await self.session.execute(
@@ -181,6 +628,88 @@ class CollectionRepository:
         await self.session.flush()
         return payment
 
+    async def get_payments_by_folio_number(
+        self, pairs: List[Tuple[int, int]]
+    ) -> list:
+        """
+        One row per requested policy (by folio) with the matching payment
+        columns, NULL when the folio exists but the payment number does not:
+        (policy_id, folio, payment_plan, payment_id, payment_number, status).
+        """
+        if not pairs:
+            return []
+        result = await self.session.execute(
+            select(
+                Policy.id.label("policy_id"),
+                Policy.folio,
+                Policy.payment_plan,
+                Payment.id.label("payment_id"),
+                Payment.payment_number,
+                Payment.status,
+            )
+            .outerjoin(
+                Payment,
+                and_(
+                    Payment.policy_id == Policy.id,
+                    tuple_(Policy.folio, Payment.payment_number).in_(pairs),
+                ),
+            )
+            .where(Policy.folio.in_({folio for folio, _ in pairs}))
+        )
+        return result.all()
+
+    async def apply_payments(
+        self,
+        payment_ids: List[int],
+        amounts: List[Decimal],
+        methods: List[str],
+        receipt_numbers: List[str],
+        collector_id: int,
+    ) -> List[int]:
+        """
+        Mark many payments as collected in one UPDATE ... FROM unnest().
+        Payments already paid by the time the statement runs are skipped;
+        returns the ids actually updated.
+        """
+        if not payment_ids:
+            return []
+        rows = (
+            func.unnest(
+                bindparam("payment_ids", payment_ids, type_=ARRAY(Integer)),
+                bindparam("amounts", amounts, type_=ARRAY(Numeric(12, 2))),
+                bindparam("methods", methods, type_=ARRAY(String)),
+                bindparam("receipt_numbers", receipt_numbers, type_=ARRAY(String)),
+            )
+            .table_valued("id", "amount", "method", "receipt_number")
+            .render_derived(name="batch")
+        )
+        result = await self.session.execute(
+            update(Payment)
+            .where(Payment.id == rows.c.id)
+            .where(Payment.status != "paid")
+            .values(
+                actual_date=date.today(),
+                amount=rows.c.amount,
+                payment_method=cast(rows.c.method, Payment.payment_method.type),
+                receipt_number=rows.c.receipt_number,
+                status="paid",
+                collector_id=collector_id,
+            )
+            .returning(Payment.id)
+        )
+        return list(result.scalars().all())
+
+    async def get_card_holders_for_policies(self, policy_ids: List[int]) -> List[str]:
+        if not policy_ids:
+            return []
+        result = await self.session.execute(
+            select(Card.current_holder)
+            .distinct()
+            .where(Card.policy_id.in_(policy_ids))
+            .where(Card.status == "active")
+        )
+        return list(result.scalars().all())
+
     async def get_recent_proposals(
         self, collector_id: int, limit: int = 20
     ) -> List[Payment]:
@@ -4,13 +4,19 @@ Claudy ✨ + Fer — 2026-03-02
 
 Endpoints for the collector mobile app.
 """
-from typing import Optional
-from pydantic import BaseModel
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
-from .service import CollectionService
+from app.core.idempotency import IdempotencyStore
+from app.core.permissions import require_permission
+from app.core.redis import get_redis
+from app.modules.settlements.cache import PreviewCache
+from . import cache as card_cache
+from .cache import CardCache
+from .service import MAX_PAYMENT_BATCH, CollectionService
 from .schemas import (
     ApiResponse, DashboardResponse, FolioCard, FolioDetail,
     RouteStop, CashPending,
@@ -20,7 +26,13 @@ router = APIRouter(prefix="/collections", tags=["Collections"])
 
 
 def get_service(session: AsyncSession = Depends(get_db)) -> CollectionService:
-    return CollectionService(session)
+    redis = get_redis()
+    return CollectionService(
+        session,
+        cache=CardCache(redis),
+        idempotency=IdempotencyStore(redis, session),
+        previews=PreviewCache(redis),
+    )
 
 
 # TODO: Replace hardcoded collector_code with JWT user extraction
@@ -38,18 +50,54 @@ async def get_dashboard(
 @router.get("/cards")
 async def get_cards(
     collector_code: str = Query(default="EDGAR"),
-    status: Optional[str] = Query(default=None),
+    status: Optional[str] = Query(
+        default=None,
+        description="Nivel(es) de atraso separados por coma: on_time, low, mid, high",
+    ),
     search: Optional[str] = Query(default=None),
-    sort: Optional[str] = Query(default=None),
+    sort: Optional[str] = Query(default=None, pattern="^(due_date|overdue|amount)$"),
+    cursor: Optional[str] = Query(default=None, description="next_cursor de la página anterior"),
+    limit: int = Query(default=50, ge=1, le=200),
     svc: CollectionService = Depends(get_service),
 ):
-    items = await svc.get_folios(collector_code, status, search, sort)
+    try:
+        page = await svc.get_folios(collector_code, status, search, sort, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return ApiResponse(
-        data=items,
-        meta={"total": len(items), "page": 1, "per_page": len(items)},
+        data=page.items,
+        meta={
+            "total": page.total,
+            "per_page": limit,
+            "next_cursor": page.next_cursor,
+            "has_more": page.next_cursor is not None,
+        },
     )
 
 
+@router.get("/sync")
+async def sync(
+    collector_code: str = Query(default="EDGAR"),
+    since: Optional[str] = Query(
+        default=None,
+        description="`cursor` devuelto por la sincronización anterior; omitir para snapshot completo",
+    ),
+    svc: CollectionService = Depends(get_service),
+):
+    """Delta sync: only cards, policies and payments changed since the cursor."""
+    try:
+        data = await svc.get_sync(collector_code, since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ApiResponse(data=data)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss/stale counters of the card-list cache (this worker)."""
+    return ApiResponse(data=card_cache.stats.as_dict())
+
+
 @router.get("/cards/{folio}")
 async def get_card_detail(
     folio: int,
@@ -64,10 +112,36 @@ async def get_card_detail(
 @router.get("/route")
 async def get_route(
     collector_code: str = Query(default="EDGAR"),
+    lat: Optional[float] = Query(default=None, ge=-90, le=90, description="Posición inicial"),
+    lng: Optional[float] = Query(default=None, ge=-180, le=180, description="Posición inicial"),
+    priority_weight: float = Query(
+        default=0.0, ge=0, le=5,
+        description="km de desvío aceptados por adelantar una posición un mes de atraso",
+    ),
     svc: CollectionService = Depends(get_service),
 ):
-    stops = await svc.get_route(collector_code)
-    return ApiResponse(data=stops)
+    start = (lat, lng) if lat is not None and lng is not None else None
+    plan = await svc.get_route(collector_code, start, priority_weight)
+    return ApiResponse(
+        data=plan.stops,
+        meta={"distance_km": plan.distance_km, "compute_ms": plan.compute_ms},
+    )
+
+
+@router.post("/affinity")
+async def plan_affinity(
+    apply: bool = Query(default=False, description="false = solo calcular el diff"),
+    cap: Optional[int] = Query(default=None, ge=1, description="Máximo de tarjetas por cobrador"),
+    stickiness: Optional[float] = Query(default=None, ge=0, lt=1),
+    current_user=Depends(require_permission("collections.assign")),
+    svc: CollectionService = Depends(get_service),
+):
+    """Batch card-to-collector reassignment by location (dry run unless apply=true)."""
+    plan = await svc.plan_affinity(apply, cap, stickiness)
+    return ApiResponse(
+        data=plan,
+        meta={"moves": len(plan.moves), "compute_ms": plan.compute_ms},
+    )
 
 
 @router.get("/cash")
@@ -81,32 +155,46 @@ async def get_cash(
 
 # ── Proposals (stubs — next phase) ──────────────────────────────────────────
 
-class PaymentRegisterRequest(BaseModel):
+# Map frontend method names to backend enum values
+METHOD_MAP = {
+    "efectivo": "cash",
+    "deposito": "deposit",
+    "transferencia": "transfer",
+    "cash": "cash",
+    "deposit": "deposit",
+    "transfer": "transfer",
+}
+
+
+class PaymentItem(BaseModel):
     folio: str
     payment_number: int
     amount: str
     method: str  # cash, deposit, transfer
     receipt_number: str
+
+
+class PaymentRegisterRequest(PaymentItem):
+    collector_code: str = "EDGAR"  # TODO: from JWT
+
+
+class PaymentBatchRequest(BaseModel):
     collector_code: str = "EDGAR"  # TODO: from JWT
+    items: List[PaymentItem] = Field(min_length=1, max_length=MAX_PAYMENT_BATCH)
 
 
 @router.post("/proposals")
 async def create_proposal(
     req: PaymentRegisterRequest,
+    idempotency_key: Optional[str] = Header(
+        default=None, max_length=255,
+        description="Mismo valor en cada reintento; repite la respuesta original",
+    ),
     svc: CollectionService = Depends(get_service),
 ):
     """Register a payment collection from the mobile app."""
     try:
-        # Map frontend method names to backend enum values
-        method_map = {
-            "efectivo": "cash",
-            "deposito": "deposit",
-            "transferencia": "transfer",
-            "cash": "cash",
-            "deposit": "deposit",
-            "transfer": "transfer",
-        }
-        method = method_map.get(req.method, req.method)
+        method = METHOD_MAP.get(req.method, req.method)
 
         result = await svc.register_payment(
             folio=int(req.folio),
@@ -115,12 +203,34 @@ async def create_proposal(
             method=method,
             receipt_number=req.receipt_number,
             collector_code=req.collector_code,
+            idempotency_key=idempotency_key,
         )
         return ApiResponse(data=result)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/proposals/batch")
+async def create_proposals_batch(
+    req: PaymentBatchRequest,
+    svc: CollectionService = Depends(get_service),
+):
+    """Register a day of collections at once; one result per item, in order."""
+    items = [
+        {**item.model_dump(), "method": METHOD_MAP.get(item.method, item.method)}
+        for item in req.items
+    ]
+    try:
+        results = await svc.register_payments_batch(req.collector_code, items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    applied = sum(1 for r in results if r["status"] == "paid")
+    return ApiResponse(
+        data=results,
+        meta={"total": len(results), "applied": applied, "errors": len(results) - applied},
+    )
+
+
 @router.get("/proposals/mine")
 async def get_my_proposals():
     """TODO: Get proposals submitted by current collector."""
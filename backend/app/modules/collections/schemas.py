@@ -43,6 +43,7 @@ class FolioCard(BaseModel):
     client_name: str
     payment_number: int
     total_payments: int
+    paid_payments: int = 0
     amount: str
     due_date: str
     days_overdue: int
@@ -51,6 +52,12 @@ class FolioCard(BaseModel):
     proposal_status: Optional[str] = None
 
 
+class FolioPage(BaseModel):
+    items: List[FolioCard]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None  # only computed for the first page
+
+
 class FolioDetailClient(BaseModel):
     name: str
     phone: str
@@ -177,10 +184,91 @@ class RouteStop(BaseModel):
     address: str
     lat: Optional[float] = None
     lng: Optional[float] = None
+    leg_km: Optional[float] = None  # from the previous stop; None if not geocoded
     status: str = "pending"  # completed, next, pending
     time: Optional[str] = None
 
 
+class RoutePlan(BaseModel):
+    stops: List[RouteStop]
+    distance_km: float = 0.0
+    compute_ms: float = 0.0
+
+
+# ── Affinity (batch reassignment) ───────────────────────────────────────────
+
+class AffinityMove(BaseModel):
+    card_id: int
+    folio: str
+    from_holder: str
+    to_holder: str
+
+
+class AffinityLoad(BaseModel):
+    collector_code: str
+    capacity: int
+    cards_before: int
+    cards_after: int
+    center_lat: Optional[float] = None
+    center_lng: Optional[float] = None
+
+
+class AffinityPlan(BaseModel):
+    applied: bool = False
+    cards: int = 0  # geocoded active cards considered
+    moves: List[AffinityMove] = []
+    moved: int = 0  # rows actually updated (apply only)
+    unassigned: int = 0  # cards beyond total capacity; keep their holder
+    loads: List[AffinityLoad] = []
+    iterations: int = 0
+    compute_ms: float = 0.0
+
+
+# ── Delta Sync ───────────────────────────────────────────────────────────────
+
+class SyncCard(BaseModel):
+    id: int
+    folio: str
+    status: str
+    assignment_date: Optional[str] = None
+    updated_at: str
+
+
+class SyncPolicy(BaseModel):
+    folio: str
+    client_name: str
+    client_phone: str = ""
+    status: str
+    start_date: str = ""
+    end_date: str = ""
+    updated_at: str
+
+
+class SyncPayment(BaseModel):
+    id: int
+    folio: str
+    number: int
+    amount: str
+    due_date: str = ""
+    paid_date: Optional[str] = None
+    status: str
+    updated_at: str
+
+
+class SyncTombstone(BaseModel):
+    card_id: int
+    folio: str
+
+
+class SyncResponse(BaseModel):
+    cursor: str  # pass as ?since= on the next sync
+    full: bool = False  # True when `since` was omitted (snapshot)
+    cards: List[SyncCard] = []
+    policies: List[SyncPolicy] = []
+    payments: List[SyncPayment] = []
+    removed: List[SyncTombstone] = []
+
+
 # ── API Response Wrapper ─────────────────────────────────────────────────────
 
 class ApiResponse(BaseModel):
@@ -5,19 +5,47 @@ Claudy ✨ + Fer — 2026-03-02
 Design: policy status is COMPUTED, not stored.
 Payment late/overdue is computed from due_date vs today.
 """
-from datetime import date, datetime
+import asyncio
+import base64
+import json
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
 from typing import Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .repository import CollectionRepository
+from app.core.config import get_settings
+from app.core.idempotency import IdempotencyStore, request_hash
+from app.models.policy import Payment
+from app.modules.settlements.cache import PreviewCache
+from app.modules.settlements.rates import get_rates
+from . import counters
+from .affinity import assign_cards
+from .cache import CardCache
+from .repository import CollectionRepository, card_sort_key
+from .routing import plan_route
 from .schemas import (
     DashboardResponse, DashboardSummary,
-    FolioCard, FolioDetail,
+    FolioCard, FolioPage, FolioDetail,
     FolioDetailClient, FolioDetailVehicle, FolioDetailPolicy, FolioDetailPayment,
-    RouteStop, CashPending,
+    RouteStop, RoutePlan, CashPending,
+    AffinityMove, AffinityLoad, AffinityPlan,
+    SyncResponse, SyncCard, SyncPolicy, SyncPayment, SyncTombstone,
 )
 
 
+DEFAULT_PAGE_SIZE = 50
+
+# updated_at is stamped with the writing transaction's start time, so a row
+# committed just after a sync can carry an older timestamp. Rewinding the
+# cursor by this window re-sends those rows; clients upsert, so repeats are
+# harmless.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+MAX_PAYMENT_BATCH = 1000
+PAYMENT_METHODS = frozenset(Payment.payment_method.type.enums)
+RECEIPT_NUMBER_MAX_LEN = Payment.receipt_number.type.length
+
+
 def _overdue_level(days: int, status: str) -> str:
     """Compute overdue level from days overdue."""
     if status == "paid":
@@ -31,6 +59,22 @@ def _overdue_level(days: int, status: str) -> str:
     return "high"
 
 
+def _encode_cursor(key, policy_id: int) -> str:
+    """Opaque keyset cursor: base64(JSON [sort_key, policy_id])."""
+    raw = json.dumps([str(key), policy_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str, sort: Optional[str]) -> tuple:
+    try:
+        key, policy_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort == "amount":
+            return Decimal(key), int(policy_id)
+        return date.fromisoformat(key), int(policy_id)
+    except (ValueError, TypeError, ArithmeticError):
+        raise ValueError("Cursor inválido")
+
+
 def _format_money(amount) -> str:
     if amount is None:
         return "0.00"
@@ -61,33 +105,46 @@ def _computed_policy_status(policy, payments) -> str:
 
 
 class CollectionService:
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        cache: Optional[CardCache] = None,
+        idempotency: Optional[IdempotencyStore] = None,
+        previews: Optional[PreviewCache] = None,
+    ):
         self.repo = CollectionRepository(session)
         self.session = session
+        self.cache = cache
+        self.idempotency = idempotency
+        self.previews = previews
 
     async def get_dashboard(self, collector_code: str) -> DashboardResponse:
-        collector = await self.repo.get_collector_by_code(collector_code)
-        if not collector:
+        today = date.today()
+        found = await self.repo.get_dashboard_counters(collector_code, today)
+        if not found:
             return DashboardResponse(
                 collector_name="Desconocido",
-                date=date.today().isoformat(),
+                date=today.isoformat(),
                 summary=DashboardSummary(),
             )
 
-        today = date.today()
-        stats = await self.repo.get_collector_stats(collector.id, today)
+        collector, counter = found
+        # No row yet means no activity today: all counters at zero
+        counter = counter or counters.CounterDelta()
 
         return DashboardResponse(
             collector_name=collector.full_name or collector.code_name,
             date=today.isoformat(),
+            # Cash collected today is not cash pending delivery: that needs
+            # the proposal approval flow (approved cash not yet handed in)
             cash_pending="0.00",  # TODO: compute from approved cash proposals
             cash_limit=None,
             cash_pct=0.0,
             summary=DashboardSummary(
-                collections_count=stats["collections_count"],
-                collected_amount=_format_money(stats["collected_amount"]),
-                pending_approval=0,  # TODO: count pending proposals
-                commission_today="0.00",  # TODO: compute commission
+                collections_count=counter.collections_count,
+                collected_amount=_format_money(counter.collected_amount),
+                pending_approval=counter.pending_approval,  # 0 until proposals are approved
+                commission_today=_format_money(counter.commission_amount),
             ),
         )
 
@@ -97,27 +154,42 @@ class CollectionService:
         status_filter: Optional[str] = None,
         search: Optional[str] = None,
         sort: Optional[str] = None,
-    ) -> List[FolioCard]:
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> FolioPage:
+        """
+        One page of the collector's cards, sorted in SQL.
+        `cursor` is the opaque `next_cursor` of the previous page.
+        """
+        after = _decode_cursor(cursor, sort) if cursor else None
+
+        # Free-text searches are too varied to be worth caching
+        use_cache = self.cache is not None and not search
+        if use_cache:
+            cached = await self.cache.get(collector_code, status_filter, sort, cursor, limit)
+            if cached is not None:
+                return cached
+
+        # Fetch one extra row to know whether there is a next page
         rows = await self.repo.get_cards_for_collector(
-            collector_code, status_filter, search
+            collector_code, status_filter, search,
+            sort=sort, after=after, limit=limit + 1,
         )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
 
         cards = []
         today = date.today()
 
-        for card, policy, client, payment in rows:
-            if not payment:
-                # No pending payment — fully paid
-                continue
-
+        for card, policy, client, payment, total_payments, paid_payments in rows:
             days = max(0, (today - payment.due_date).days) if payment.due_date else 0
-            total_payments = await self.repo.get_total_payments_for_policy(policy.id)
 
             cards.append(FolioCard(
                 folio=str(policy.folio),
                 client_name=client.full_name,
                 payment_number=payment.payment_number,
                 total_payments=total_payments,
+                paid_payments=paid_payments,
                 amount=_format_money(payment.amount),
                 due_date=payment.due_date.isoformat() if payment.due_date else "",
                 days_overdue=days,
@@ -126,14 +198,97 @@ class CollectionService:
                 proposal_status=None,
             ))
 
-        # Sort
-        if sort == "overdue":
-            cards.sort(key=lambda c: c.days_overdue, reverse=True)
-        elif sort == "amount":
-            cards.sort(key=lambda c: float(c.amount), reverse=True)
-        # Default: already sorted by due_date from query
+        next_cursor = None
+        if has_more:
+            _, last_policy, _, last_payment, _, _ = rows[-1]
+            next_cursor = _encode_cursor(
+                card_sort_key(sort, last_payment), last_policy.id
+            )
 
-        return cards
+        # Total only on the first page — later pages reuse the client's copy
+        total = None
+        if cursor is None:
+            total = (
+                len(cards) if not has_more
+                else await self.repo.count_cards_for_collector(
+                    collector_code, status_filter, search
+                )
+            )
+
+        page = FolioPage(items=cards, next_cursor=next_cursor, total=total)
+        if use_cache:
+            await self.cache.set(collector_code, status_filter, sort, cursor, limit, page)
+        return page
+
+    async def get_sync(
+        self, collector_code: str, since: Optional[str] = None
+    ) -> SyncResponse:
+        """
+        Delta sync for the mobile app's local store: cards, policies and
+        payments changed after `since`, plus tombstones for cards that were
+        reassigned away. Without `since` it returns a full snapshot.
+        """
+        since_dt = None
+        if since:
+            try:
+                since_dt = datetime.fromisoformat(since)
+            except ValueError:
+                raise ValueError("Cursor de sincronización inválido")
+            if since_dt.tzinfo is None:
+                raise ValueError("Cursor de sincronización inválido")
+
+        now = await self.repo.get_db_now()
+        cards = await self.repo.get_changed_cards(collector_code, since_dt)
+        policies = await self.repo.get_changed_policies(collector_code, since_dt)
+        payments = await self.repo.get_changed_payments(collector_code, since_dt)
+        removed = (
+            await self.repo.get_card_tombstones(collector_code, since_dt)
+            if since_dt is not None else []
+        )
+
+        return SyncResponse(
+            # UTC with "Z" so the cursor survives un-encoded query strings
+            cursor=(now - SYNC_OVERLAP).astimezone(timezone.utc).isoformat().replace("+00:00", "Z"),
+            full=since_dt is None,
+            cards=[
+                SyncCard(
+                    id=c.id,
+                    folio=str(c.folio),
+                    status=c.status,
+                    assignment_date=c.assignment_date.isoformat() if c.assignment_date else None,
+                    updated_at=c.updated_at.isoformat(),
+                )
+                for c in cards
+            ],
+            policies=[
+                SyncPolicy(
+                    folio=str(p.folio),
+                    client_name=" ".join(
+                        n for n in (p.first_name, p.paternal_surname, p.maternal_surname) if n
+                    ),
+                    client_phone=p.phone_1 or "",
+                    status=p.status,
+                    start_date=p.effective_date.isoformat() if p.effective_date else "",
+                    end_date=p.expiration_date.isoformat() if p.expiration_date else "",
+                    updated_at=p.updated_at.isoformat(),
+                )
+                for p in policies
+            ],
+            payments=[
+                SyncPayment(
+                    id=pay.id,
+                    folio=str(pay.folio),
+                    number=pay.payment_number,
+                    amount=_format_money(pay.amount),
+                    due_date=pay.due_date.isoformat() if pay.due_date else "",
+                    paid_date=pay.actual_date.isoformat() if pay.actual_date else None,
+                    status=pay.status,
+                    updated_at=pay.updated_at.isoformat(),
+                )
+                for pay in payments
+            ],
+            removed=[SyncTombstone(card_id=r.id, folio=str(r.folio)) for r in removed],
+        )
 
     async def get_folio_detail(self, folio: int) -> Optional[FolioDetail]:
         policy = await self.repo.get_policy_by_folio(folio)
@@ -190,25 +345,143 @@ class CollectionService:
             ),
         )
 
-    async def get_route(self, collector_code: str) -> List[RouteStop]:
-        """Build route from cards assigned to collector, ordered by due date."""
-        rows = await self.repo.get_cards_for_collector(collector_code)
+    async def plan_affinity(
+        self,
+        apply: bool = False,
+        cap: Optional[int] = None,
+        stickiness: Optional[float] = None,
+    ) -> AffinityPlan:
+        """
+        Rebalance the geocoded active cards of all active collectors with
+        affinity.assign_cards. Capacity per collector is `cap` (or
+        AFFINITY_CARD_CAP) when set, otherwise Collector.receipt_limit.
+        Dry run by default: returns the diff. With `apply` the moves are
+        written in one statement and the affected card caches dropped.
+        """
+        settings = get_settings()
+        cap = cap or settings.AFFINITY_CARD_CAP or None
+        if stickiness is None:
+            stickiness = settings.AFFINITY_STICKINESS
+
+        collectors = await self.repo.get_active_collectors()
+        codes = [c.code_name for c in collectors]
+        index = {code: i for i, code in enumerate(codes)}
+        capacity = [cap if cap else c.receipt_limit for c in collectors]
+        rows = await self.repo.get_geocoded_cards(codes)
+
+        result = await asyncio.to_thread(
+            assign_cards,
+            [r.lat for r in rows],
+            [r.lng for r in rows],
+            [index[r.current_holder] for r in rows],
+            capacity,
+            stickiness,
+        )
 
-        stops = []
-        for i, (card, policy, client, payment) in enumerate(rows):
-            if not payment:
+        moves = []
+        after = [0] * len(codes)
+        before = [0] * len(codes)
+        for row, target in zip(rows, result.assignment.tolist()):
+            before[index[row.current_holder]] += 1
+            if target < 0:
+                after[index[row.current_holder]] += 1
                 continue
-            stops.append(RouteStop(
+            after[target] += 1
+            if codes[target] != row.current_holder:
+                moves.append(AffinityMove(
+                    card_id=row.card_id,
+                    folio=str(row.folio),
+                    from_holder=row.current_holder,
+                    to_holder=codes[target],
+                ))
+
+        moved = 0
+        if apply and moves:
+            moved_ids = await self.repo.reassign_cards(
+                [m.card_id for m in moves],
+                [m.from_holder for m in moves],
+                [m.to_holder for m in moves],
+                "Reasignación por afinidad",
+            )
+            moved = len(moved_ids)
+            if self.cache is not None:
+                await self.session.commit()
+                await self.cache.invalidate(
+                    *{code for m in moves for code in (m.from_holder, m.to_holder)}
+                )
+
+        loads = [
+            AffinityLoad(
+                collector_code=code,
+                capacity=capacity[i],
+                cards_before=before[i],
+                cards_after=after[i],
+                center_lat=round(float(result.centers[i, 0]), 6) if rows else None,
+                center_lng=round(float(result.centers[i, 1]), 6) if rows else None,
+            )
+            for i, code in enumerate(codes)
+        ]
+        return AffinityPlan(
+            applied=apply,
+            cards=len(rows),
+            moves=moves,
+            moved=moved,
+            unassigned=int((result.assignment < 0).sum()),
+            loads=loads,
+            iterations=result.iterations,
+            compute_ms=result.compute_ms,
+        )
+
+    async def get_route(
+        self,
+        collector_code: str,
+        start: Optional[tuple] = None,
+        priority_weight: float = 0.0,
+    ) -> RoutePlan:
+        """
+        Optimized visiting order for the collector's pending cards.
+        Geocoded stops are ordered by routing.plan_route (from `start` if
+        given); stops without coordinates follow in due-date order.
+        """
+        rows = await self.repo.get_route_stops(collector_code)
+        today = date.today()
+
+        located, unlocated = [], []
+        for row in rows:
+            (located if row.lat is not None else unlocated).append(row)
+
+        planned = await asyncio.to_thread(
+            plan_route,
+            [(r.lat, r.lng) for r in located],
+            [
+                max(0, (today - r.Payment.due_date).days) if r.Payment.due_date else 0
+                for r in located
+            ],
+            start,
+            priority_weight,
+        )
+
+        ordered = [(located[k], leg) for k, leg in zip(planned.order, planned.leg_km)]
+        ordered += [(r, None) for r in unlocated]
+
+        stops = [
+            RouteStop(
                 order=i + 1,
-                folio=str(policy.folio),
-                client_name=client.full_name,
-                address=client.full_address,
-                lat=None,
-                lng=None,
+                folio=str(row.Policy.folio),
+                client_name=row.Client.full_name,
+                address=row.Client.full_address,
+                lat=row.lat,
+                lng=row.lng,
+                leg_km=leg,
                 status="pending",
-            ))
-
-        return stops
+            )
+            for i, (row, leg) in enumerate(ordered)
+        ]
+        return RoutePlan(
+            stops=stops,
+            distance_km=planned.distance_km,
+            compute_ms=planned.compute_ms,
+        )
 
     async def get_cash_pending(self, collector_code: str) -> CashPending:
         """Cash pending to deliver to office."""
@@ -223,8 +496,46 @@ class CollectionService:
         method: str,
         receipt_number: str,
         collector_code: str,
+        idempotency_key: Optional[str] = None,
+    ) -> dict:
+        """
+        Register a payment collection (proposal → direct apply for now).
+        With `idempotency_key` a retry replays the first result instead of
+        failing with "ya está pagado".
+        """
+        args = (folio, payment_number, amount, method, receipt_number, collector_code)
+        if not idempotency_key or self.idempotency is None:
+            return await self._register_payment(*args)
+
+        scope = f"proposals:{collector_code}"
+        req_hash = request_hash(folio, payment_number, _format_money(amount), method, receipt_number)
+        replay = await self.idempotency.begin(scope, idempotency_key, req_hash)
+        if replay is not None:
+            return replay
+        try:
+            return await self._register_payment(*args, (scope, idempotency_key, req_hash))
+        except ValueError:
+            # Without Redis a concurrent retry may have paid it under this
+            # key meanwhile ("ya está pagado"): replay that instead
+            replay = await self.idempotency.committed(scope, idempotency_key, req_hash)
+            if replay is not None:
+                return replay
+            await self.idempotency.release(scope, idempotency_key)
+            raise
+        except BaseException:
+            await self.idempotency.release(scope, idempotency_key)
+            raise
+
+    async def _register_payment(
+        self,
+        folio: int,
+        payment_number: int,
+        amount: float,
+        method: str,
+        receipt_number: str,
+        collector_code: str,
+        idempotency: Optional[tuple] = None,
     ) -> dict:
-        """Register a payment collection (proposal → direct apply for now)."""
         # Get policy
         policy = await self.repo.get_policy_by_folio(folio)
         if not policy:
@@ -253,8 +564,14 @@ class CollectionService:
             receipt_number=receipt_number,
             collector_id=collector.id,
         )
+        today = date.today()
+        rates = (await get_rates(self.session)).rates_on(today)
+        await self.repo.apply_counter_delta(
+            collector.id, today,
+            counters.registered(amount, method, policy.payment_plan, rates),
+        )
 
-        return {
+        result = {
             "id": updated.id,
             "folio": str(folio),
             "payment_number": payment_number,
@@ -264,3 +581,148 @@ class CollectionService:
             "status": "paid",
             "message": f"Pago #{payment_number} registrado exitosamente",
         }
+        if idempotency is not None:
+            # Same transaction as the payment: committed together or not at all
+            replay = await self.idempotency.stage(*idempotency, result)
+            if replay is not None:
+                # A concurrent retry committed first; this attempt was rolled back
+                return replay
+
+        # Commit before invalidating so a concurrent card-list read cannot
+        # re-cache the pre-payment state between invalidation and commit;
+        # likewise the replayable response is only published once durable.
+        if self.cache is not None or self.previews is not None or idempotency is not None:
+            holders = await self.repo.get_card_holders(policy.id) if self.cache else []
+            await self.session.commit()
+            if self.cache is not None:
+                await self.cache.invalidate(collector_code, *holders)
+            if self.previews is not None:
+                await self.previews.invalidate(collector_code)
+            if idempotency is not None:
+                await self.idempotency.publish(*idempotency, result)
+
+        return result
+
+    async def register_payments_batch(
+        self, collector_code: str, items: List[dict]
+    ) -> List[dict]:
+        """
+        Register many collected payments (end-of-day upload) in one
+        transaction: one lookup for all (folio, payment_number) pairs, one
+        UPDATE for every valid item. Each item gets its own result; an
+        invalid item does not block the rest.
+        """
+        if len(items) > MAX_PAYMENT_BATCH:
+            raise ValueError(f"Máximo {MAX_PAYMENT_BATCH} pagos por lote")
+
+        collector = await self.repo.get_collector_by_code(collector_code)
+        if not collector:
+            raise ValueError(f"Cobrador {collector_code} no encontrado")
+
+        def error(index: int, item: dict, message: str) -> dict:
+            return {
+                "index": index,
+                "folio": str(item.get("folio")),
+                "payment_number": item.get("payment_number"),
+                "status": "error",
+                "message": message,
+            }
+
+        results: List[Optional[dict]] = [None] * len(items)
+        candidates = []
+        for i, item in enumerate(items):
+            try:
+                folio = int(item["folio"])
+            except (TypeError, ValueError):
+                results[i] = error(i, item, f"Folio {item.get('folio')} inválido")
+                continue
+            try:
+                amount = Decimal(str(item["amount"]))
+                if not amount.is_finite():
+                    # NaN / Infinity parse fine but cannot be compared or stored
+                    raise InvalidOperation
+                amount = amount.quantize(Decimal("0.01"))
+            except (InvalidOperation, TypeError, ValueError):
+                amount = None
+            if amount is None or amount <= 0:
+                results[i] = error(i, item, "Monto inválido")
+            elif item["method"] not in PAYMENT_METHODS:
+                results[i] = error(i, item, f"Método de pago inválido: {item['method']}")
+            elif len(item["receipt_number"]) > RECEIPT_NUMBER_MAX_LEN:
+                results[i] = error(i, item, "Número de recibo demasiado largo")
+            else:
+                candidates.append((i, folio, amount))
+
+        rows = await self.repo.get_payments_by_folio_number(
+            list({(folio, items[i]["payment_number"]) for i, folio, _ in candidates})
+        )
+        known_folios = {row.folio for row in rows}
+        payments = {
+            (row.folio, row.payment_number): row for row in rows if row.payment_id is not None
+        }
+
+        seen = set()
+        to_apply = []
+        for i, folio, amount in candidates:
+            number = items[i]["payment_number"]
+            row = payments.get((folio, number))
+            if (folio, number) in seen:
+                results[i] = error(i, items[i], f"Pago #{number} duplicado en el lote")
+            elif folio not in known_folios:
+                results[i] = error(i, items[i], f"Folio {folio} no encontrado")
+            elif row is None:
+                results[i] = error(i, items[i], f"Pago #{number} no encontrado para folio {folio}")
+            elif row.status == "paid":
+                results[i] = error(i, items[i], f"Pago #{number} ya está pagado")
+            else:
+                to_apply.append((i, row, amount))
+            seen.add((folio, number))
+
+        applied = set(await self.repo.apply_payments(
+            [row.payment_id for _, row, _ in to_apply],
+            [amount for _, _, amount in to_apply],
+            [items[i]["method"] for i, _, _ in to_apply],
+            [items[i]["receipt_number"] for i, _, _ in to_apply],
+            collector.id,
+        ))
+
+        if applied:
+            today = date.today()
+            rates = (await get_rates(self.session)).rates_on(today)
+            await self.repo.apply_counter_delta(
+                collector.id, today,
+                counters.total(
+                    counters.registered(amount, items[i]["method"], row.payment_plan, rates)
+                    for i, row, amount in to_apply if row.payment_id in applied
+                ),
+            )
+
+        for i, row, amount in to_apply:
+            item = items[i]
+            if row.payment_id not in applied:
+                # Paid by a concurrent request between lookup and update
+                results[i] = error(i, item, f"Pago #{row.payment_number} ya está pagado")
+                continue
+            results[i] = {
+                "index": i,
+                "id": row.payment_id,
+                "folio": str(row.folio),
+                "payment_number": row.payment_number,
+                "amount": _format_money(amount),
+                "method": item["method"],
+                "receipt_number": item["receipt_number"],
+                "status": "paid",
+                "message": f"Pago #{row.payment_number} registrado exitosamente",
+            }
+
+        if applied and (self.cache is not None or self.previews is not None):
+            holders = await self.repo.get_card_holders_for_policies(
+                list({row.policy_id for _, row, _ in to_apply if row.payment_id in applied})
+            ) if self.cache else []
+            await self.session.commit()
+            if self.cache is not None:
+                await self.cache.invalidate(collector_code, *holders)
+            if self.previews is not None:
+                await self.previews.invalidate(collector_code)
+
+        return results
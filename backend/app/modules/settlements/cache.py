@@ -0,0 +1,143 @@
+"""
+Settlement Module — Redis cache for settlement previews
+
+Each collector has one Redis hash `settlements:preview:{code}` whose fields
+are the serialized SettlementPreview for a `rate_version|period_start|period_end`.
+A hit is a single HGET. The rate snapshot version is part of the field, so a
+change of rates or goals (which bumps rate_version) makes every cached
+preview unreachable without touching Redis; anything that changes a preview (a payment of the
+collector, a loan installment, a settlement or manual deduction) drops
+the collector's whole hash with a single DEL, so every period is
+recomputed on the next open. SETTLEMENT_PREVIEW_CACHE_TTL bounds how long
+a hash can live if an invalidation is missed (e.g. a loan edited in SQL).
+"""
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Awaitable, Callable, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import get_settings
+from .schemas import SettlementPreview
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "settlements:preview:"
+
+
+@dataclass
+class PreviewCacheStats:
+    hits: int = 0
+    misses: int = 0
+    errors: int = 0
+    recomputes: int = 0
+    recompute_ms_total: float = 0.0
+    recompute_ms_max: float = 0.0
+
+    def record_recompute(self, elapsed_ms: float) -> None:
+        self.recomputes += 1
+        self.recompute_ms_total += elapsed_ms
+        self.recompute_ms_max = max(self.recompute_ms_max, elapsed_ms)
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "recomputes": self.recomputes,
+            "recompute_ms_avg": (
+                round(self.recompute_ms_total / self.recomputes, 1) if self.recomputes else 0.0
+            ),
+            "recompute_ms_max": round(self.recompute_ms_max, 1),
+        }
+
+
+# Per-process counters, exposed by GET /settlements/cache/stats
+stats = PreviewCacheStats()
+
+
+def _field(rate_version: int, period_start: date, period_end: date) -> str:
+    return f"{rate_version}|{period_start.isoformat()}|{period_end.isoformat()}"
+
+
+class PreviewCache:
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.ttl = get_settings().SETTLEMENT_PREVIEW_CACHE_TTL
+
+    async def get(
+        self,
+        collector_code: str,
+        period_start: date,
+        period_end: date,
+        rate_version: int = 0,
+    ) -> Optional[SettlementPreview]:
+        try:
+            raw = await self.redis.hget(
+                KEY_PREFIX + collector_code, _field(rate_version, period_start, period_end)
+            )
+        except RedisError:
+            stats.errors += 1
+            logger.warning("Redis no disponible; preview de %s desde BD", collector_code)
+            return None
+
+        if raw is None:
+            stats.misses += 1
+            return None
+
+        stats.hits += 1
+        return SettlementPreview.model_validate_json(raw)
+
+    async def get_or_compute(
+        self,
+        collector_code: str,
+        period_start: date,
+        period_end: date,
+        compute: Callable[[], Awaitable[SettlementPreview]],
+        rate_version: int = 0,
+    ) -> SettlementPreview:
+        """Cached preview, or `compute()` timed and stored on a miss."""
+        preview = await self.get(collector_code, period_start, period_end, rate_version)
+        if preview is not None:
+            return preview
+
+        t0 = time.perf_counter()
+        preview = await compute()
+        stats.record_recompute((time.perf_counter() - t0) * 1000)
+
+        await self.set(collector_code, period_start, period_end, preview, rate_version)
+        return preview
+
+    async def set(
+        self,
+        collector_code: str,
+        period_start: date,
+        period_end: date,
+        preview: SettlementPreview,
+        rate_version: int = 0,
+    ) -> None:
+        key = KEY_PREFIX + collector_code
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(key, _field(rate_version, period_start, period_end), preview.model_dump_json())
+                # Only arm the TTL on a fresh hash so it bounds the snapshot's age
+                pipe.expire(key, self.ttl, nx=True)
+                await pipe.execute()
+        except RedisError:
+            stats.errors += 1
+
+    async def invalidate(self, *collector_codes: str) -> None:
+        """Drop every cached preview of the given collectors."""
+        keys = [KEY_PREFIX + code for code in set(collector_codes) if code]
+        if not keys:
+            return
+        try:
+            await self.redis.delete(*keys)
+        except RedisError:
+            stats.errors += 1
+            logger.warning("No se pudo invalidar el preview en Redis: %s", keys)
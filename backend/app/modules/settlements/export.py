@@ -0,0 +1,353 @@
+"""
+Settlement Module — Export de liquidaciones (CSV / XLSX)
+
+Tres secciones para contabilidad, todas filtradas por rango de períodos:
+- settlements: encabezado de cada liquidación
+- deductions:  detalle de settlement_deduction
+- payments:    trazabilidad de settlement_payment (pago -> comisión)
+
+Cada sección se lee con un cursor del servidor (`AsyncSession.stream` con
+yield_per), así la memoria no crece con el rango: un año completo de
+historial se escribe de a STREAM_CHUNK filas. XLSX usa el modo write_only
+de openpyxl (las filas van a disco, no a memoria) con una hoja por sección;
+openpyxl es síncrono, así que cada lote y el guardado corren en el
+threadpool para no bloquear el event loop.
+
+Los recibos imprimibles (PDF, uno por liquidación) se generan en el worker
+de Celery con `write_receipts_pdf` (ver app.tasks.reports). Los archivos
+quedan en EXPORT_DIR y el worker borra los que pasan de REPORT_JOB_TTL.
+"""
+import csv
+import io
+import os
+import tempfile
+import time
+from datetime import date
+from enum import Enum
+from typing import AsyncIterator, Dict, Iterable, List, Tuple
+
+from openpyxl import Workbook
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import get_settings
+from app.models import Employee, EmployeeRole, CollectorProfile, Payment, Policy
+from app.models.settlement import Settlement, SettlementDeduction, SettlementPayment
+from .pdf import PdfWriter, ReceiptLine, fmt_date, money, paginate
+
+STREAM_CHUNK = 1000
+FILE_CHUNK = 64 * 1024
+
+EXPORT_FORMATS = ("csv", "xlsx")
+
+
+def _full_name():
+    # Employee.full_name es una propiedad de Python; aquí se arma en SQL
+    return func.concat_ws(" ", Employee.first_name, Employee.last_name).label("full_name")
+
+
+def _in_range(query: Select, date_from: date, date_to: date) -> Select:
+    # Usa idx_settlement_period (period_start, period_end)
+    return query.where(
+        Settlement.period_start >= date_from,
+        Settlement.period_end <= date_to,
+    )
+
+
+def _with_employee(query: Select) -> Select:
+    return (
+        query
+        .outerjoin(EmployeeRole, Settlement.employee_role_id == EmployeeRole.id)
+        .outerjoin(Employee, EmployeeRole.employee_id == Employee.id)
+        .outerjoin(CollectorProfile, CollectorProfile.employee_role_id == EmployeeRole.id)
+    )
+
+
+def settlements_query(date_from: date, date_to: date) -> Select:
+    query = select(
+        Settlement.id.label("settlement_id"),
+        CollectorProfile.code.label("code"),
+        _full_name(),
+        Settlement.period_start,
+        Settlement.period_end,
+        Settlement.commission_regular,
+        Settlement.commission_cash,
+        Settlement.commission_delivery,
+        Settlement.total_commissions,
+        Settlement.deduction_fuel,
+        Settlement.deduction_loan,
+        Settlement.deduction_shortage,
+        Settlement.deduction_other,
+        Settlement.total_deductions,
+        Settlement.net_amount,
+        Settlement.amount_paid,
+        Settlement.status,
+        Settlement.payment_method,
+        Settlement.paid_at,
+        Settlement.notes,
+    ).select_from(Settlement)
+    return _in_range(_with_employee(query), date_from, date_to).order_by(Settlement.id)
+
+
+def deductions_query(date_from: date, date_to: date) -> Select:
+    query = (
+        select(
+            SettlementDeduction.settlement_id,
+            CollectorProfile.code.label("code"),
+            Settlement.period_start,
+            Settlement.period_end,
+            SettlementDeduction.deduction_type,
+            SettlementDeduction.concept,
+            SettlementDeduction.amount,
+            SettlementDeduction.loan_id,
+            SettlementDeduction.notes,
+        )
+        .select_from(SettlementDeduction)
+        .join(Settlement, SettlementDeduction.settlement_id == Settlement.id)
+    )
+    return (
+        _in_range(_with_employee(query), date_from, date_to)
+        .order_by(SettlementDeduction.settlement_id, SettlementDeduction.id)
+    )
+
+
+def payments_query(date_from: date, date_to: date) -> Select:
+    query = (
+        select(
+            SettlementPayment.settlement_id,
+            CollectorProfile.code.label("code"),
+            Settlement.period_start,
+            Settlement.period_end,
+            SettlementPayment.payment_id,
+            Policy.folio,
+            Payment.payment_number,
+            Payment.actual_date,
+            SettlementPayment.commission_type,
+            SettlementPayment.amount_collected,
+            SettlementPayment.commission_amount,
+        )
+        .select_from(SettlementPayment)
+        .join(Settlement, SettlementPayment.settlement_id == Settlement.id)
+        .join(Payment, SettlementPayment.payment_id == Payment.id)
+        .join(Policy, Payment.policy_id == Policy.id)
+    )
+    return (
+        _in_range(_with_employee(query), date_from, date_to)
+        .order_by(SettlementPayment.settlement_id, SettlementPayment.id)
+    )
+
+
+SECTIONS: Dict[str, Tuple[str, object]] = {
+    "settlements": ("Liquidaciones", settlements_query),
+    "deductions": ("Deducciones", deductions_query),
+    "payments": ("Pagos", payments_query),
+}
+
+
+def _cell(value):
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+async def _stream_rows(
+    session: AsyncSession,
+    section: str,
+    date_from: date,
+    date_to: date,
+) -> AsyncIterator[Tuple[List[str], Iterable[tuple]]]:
+    """(encabezados, lote de filas) de una sección, leyendo con cursor del servidor."""
+    _, build = SECTIONS[section]
+    result = await session.stream(
+        build(date_from, date_to).execution_options(yield_per=STREAM_CHUNK)
+    )
+    columns = list(result.keys())
+    async for partition in result.partitions():
+        yield columns, ([_cell(v) for v in row] for row in partition)
+
+
+async def stream_csv(
+    session: AsyncSession,
+    section: str,
+    date_from: date,
+    date_to: date,
+) -> AsyncIterator[str]:
+    """CSV de una sección, un bloque de texto por lote del cursor."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+
+    async for columns, rows in _stream_rows(session, section, date_from, date_to):
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if not header_written:
+        # Sin filas: igual devolver encabezados
+        _, build = SECTIONS[section]
+        writer.writerow([c.name for c in build(date_from, date_to).selected_columns])
+        yield buffer.getvalue()
+
+
+def _append_rows(sheet, rows: Iterable[list]) -> None:
+    for row in rows:
+        sheet.append(row)
+
+
+async def write_xlsx(
+    session: AsyncSession,
+    date_from: date,
+    date_to: date,
+) -> str:
+    """
+    Escribe un XLSX con una hoja por sección a un archivo en EXPORT_DIR y
+    devuelve su ruta (el llamador lo envía con `iter_file` y lo borra; si
+    la descarga se corta, la limpieza periódica lo borra).
+    """
+    workbook = Workbook(write_only=True)
+    for section, (title, build) in SECTIONS.items():
+        sheet = workbook.create_sheet(title)
+        sheet.append([c.name for c in build(date_from, date_to).selected_columns])
+        async for _, rows in _stream_rows(session, section, date_from, date_to):
+            await run_in_threadpool(_append_rows, sheet, list(rows))
+
+    export_dir = get_settings().EXPORT_DIR
+    os.makedirs(export_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="liquidaciones-", suffix=".xlsx", dir=export_dir)
+    os.close(fd)
+    try:
+        await run_in_threadpool(workbook.save, path)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def receipts_query(date_from: date, date_to: date) -> Select:
+    """Una fila por deducción (o una sola sin deducciones), agrupadas por liquidación."""
+    query = (
+        select(
+            Settlement.id,
+            CollectorProfile.code.label("code"),
+            _full_name(),
+            Settlement.period_start,
+            Settlement.period_end,
+            Settlement.commission_regular,
+            Settlement.commission_cash,
+            Settlement.commission_delivery,
+            Settlement.total_commissions,
+            Settlement.total_deductions,
+            Settlement.net_amount,
+            Settlement.amount_paid,
+            Settlement.status,
+            Settlement.payment_method,
+            Settlement.paid_at,
+            SettlementDeduction.concept.label("deduction_concept"),
+            SettlementDeduction.amount.label("deduction_amount"),
+        )
+        .select_from(Settlement)
+        .outerjoin(SettlementDeduction, SettlementDeduction.settlement_id == Settlement.id)
+    )
+    return (
+        _in_range(_with_employee(query), date_from, date_to)
+        .order_by(Settlement.id, SettlementDeduction.id)
+    )
+
+
+def _receipt_pages(header, deductions: List[tuple]) -> List[List[ReceiptLine]]:
+    lines = [
+        ReceiptLine("Recibo de liquidación", bold=True),
+        ReceiptLine(f"Folio de liquidación: {header.id}"),
+        ReceiptLine(f"Cobrador: {header.code or ''} · {header.full_name or ''}"),
+        ReceiptLine(f"Período: {fmt_date(header.period_start)} al {fmt_date(header.period_end)}"),
+        ReceiptLine("Comisiones", bold=True, gap=12),
+        ReceiptLine("Cobranza normal", money(header.commission_regular)),
+        ReceiptLine("Contado", money(header.commission_cash)),
+        ReceiptLine("Entregas", money(header.commission_delivery)),
+        ReceiptLine("Total comisiones", money(header.total_commissions), bold=True),
+        ReceiptLine("Deducciones", bold=True, gap=12),
+    ]
+    lines += [ReceiptLine(concept, money(amount)) for concept, amount in deductions]
+    lines += [
+        ReceiptLine("Total deducciones", money(header.total_deductions), bold=True),
+        ReceiptLine("Neto a pagar", money(header.net_amount), bold=True, gap=12),
+        ReceiptLine("Pagado", money(header.amount_paid)),
+        ReceiptLine(
+            f"Estado: {_cell(header.status)} · Método: {_cell(header.payment_method) or '-'}"
+            f" · Fecha de pago: {fmt_date(header.paid_at) or '-'}"
+        ),
+        ReceiptLine("_______________________________", gap=48),
+        ReceiptLine("Firma de recibido"),
+    ]
+    continued = ReceiptLine(f"Recibo de liquidación {header.id} (continuación)", bold=True)
+    return paginate(lines, continued)
+
+
+async def write_receipts_pdf(
+    session: AsyncSession,
+    date_from: date,
+    date_to: date,
+    path: str,
+) -> int:
+    """
+    Escribe en `path` un PDF con un recibo por liquidación del rango (más
+    páginas si sus deducciones no caben en una). Lee con cursor del
+    servidor y escribe cada página al terminarla. Devuelve el número de
+    recibos.
+    """
+    result = await session.stream(
+        receipts_query(date_from, date_to).execution_options(yield_per=STREAM_CHUNK)
+    )
+    count = 0
+    with open(path, "wb") as f:
+        writer = PdfWriter(f)
+        header, deductions = None, []
+        async for row in result:
+            if header is not None and row.id != header.id:
+                for page in _receipt_pages(header, deductions):
+                    writer.add_page(page)
+                count += 1
+                deductions = []
+            header = row
+            if row.deduction_concept is not None:
+                deductions.append((row.deduction_concept, row.deduction_amount))
+        if header is not None:
+            for page in _receipt_pages(header, deductions):
+                writer.add_page(page)
+            count += 1
+        else:
+            writer.add_page([ReceiptLine("Sin liquidaciones en el período", bold=True)])
+        writer.close()
+    return count
+
+
+def remove_expired_files(directory: str, max_age: float) -> int:
+    """Borra los archivos de `directory` modificados hace más de `max_age` segundos."""
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass  # otro proceso lo borró (p. ej. iter_file)
+    return removed
+
+
+def iter_file(path: str, remove: bool = True) -> Iterable[bytes]:
+    """Lee un archivo en bloques (para StreamingResponse) y lo borra al terminar."""
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(FILE_CHUNK):
+                yield chunk
+    finally:
+        if remove:
+            os.unlink(path)
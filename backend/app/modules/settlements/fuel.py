@@ -0,0 +1,139 @@
+"""
+Settlement Module — Ingesta de cargas de combustible
+
+Las cargas llegan en lote desde la app móvil (JSON) o por CSV desde
+administración. Se resuelven los códigos de cobrador en una consulta y se
+insertan con INSERT multi-fila ... ON CONFLICT (employee_id, ticket) DO
+NOTHING: una carga con ticket ya registrado para el empleado se cuenta como
+duplicada. El móvil siempre manda ticket (folio o id generado en el
+dispositivo), así un reintento del lote no duplica la deducción. En el CSV
+el ticket es opcional y los renglones sin ticket no se deduplican: NULL no
+choca con el UNIQUE.
+
+El total del período por empleado lo lee SettlementService con un
+agregado agrupado sobre idx_fuel_load_employee_date.
+"""
+import csv
+import io
+from typing import Dict, List, Optional
+
+from pydantic import ValidationError as SchemaError
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import CollectorProfile, EmployeeRole
+from app.models.settlement import FuelLoad
+from .cache import PreviewCache
+from .schemas import FuelIngestResult, FuelLoadError, FuelLoadItem
+
+CSV_COLUMNS = ("code", "load_date", "amount", "liters", "odometer", "ticket")
+CSV_REQUIRED = ("code", "load_date", "amount")
+MAX_CSV_ROWS = 20000
+INSERT_CHUNK = 1000  # 6 parámetros por fila: muy por debajo del límite de asyncpg
+
+
+class FuelLoadService:
+    def __init__(self, db: AsyncSession, cache: Optional[PreviewCache] = None):
+        self.db = db
+        self.cache = cache
+
+    async def ingest(
+        self,
+        items: List[FuelLoadItem],
+        source: str,
+        errors: Optional[List[FuelLoadError]] = None,
+        rows: Optional[List[int]] = None,
+    ) -> FuelIngestResult:
+        """
+        Inserta las cargas válidas; las de código desconocido se reportan
+        como error sin bloquear el resto. `rows` numera cada item para los
+        errores (por defecto, su índice).
+        """
+        errors = list(errors or [])
+        rows = rows if rows is not None else list(range(len(items)))
+
+        employees = await self._employees_by_code({item.code for item in items})
+
+        values = []
+        for row, item in zip(rows, items):
+            employee_id = employees.get(item.code)
+            if employee_id is None:
+                errors.append(FuelLoadError(row=row, message=f"Cobrador {item.code} no encontrado"))
+                continue
+            values.append({
+                "employee_id": employee_id,
+                "load_date": item.load_date,
+                "amount": item.amount,
+                "liters": item.liters,
+                "odometer": item.odometer,
+                "ticket": item.ticket.strip() if item.ticket else None,
+                "source": source,
+            })
+
+        inserted_codes = set()
+        inserted = 0
+        codes_by_employee = {employee_id: code for code, employee_id in employees.items()}
+        for start in range(0, len(values), INSERT_CHUNK):
+            result = await self.db.execute(
+                pg_insert(FuelLoad)
+                .values(values[start:start + INSERT_CHUNK])
+                .on_conflict_do_nothing(index_elements=["employee_id", "ticket"])
+                .returning(FuelLoad.employee_id)
+            )
+            employee_ids = result.scalars().all()
+            inserted += len(employee_ids)
+            inserted_codes.update(codes_by_employee[e] for e in employee_ids)
+
+        if inserted and self.cache is not None:
+            await self.db.commit()
+            await self.cache.invalidate(*inserted_codes)
+
+        return FuelIngestResult(
+            inserted=inserted,
+            duplicates=len(values) - inserted,
+            errors=sorted(errors, key=lambda e: e.row),
+        )
+
+    async def ingest_csv(self, content: bytes) -> FuelIngestResult:
+        """CSV con encabezados code, load_date, amount[, liters, odometer, ticket]."""
+        try:
+            text = content.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ValueError("El CSV debe estar en UTF-8")
+
+        reader = csv.DictReader(io.StringIO(text))
+        header = [h.strip() for h in reader.fieldnames or []]
+        missing = [c for c in CSV_REQUIRED if c not in header]
+        if missing:
+            raise ValueError(f"Faltan columnas en el CSV: {', '.join(missing)}")
+        reader.fieldnames = header
+
+        items, rows, errors = [], [], []
+        for row, record in enumerate(reader, start=1):
+            if row > MAX_CSV_ROWS:
+                raise ValueError(f"Máximo {MAX_CSV_ROWS} renglones por CSV")
+            data = {
+                column: (record.get(column) or "").strip() or None
+                for column in CSV_COLUMNS
+            }
+            try:
+                items.append(FuelLoadItem.model_validate(data))
+                rows.append(row)
+            except SchemaError as e:
+                first = e.errors()[0]
+                field = ".".join(str(p) for p in first["loc"])
+                errors.append(FuelLoadError(row=row, message=f"{field}: {first['msg']}"))
+
+        return await self.ingest(items, "csv", errors=errors, rows=rows)
+
+    async def _employees_by_code(self, codes) -> Dict[str, int]:
+        """employee_id de cada código de cobrador, en una consulta."""
+        if not codes:
+            return {}
+        result = await self.db.execute(
+            select(CollectorProfile.code, EmployeeRole.employee_id)
+            .join(EmployeeRole, CollectorProfile.employee_role_id == EmployeeRole.id)
+            .where(CollectorProfile.code.in_(list(codes)))
+        )
+        return {code: employee_id for code, employee_id in result.all()}
@@ -0,0 +1,131 @@
+"""
+Settlement Module — Recibos de liquidación en PDF
+
+Escritor PDF mínimo (texto Helvetica) que escribe
+cada página al archivo en cuanto se arma: la memoria no depende de cuántos
+recibos tenga el período. Solo se guardan los offsets para la tabla xref.
+Un recibo que no cabe en una página (muchas deducciones) sigue en otras
+con `paginate`.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import BinaryIO, List, Sequence
+
+PAGE_WIDTH = 612   # carta, en puntos
+PAGE_HEIGHT = 792
+MARGIN = 56
+LINE_HEIGHT = 16
+
+# Objetos fijos: 1 catálogo, 2 árbol de páginas, 3 fuente, 4 fuente negrita
+_CATALOG, _PAGES, _FONT, _FONT_BOLD = 1, 2, 3, 4
+
+
+def _escape(text: str) -> bytes:
+    raw = text.encode("cp1252", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def money(value) -> str:
+    return f"${Decimal(value or 0):,.2f}"
+
+
+def fmt_date(value) -> str:
+    if isinstance(value, datetime):
+        return value.strftime("%d/%m/%Y %H:%M")
+    if isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    return "" if value is None else str(value)
+
+
+class ReceiptLine:
+    """Renglón del recibo: texto a la izquierda y, opcional, monto a la derecha."""
+
+    def __init__(self, text: str, amount: str = "", bold: bool = False, gap: int = 0):
+        self.text = text
+        self.amount = amount
+        self.bold = bold
+        self.gap = gap  # espacio extra antes del renglón
+
+
+def paginate(lines: Sequence[ReceiptLine], continued: ReceiptLine) -> List[List[ReceiptLine]]:
+    """
+    Parte los renglones en páginas que caben entre los márgenes. Cada página
+    después de la primera empieza con `continued` (p. ej. el folio).
+    """
+    available = PAGE_HEIGHT - 2 * MARGIN
+    pages, page, used = [], [], 0
+    for line in lines:
+        height = LINE_HEIGHT + line.gap
+        if page and used + height > available:
+            pages.append(page)
+            page, used = [continued], LINE_HEIGHT
+            # El espacio extra no tiene sentido al inicio de la página
+            line = ReceiptLine(line.text, line.amount, line.bold)
+            height = LINE_HEIGHT
+        page.append(line)
+        used += height
+    if page:
+        pages.append(page)
+    return pages
+
+
+class PdfWriter:
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.offsets = {}
+        self.pages: List[int] = []
+        self.next_id = 5
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for obj_id, name in ((_FONT, b"Helvetica"), (_FONT_BOLD, b"Helvetica-Bold")):
+            self._object(
+                obj_id,
+                b"<< /Type /Font /Subtype /Type1 /BaseFont /" + name
+                + b" /Encoding /WinAnsiEncoding >>",
+            )
+
+    def _write(self, data: bytes) -> None:
+        self.stream.write(data)
+
+    def _object(self, obj_id: int, body: bytes) -> None:
+        self.offsets[obj_id] = self.stream.tell()
+        self._write(b"%d 0 obj\n" % obj_id + body + b"\nendobj\n")
+
+    def add_page(self, lines: Sequence[ReceiptLine]) -> None:
+        ops = [b"BT"]
+        y = PAGE_HEIGHT - MARGIN
+        for line in lines:
+            y -= LINE_HEIGHT + line.gap
+            font = b"/F2" if line.bold else b"/F1"
+            ops.append(b"%s 11 Tf 1 0 0 1 %d %d Tm (%s) Tj" % (font, MARGIN, y, _escape(line.text)))
+            if line.amount:
+                # Alineado a la derecha de forma aproximada (Helvetica ~0.55 em por dígito)
+                x = PAGE_WIDTH - MARGIN - int(len(line.amount) * 11 * 0.55)
+                ops.append(b"%s 11 Tf 1 0 0 1 %d %d Tm (%s) Tj" % (font, x, y, _escape(line.amount)))
+        ops.append(b"ET")
+        content = b"\n".join(ops)
+
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self._object(
+            content_id,
+            b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+        )
+        self._object(
+            page_id,
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>"
+            % (_PAGES, PAGE_WIDTH, PAGE_HEIGHT, _FONT, _FONT_BOLD, content_id),
+        )
+        self.pages.append(page_id)
+
+    def close(self) -> None:
+        kids = b" ".join(b"%d 0 R" % p for p in self.pages)
+        self._object(_PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.pages)))
+        self._object(_CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % _PAGES)
+
+        xref_at = self.stream.tell()
+        size = self.next_id
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for obj_id in range(1, size):
+            self._write(b"%010d 00000 n \n" % self.offsets[obj_id])
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, _CATALOG, xref_at))
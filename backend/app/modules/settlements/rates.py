@@ -0,0 +1,149 @@
+"""
+Settlement Module — Proveedor de tasas y metas
+
+Carga una vez las tablas de tasas de liquidación (settlement_rate,
+collector_goal) en un RateSnapshot inmutable y versionado. Los servicios lo
+consultan en memoria: resolver la tasa vigente de un período o la meta de
+un cobrador no cuesta ninguna consulta.
+
+La versión vive en `rate_version` (una fila que suben triggers en cada
+cambio de esas tablas, migración 014). El proveedor la revisa a lo
+más cada RATES_REFRESH_SECONDS (una lectura por primary key) y solo recarga
+el snapshot si cambió. La versión también forma parte de la llave del cache
+de previews (cache.py), así un cambio de tasas no sirve previews viejos.
+"""
+import asyncio
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.models import CollectorGoal, RateVersion, SettlementRate
+
+# Valores previos a settlement_rate; rigen si la tabla no tiene fila vigente
+DEFAULT_RATES: Mapping[str, Decimal] = MappingProxyType({
+    "commission_regular": Decimal("0.10"),   # 10% cobranza normal
+    "commission_cash": Decimal("0.05"),      # 5% pagos de contado
+    "commission_delivery": Decimal("50.00"),  # $50 fijos por entrega
+    "fuel_deduction": Decimal("0.50"),       # 50% del gasto de gasolina
+    "goal_amount": Decimal("15000.00"),      # meta por quincena
+})
+
+# Historial ordenado por effective_from: ((fecha, valor), ...)
+_History = Tuple[Tuple[date, Decimal], ...]
+
+
+def _effective(history: _History, on: date) -> Optional[Decimal]:
+    """Valor vigente en `on`: la fila con el effective_from más reciente <= on."""
+    i = bisect_right(history, on, key=lambda item: item[0])
+    return history[i - 1][1] if i else None
+
+
+def _histories(rows) -> Dict:
+    grouped: Dict = {}
+    for key, effective_from, value in rows:
+        grouped.setdefault(key, []).append((effective_from, value))
+    return MappingProxyType({k: tuple(sorted(v)) for k, v in grouped.items()})
+
+
+@dataclass(frozen=True)
+class SettlementRates:
+    """Tasas de liquidación vigentes en una fecha."""
+    commission_regular: Decimal
+    commission_cash: Decimal
+    commission_delivery: Decimal
+    fuel_deduction: Decimal
+    goal_amount: Decimal
+
+
+@dataclass(frozen=True)
+class RateSnapshot:
+    version: int
+    loaded_at: datetime
+    settlement_rates: Mapping[str, _History]
+    collector_goals: Mapping[int, _History]
+
+    def rates_on(self, on: date) -> SettlementRates:
+        values = {}
+        for name, default in DEFAULT_RATES.items():
+            value = _effective(self.settlement_rates.get(name, ()), on)
+            values[name] = default if value is None else value
+        return SettlementRates(**values)
+
+    def goal_for(self, employee_role_id: int, on: date) -> Decimal:
+        """Meta del cobrador en `on`; la meta por defecto si no tiene propia."""
+        goal = _effective(self.collector_goals.get(employee_role_id, ()), on)
+        return goal if goal is not None else self.rates_on(on).goal_amount
+
+
+async def load_snapshot(session: AsyncSession, version: int) -> RateSnapshot:
+    """Lee las tablas de tasas y metas (una consulta por tabla)."""
+    settlement_rates = (await session.execute(
+        select(SettlementRate.name, SettlementRate.effective_from, SettlementRate.value)
+    )).all()
+    goals = (await session.execute(
+        select(CollectorGoal.employee_role_id, CollectorGoal.effective_from, CollectorGoal.amount)
+    )).all()
+
+    return RateSnapshot(
+        version=version,
+        loaded_at=datetime.utcnow(),
+        settlement_rates=_histories(settlement_rates),
+        collector_goals=_histories(goals),
+    )
+
+
+class RateProvider:
+    """Snapshot compartido por proceso; se recarga cuando cambia rate_version."""
+
+    def __init__(self, refresh_seconds: Optional[float] = None):
+        self.refresh_seconds = refresh_seconds
+        self._snapshot: Optional[RateSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self.reloads = 0
+
+    def _refresh_seconds(self) -> float:
+        if self.refresh_seconds is None:
+            self.refresh_seconds = get_settings().RATES_REFRESH_SECONDS
+        return self.refresh_seconds
+
+    async def get(self, session: AsyncSession) -> RateSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self._refresh_seconds():
+            return snapshot
+
+        async with self._lock:
+            # Otra corrutina pudo haberlo revisado mientras esperábamos
+            if self._snapshot is not None and time.monotonic() - self._checked_at < self._refresh_seconds():
+                return self._snapshot
+            version = await session.scalar(select(RateVersion.version).where(RateVersion.id == 1)) or 0
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = await load_snapshot(session, version)
+                self.reloads += 1
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "reloads": self.reloads,
+            "refresh_seconds": self._refresh_seconds(),
+        }
+
+
+# Instancia por proceso
+rate_provider = RateProvider()
+
+
+async def get_rates(session: AsyncSession) -> RateSnapshot:
+    return await rate_provider.get(session)
@@ -5,14 +5,24 @@ Claudy ✨ — 2026-02-27
 Updated to use employee_role_id (new employee structure)
 """
 
+import os
 from datetime import date
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from app.core.database import get_db
+from app.core.database import async_session_factory, get_db
 from app.core.dependencies import get_current_user
+from app.core.redis import get_redis
+from app.tasks import reports
+from . import cache as preview_cache
+from . import export
+from .cache import PreviewCache
+from .fuel import FuelLoadService
+from .rates import rate_provider
 from .service import SettlementService
 from .schemas import (
     SettlementPreview,
@@ -23,16 +33,22 @@ from .schemas import (
     SettlementPayRequest,
     ManualDeductionCreate,
     EmployeeBasic,
+    FuelLoadBatch,
+    FuelIngestResult,
 )
 
 router = APIRouter(prefix="/settlements", tags=["Settlements"])
 
 
+def get_service(db: AsyncSession) -> SettlementService:
+    return SettlementService(db, cache=PreviewCache(get_redis()))
+
+
 # ─── List Collectors ───────────────────────────────────────────────────────────
 
 @router.get("/collectors", response_model=List[EmployeeBasic])
-def list_active_collectors(
-    db: Session = Depends(get_db),
+async def list_active_collectors(
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     """
@@ -41,18 +57,18 @@ def list_active_collectors(
     Útil para mostrar la lista de cobradores disponibles para liquidar.
     """
     
-    service = SettlementService(db)
-    return service.get_active_collectors()
+    service = get_service(db)
+    return await service.get_active_collectors()
 
 
 # ─── Preview ───────────────────────────────────────────────────────────────────
 
 @router.get("/preview/{employee_role_id}", response_model=SettlementPreview)
-def get_settlement_preview(
+async def get_settlement_preview(
     employee_role_id: int,
     period_start: date = Query(..., description="Inicio del período (YYYY-MM-DD)"),
     period_end: date = Query(..., description="Fin del período (YYYY-MM-DD)"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     """
@@ -62,19 +78,19 @@ def get_settlement_preview(
     Usado por la pantalla de detalle de liquidación.
     """
     
-    service = SettlementService(db)
+    service = get_service(db)
     
     try:
-        return service.get_preview(employee_role_id, period_start, period_end)
+        return await service.get_preview(employee_role_id, period_start, period_end)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
 @router.get("/preview", response_model=List[SettlementPreview])
-def get_all_previews(
+async def get_all_previews(
     period_start: date = Query(..., description="Inicio del período"),
     period_end: date = Query(..., description="Fin del período"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     """
@@ -83,16 +99,34 @@ def get_all_previews(
     Usado por la pantalla principal de liquidaciones.
     """
     
-    service = SettlementService(db)
-    return service.get_all_previews(period_start, period_end)
+    service = get_service(db)
+    return await service.get_all_previews(period_start, period_end)
+
+
+@router.get("/cache/stats")
+async def get_preview_cache_stats(
+    current_user = Depends(get_current_user),
+):
+    """Aciertos del cache de previews y tiempo de recálculo (este worker)."""
+    
+    return preview_cache.stats.as_dict()
+
+
+@router.get("/rates/stats")
+async def get_rates_stats(
+    current_user = Depends(get_current_user),
+):
+    """Versión del snapshot de tasas cargado en este worker y recargas hechas."""
+    
+    return rate_provider.stats()
 
 
 # ─── Create Settlement ─────────────────────────────────────────────────────────
 
 @router.post("/", response_model=SettlementResponse, status_code=201)
-def create_settlement(
+async def create_settlement(
     data: SettlementCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     """
@@ -105,18 +139,18 @@ def create_settlement(
     y si está pagado completo, actualiza préstamos.
     """
     
-    service = SettlementService(db)
+    service = get_service(db)
     
     try:
-        return service.create_settlement(data, current_user.id)
+        return await service.create_settlement(data, int(current_user["sub"]))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/batch", response_model=List[SettlementResponse], status_code=201)
-def create_batch_settlement(
+async def create_batch_settlement(
     data: SettlementBatchCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     """
@@ -125,10 +159,10 @@ def create_batch_settlement(
     Usado por el botón "Pagar todos los listos".
     """
     
-    service = SettlementService(db)
+    service = get_service(db)
     
     try:
-        return service.create_batch_settlement(data, current_user.id)
+        return await service.create_batch_settlement(data, int(current_user["sub"]))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -136,10 +170,10 @@ def create_batch_settlement(
 # ─── Pay Settlement ────────────────────────────────────────────────────────────
 
 @router.post("/{settlement_id}/pay", response_model=SettlementResponse)
-def pay_settlement(
+async def pay_settlement(
     settlement_id: int,
     data: SettlementPayRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     """
@@ -149,10 +183,10 @@ def pay_settlement(
     Actualiza amount_paid y status automáticamente.
     """
     
-    service = SettlementService(db)
+    service = get_service(db)
     
     try:
-        return service.pay_settlement(settlement_id, data, current_user.id)
+        return await service.pay_settlement(settlement_id, data, int(current_user["sub"]))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -160,22 +194,25 @@ def pay_settlement(
 # ─── History ───────────────────────────────────────────────────────────────────
 
 @router.get("/history/{employee_role_id}", response_model=SettlementHistoryResponse)
-def get_settlement_history(
+async def get_settlement_history(
     employee_role_id: int,
     limit: int = Query(10, ge=1, le=100, description="Número máximo de resultados"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    year: Optional[int] = Query(None, ge=2000, le=2100, description="Solo liquidaciones de este año"),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     """
     Obtiene el historial de liquidaciones de un cobrador.
     
-    Ordenado por fecha descendente (más recientes primero).
+    Ordenado por fecha descendente (más recientes primero), paginado con
+    cursor: pasar `next_cursor` para la siguiente página.
     """
     
-    service = SettlementService(db)
+    service = get_service(db)
     
     try:
-        return service.get_history(employee_role_id, limit)
+        return await service.get_history(employee_role_id, limit, cursor, year)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -183,9 +220,9 @@ def get_settlement_history(
 # ─── Manual Deduction ──────────────────────────────────────────────────────────
 
 @router.post("/deductions", status_code=201)
-def add_manual_deduction(
+async def add_manual_deduction(
     data: ManualDeductionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     """
@@ -195,30 +232,170 @@ def add_manual_deduction(
     No funciona si la liquidación ya está pagada completamente.
     """
     
-    service = SettlementService(db)
+    service = get_service(db)
     
     try:
-        deduction = service.add_manual_deduction(data)
+        deduction = await service.add_manual_deduction(data)
         return {"id": deduction.id, "message": "Deducción agregada exitosamente"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+# ─── Fuel Loads ────────────────────────────────────────────────────────────────
+
+@router.post("/fuel-loads", response_model=FuelIngestResult, status_code=201)
+async def ingest_fuel_loads(
+    data: FuelLoadBatch,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Registra un lote de cargas de combustible (app móvil).
+    
+    `ticket` es obligatorio en cada item (folio del ticket o un id que el
+    móvil genera al capturar la carga). Las cargas con `ticket` ya
+    registrado se omiten, así que el móvil puede reintentar el lote
+    completo sin duplicar la deducción de gasolina.
+    """
+    
+    service = FuelLoadService(db, cache=PreviewCache(get_redis()))
+    return await service.ingest(data.items, "mobile")
+
+
+@router.post("/fuel-loads/csv", response_model=FuelIngestResult, status_code=201)
+async def upload_fuel_loads_csv(
+    file: UploadFile = File(..., description="CSV: code, load_date, amount[, liters, odometer, ticket]"),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Carga masiva de cargas de combustible desde CSV (administración).
+    
+    Los renglones inválidos se reportan en `errors` sin bloquear el resto.
+    """
+    
+    service = FuelLoadService(db, cache=PreviewCache(get_redis()))
+    
+    try:
+        return await service.ingest_csv(await file.read())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ─── Export ────────────────────────────────────────────────────────────────────
+
+def _check_range(date_from: date, date_to: date) -> None:
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from debe ser anterior a date_to")
+
+
+@router.get("/export")
+async def export_settlements(
+    date_from: date = Query(..., description="Inicio del primer período"),
+    date_to: date = Query(..., description="Fin del último período"),
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    section: str = Query(
+        "settlements",
+        pattern="^(settlements|deductions|payments)$",
+        description="Solo CSV: encabezados, deducciones o pagos (XLSX trae las tres hojas)",
+    ),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Exporta las liquidaciones de un rango de períodos para contabilidad.
+    
+    Se lee con cursor del servidor: la memoria no crece con el rango.
+    CSV se envía mientras se lee; XLSX se arma en disco (en el threadpool)
+    y luego se envía.
+    """
+    
+    _check_range(date_from, date_to)
+    
+    if format == "xlsx":
+        path = await export.write_xlsx(db, date_from, date_to)
+        return StreamingResponse(
+            export.iter_file(path),
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers={"Content-Disposition": f'attachment; filename="liquidaciones-{date_from}-{date_to}.xlsx"'},
+        )
+    
+    async def rows():
+        # Sesión propia: el stream sigue después de que termina el endpoint
+        async with async_session_factory() as session:
+            async for chunk in export.stream_csv(session, section, date_from, date_to):
+                yield chunk
+    
+    return StreamingResponse(
+        rows(),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="liquidaciones-{section}-{date_from}-{date_to}.csv"'},
+    )
+
+
+@router.post("/export/receipts", status_code=202)
+async def export_receipts(
+    date_from: date = Query(..., description="Inicio del primer período"),
+    date_to: date = Query(..., description="Fin del último período"),
+    current_user = Depends(get_current_user),
+):
+    """
+    Encola en el worker de Celery los recibos PDF (uno por liquidación).
+    
+    Devuelve un job_id; consultar GET /export/receipts/{job_id} hasta que
+    el estado sea `done` para descargar el archivo.
+    """
+    
+    _check_range(date_from, date_to)
+    
+    job_id = await reports.create_job("settlement_receipts", date_from=date_from, date_to=date_to)
+    # delay() publica al broker de forma síncrona
+    await run_in_threadpool(
+        reports.render_settlement_receipts_task.delay,
+        job_id, date_from.isoformat(), date_to.isoformat(),
+    )
+    return {"job_id": job_id, "status": "pending"}
+
+
+@router.get("/export/receipts/{job_id}")
+async def get_receipts_export(
+    job_id: str,
+    current_user = Depends(get_current_user),
+):
+    """Estado del job de recibos; si ya terminó, descarga el PDF."""
+    
+    job = await reports.get_job(job_id)
+    if not job or job.get("kind") != "settlement_receipts":
+        raise HTTPException(status_code=404, detail="Exportación no encontrada")
+    
+    if job["status"] != "done":
+        return {"job_id": job_id, "status": job["status"], "error": job.get("error")}
+    
+    if not os.path.exists(job["path"]):
+        raise HTTPException(status_code=404, detail="La exportación ya expiró")
+    
+    return FileResponse(
+        job["path"],
+        media_type="application/pdf",
+        filename=f"recibos-{job['date_from']}-{job['date_to']}.pdf",
+    )
+
+
 # ─── Get Single Settlement ─────────────────────────────────────────────────────
 
 @router.get("/{settlement_id}", response_model=SettlementResponse)
-def get_settlement(
+async def get_settlement(
     settlement_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     """Obtiene una liquidación por ID."""
     
     from app.models.settlement import Settlement
     
-    settlement = db.get(Settlement, settlement_id)
+    settlement = await db.get(Settlement, settlement_id)
     if not settlement:
         raise HTTPException(status_code=404, detail="Liquidación no encontrada")
     
-    service = SettlementService(db)
-    return service._to_response(settlement)
+    service = get_service(db)
+    return await service._to_response(settlement)
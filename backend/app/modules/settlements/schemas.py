@@ -187,6 +187,8 @@ class SettlementHistoryResponse(BaseModel):
     employee: EmployeeBasic
     items: List[SettlementHistoryItem]
     total_paid: Decimal = Field(description="Total histórico pagado")
+    year_total_paid: Optional[Decimal] = Field(None, description="Total pagado en el año filtrado")
+    next_cursor: Optional[str] = Field(None, description="Cursor de la siguiente página")
 
 
 # ─── Manual Deduction ──────────────────────────────────────────────────────────
@@ -211,6 +213,52 @@ class SettlementPayRequest(BaseModel):
     notes: Optional[str] = None
 
 
+# ─── Fuel Loads ────────────────────────────────────────────────────────────────
+
+MAX_FUEL_BATCH = 1000
+
+
+class FuelLoadItem(BaseModel):
+    """Una carga de combustible (renglón del CSV o item del lote móvil)."""
+    
+    code: str = Field(description="Código del cobrador: C1, C2...")
+    load_date: date
+    amount: Decimal = Field(gt=0, max_digits=12, decimal_places=2)
+    liters: Optional[Decimal] = Field(None, gt=0, max_digits=8, decimal_places=2)
+    odometer: Optional[int] = Field(None, ge=0)
+    ticket: Optional[str] = Field(None, max_length=50, description="Folio del ticket; evita duplicados al reintentar")
+
+
+class MobileFuelLoadItem(FuelLoadItem):
+    """Carga desde la app móvil: el ticket es obligatorio para deduplicar reintentos."""
+    
+    ticket: str = Field(
+        min_length=1,
+        max_length=50,
+        pattern=r"\S",
+        description="Folio del ticket (o id generado por el móvil); un reintento con el mismo ticket se omite",
+    )
+
+
+class FuelLoadBatch(BaseModel):
+    """Lote de cargas desde la app móvil."""
+    
+    items: List[MobileFuelLoadItem] = Field(min_length=1, max_length=MAX_FUEL_BATCH)
+
+
+class FuelLoadError(BaseModel):
+    row: int = Field(description="Índice del item o renglón del CSV (1 = primer renglón de datos)")
+    message: str
+
+
+class FuelIngestResult(BaseModel):
+    """Resultado de una carga masiva."""
+    
+    inserted: int
+    duplicates: int = Field(description="Cargas con ticket ya registrado para el cobrador (omitidas)")
+    errors: List[FuelLoadError] = []
+
+
 # Forward refs
 CommissionBreakdown.model_rebuild()
 SettlementPreview.model_rebuild()
@@ -5,29 +5,41 @@ Claudy ✨ — 2026-02-27
 Updated to use employee_role_id (new employee structure)
 """
 
+import base64
+import json
 from datetime import date, datetime
 from decimal import Decimal
-from typing import List, Optional
+from types import SimpleNamespace
+from typing import Dict, List, NamedTuple, Optional
 
-from sqlalchemy import select, func
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import Select, and_, case, func, insert, literal, or_, select, tuple_, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.exceptions import ValidationError
 from app.models import (
     Employee,
     EmployeeRole,
     CollectorProfile,
     DepartmentType,
+    Collector,
+    Payment,
+    Policy,
 )
 from app.models.settlement import (
     Settlement,
     SettlementDeduction,
     SettlementPayment,
     EmployeeLoan,
+    LoanInstallment,
+    FuelLoad,
     SettlementStatus,
     SettlementMethod,
     DeductionType,
     LoanStatus,
 )
+from .cache import PreviewCache
+from .rates import RateSnapshot, SettlementRates, rate_provider
 from .schemas import (
     SettlementPreview,
     SettlementCreate,
@@ -48,21 +60,51 @@ from .schemas import (
 
 # ─── Commission Rates ──────────────────────────────────────────────────────────
 
-COMMISSION_RATE_REGULAR = Decimal("0.10")   # 10% cobranza normal
-COMMISSION_RATE_CASH = Decimal("0.05")      # 5% pagos de contado
-COMMISSION_DELIVERY = Decimal("50.00")       # $50 fijos por entrega
-FUEL_DEDUCTION_RATE = Decimal("0.50")        # 50% del gasto de gasolina
+# Planes de pago que cuentan como contado para la comisión
+CASH_PAYMENT_PLANS = ("cash", "cash_2_installments")
+
+# Fila del agregado de comisiones para un cobrador sin cobros en el período
+_NO_COMMISSIONS = SimpleNamespace(
+    regular_count=0, regular_amount=0, regular_commission=0,
+    cash_count=0, cash_amount=0, cash_commission=0,
+    delivery_count=0,
+)
+
+# Fila del agregado de gasolina para un empleado sin cargas en el período
+_NO_FUEL = SimpleNamespace(load_count=0, total=0)
+
+
+class LoanBalance(NamedTuple):
+    """Préstamo activo con cuotas pagadas y saldo según el ledger."""
+    loan: EmployeeLoan
+    paid_installments: int
+    outstanding: Decimal
+
+
+def _encode_history_cursor(period_end: date, settlement_id: int) -> str:
+    """Cursor opaco del historial: base64(JSON [period_end, id])."""
+    raw = json.dumps([period_end.isoformat(), settlement_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_history_cursor(cursor: str) -> tuple:
+    try:
+        period_end, settlement_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(period_end), int(settlement_id)
+    except (ValueError, TypeError):
+        raise ValidationError("Cursor inválido")
 
 
 class SettlementService:
     """Servicio para gestión de liquidaciones."""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession, cache: Optional[PreviewCache] = None):
         self.db = db
+        self.cache = cache
     
     # ─── Get Collectors ────────────────────────────────────────────────────────
     
-    def get_active_collectors(self) -> List[EmployeeBasic]:
+    async def get_active_collectors(self) -> List[EmployeeBasic]:
         """Obtiene todos los cobradores activos."""
         
         query = (
@@ -75,7 +117,7 @@ class SettlementService:
             )
         )
         
-        results = self.db.execute(query).all()
+        results = (await self.db.execute(query)).all()
         
         return [
             EmployeeBasic(
@@ -89,7 +131,7 @@ class SettlementService:
     
     # ─── Preview ───────────────────────────────────────────────────────────────
     
-    def get_preview(
+    async def get_preview(
         self,
         employee_role_id: int,
         period_start: date,
@@ -98,24 +140,128 @@ class SettlementService:
         """
         Calcula el preview de liquidación sin guardar.
         Incluye comisiones, deducciones y alertas.
+        
+        Con cache, el preview se guarda por (cobrador, período, versión de
+        tasas) hasta que cambie un pago, préstamo o deducción del cobrador;
+        un cambio de tasas o metas sube la versión. Es solo para
+        mostrar: las liquidaciones se crean con un preview recién calculado
+        (_compute_preview), nunca con uno cacheado.
         """
         
-        # Obtener cobrador
-        employee_data = self._get_collector_by_role(employee_role_id)
+        employee = await self._collector_basic(employee_role_id)
+        
+        async def compute() -> SettlementPreview:
+            return await self._compute_preview(employee, period_start, period_end)
+        
+        if self.cache is None:
+            return await compute()
+        version = (await self._rate_snapshot()).version
+        return await self.cache.get_or_compute(
+            employee.code, period_start, period_end, compute, rate_version=version
+        )
+    
+    async def _collector_basic(self, employee_role_id: int) -> EmployeeBasic:
+        """Cobrador del rol, o ValueError si no existe."""
+        
+        employee_data = await self._get_collector_by_role(employee_role_id)
         if not employee_data:
             raise ValueError(f"Cobrador con role_id {employee_role_id} no encontrado")
         
+        return EmployeeBasic(
+            employee_id=employee_data['employee_id'],
+            employee_role_id=employee_role_id,
+            code=employee_data['code'],
+            full_name=employee_data['full_name'],
+        )
+    
+    async def _compute_preview(
+        self,
+        employee: EmployeeBasic,
+        period_start: date,
+        period_end: date,
+    ) -> SettlementPreview:
+        """Preview calculado desde la BD en la transacción actual (sin cache)."""
+        
         # Calcular comisiones
-        commissions = self._calculate_commissions(employee_role_id, period_start, period_end)
+        commissions = await self._calculate_commissions(employee.employee_role_id, period_start, period_end)
         
         # Calcular deducciones
-        deductions = self._calculate_deductions(employee_data['employee_id'], period_start, period_end)
+        deductions = await self._calculate_deductions(employee.employee_id, period_start, period_end)
+        
+        goal_amount = (await self._rate_snapshot()).goal_for(employee.employee_role_id, period_end)
+        
+        return self._build_preview(employee, period_start, period_end, commissions, deductions, goal_amount)
+    
+    async def get_all_previews(
+        self,
+        period_start: date,
+        period_end: date,
+    ) -> List[SettlementPreview]:
+        """
+        Calcula previews para TODOS los cobradores activos.
+        
+        Número fijo de consultas sin importar cuántos cobradores haya:
+        cobradores, comisiones agrupadas por rol y préstamos agrupados por
+        empleado. Usa los mismos helpers que get_preview, así que el
+        resultado es idéntico al cálculo individual.
+        """
+        
+        collectors = await self.get_active_collectors()
+        if not collectors:
+            return []
+        
+        return await self._build_previews(collectors, period_start, period_end)
+    
+    async def _build_previews(
+        self,
+        collectors: List[EmployeeBasic],
+        period_start: date,
+        period_end: date,
+    ) -> List[SettlementPreview]:
+        """
+        Previews de varios cobradores: un agregado de comisiones, uno de
+        gasolina y una consulta de préstamos.
+        """
+        
+        employee_ids = [c.employee_id for c in collectors]
+        commissions = await self._commissions_by_role(
+            [c.employee_role_id for c in collectors], period_start, period_end
+        )
+        fuel = await self._fuel_by_employee(employee_ids, period_start, period_end)
+        loans = await self._active_loans_by_employee(employee_ids)
+        snapshot = await self._rate_snapshot()
+        rates = snapshot.rates_on(period_end)
+        
+        return [
+            self._build_preview(
+                collector,
+                period_start,
+                period_end,
+                commissions[collector.employee_role_id],
+                self._deduction_breakdown(
+                    loans.get(collector.employee_id, []),
+                    fuel.get(collector.employee_id, _NO_FUEL),
+                    rates,
+                ),
+                snapshot.goal_for(collector.employee_role_id, period_end),
+            )
+            for collector in collectors
+        ]
+    
+    def _build_preview(
+        self,
+        employee: EmployeeBasic,
+        period_start: date,
+        period_end: date,
+        commissions: CommissionBreakdown,
+        deductions: DeductionBreakdown,
+        goal_amount: Decimal,
+    ) -> SettlementPreview:
+        """Arma el preview (neto, meta y alertas) a partir de comisiones y deducciones."""
         
         # Calcular neto
         net = commissions.total - deductions.total
         
-        # Obtener meta (por ahora hardcodeada, luego de config)
-        goal_amount = Decimal("15000.00")  # TODO: obtener de config o collector
         total_collected = commissions.regular.amount_collected + commissions.cash.amount_collected
         goal_percentage = float((total_collected / goal_amount) * 100) if goal_amount > 0 else 0
         
@@ -128,12 +274,7 @@ class SettlementService:
             has_alerts = True
         
         return SettlementPreview(
-            employee=EmployeeBasic(
-                employee_id=employee_data['employee_id'],
-                employee_role_id=employee_role_id,
-                code=employee_data['code'],
-                full_name=employee_data['full_name'],
-            ),
+            employee=employee,
             period=PeriodInfo(
                 start=period_start,
                 end=period_end,
@@ -149,28 +290,9 @@ class SettlementService:
             alerts=alerts,
         )
     
-    def get_all_previews(
-        self,
-        period_start: date,
-        period_end: date,
-    ) -> List[SettlementPreview]:
-        """Calcula previews para TODOS los cobradores activos."""
-        
-        collectors = self.get_active_collectors()
-        
-        previews = []
-        for collector in collectors:
-            try:
-                preview = self.get_preview(collector.employee_role_id, period_start, period_end)
-                previews.append(preview)
-            except ValueError:
-                continue
-        
-        return previews
-    
     # ─── Create Settlement ─────────────────────────────────────────────────────
     
-    def create_settlement(
+    async def create_settlement(
         self,
         data: SettlementCreate,
         paid_by_user_id: int,
@@ -178,99 +300,198 @@ class SettlementService:
         """Crea y registra una liquidación."""
         
         # Verificar que no exista ya
-        existing = self.db.execute(
+        result = await self.db.execute(
             select(Settlement).where(
                 Settlement.employee_role_id == data.employee_role_id,
                 Settlement.period_start == data.period_start,
                 Settlement.period_end == data.period_end,
             )
-        ).scalar_one_or_none()
+        )
+        existing = result.scalar_one_or_none()
         
         if existing:
             raise ValueError("Ya existe una liquidación para este período")
         
-        # Calcular montos
-        preview = self.get_preview(data.employee_role_id, data.period_start, data.period_end)
-        
-        # Determinar monto a pagar
-        pay_amount = data.amount if data.amount else preview.net_amount
-        
-        # Determinar status
-        if pay_amount >= preview.net_amount:
-            status = SettlementStatus.PAID
-            amount_paid = preview.net_amount
-        elif pay_amount > 0:
-            status = SettlementStatus.PARTIAL
-            amount_paid = pay_amount
-        else:
-            status = SettlementStatus.PENDING
-            amount_paid = Decimal("0")
+        # Calcular montos en esta transacción (nunca desde el cache), igual
+        # que los settlement_payment que se registran abajo
+        employee = await self._collector_basic(data.employee_role_id)
+        preview = await self._compute_preview(employee, data.period_start, data.period_end)
         
-        # Crear settlement
-        settlement = Settlement(
-            employee_role_id=data.employee_role_id,
-            period_start=data.period_start,
-            period_end=data.period_end,
-            commission_regular=preview.commissions.regular.commission,
-            commission_cash=preview.commissions.cash.commission,
-            commission_delivery=preview.commissions.delivery.commission,
-            deduction_fuel=sum(d.amount for d in preview.deductions.items if d.type == DeductionType.FUEL),
-            deduction_loan=sum(d.amount for d in preview.deductions.items if d.type == DeductionType.LOAN),
-            deduction_shortage=sum(d.amount for d in preview.deductions.items if d.type == DeductionType.SHORTAGE),
-            deduction_other=sum(d.amount for d in preview.deductions.items if d.type in [DeductionType.ADVANCE, DeductionType.OTHER]),
-            amount_paid=amount_paid,
-            status=status,
+        settlement = Settlement(**self._settlement_values(
+            preview,
             payment_method=data.payment_method,
-            paid_at=datetime.utcnow() if status != SettlementStatus.PENDING else None,
-            paid_by=paid_by_user_id,
+            amount=data.amount,
             notes=data.notes,
-        )
+            paid_by_user_id=paid_by_user_id,
+        ))
         
         self.db.add(settlement)
+        await self.db.flush()
+        
+        # Trazabilidad: pagos que generaron comisión
+        await self._record_commission_payments(
+            [settlement.employee_role_id], data.period_start, data.period_end
+        )
         
         # Registrar deducciones detalladas
         for deduction in preview.deductions.items:
             self.db.add(SettlementDeduction(
-                settlement=settlement,
+                settlement_id=settlement.id,
                 deduction_type=deduction.type,
                 concept=deduction.concept,
                 amount=deduction.amount,
                 loan_id=deduction.loan_id,
             ))
         
-        # Actualizar cuotas de préstamos si se pagó completo
-        if status == SettlementStatus.PAID:
-            self._update_loan_payments(preview.employee.employee_id, data.period_start, data.period_end)
+        # Cobrar cuotas de préstamos si se pagó completo
+        if settlement.status == SettlementStatus.PAID:
+            await self.db.flush()
+            await self._post_loan_installments([settlement.id])
         
-        self.db.commit()
-        self.db.refresh(settlement)
+        await self.db.commit()
+        await self.db.refresh(settlement)
+        await self._invalidate_previews(preview.employee.code)
         
-        return self._to_response(settlement)
+        return await self._to_response(settlement, preview.employee)
     
-    def create_batch_settlement(
+    async def create_batch_settlement(
         self,
         data: SettlementBatchCreate,
         paid_by_user_id: int,
     ) -> List[SettlementResponse]:
-        """Crea liquidaciones para múltiples cobradores."""
-        
-        results = []
-        for role_id in data.employee_role_ids:
-            single = SettlementCreate(
-                employee_role_id=role_id,
-                period_start=data.period_start,
-                period_end=data.period_end,
-                payment_method=data.payment_method,
-                notes=data.notes,
+        """
+        Crea liquidaciones para múltiples cobradores en una sola transacción.
+        
+        Los previews salen de consultas agrupadas (como get_all_previews);
+        settlement y settlement_deduction se insertan con INSERT multi-fila
+        ... RETURNING, settlement_payment con un INSERT ... SELECT y las
+        cuotas de préstamos con un UPDATE. Si algún cobrador no es válido
+        no se crea ninguna liquidación.
+        """
+        
+        role_ids = list(dict.fromkeys(data.employee_role_ids))
+        if not role_ids:
+            return []
+        
+        # Verificar que no existan ya (una consulta para todo el lote)
+        result = await self.db.execute(
+            select(Settlement.employee_role_id).where(
+                Settlement.employee_role_id.in_(role_ids),
+                Settlement.period_start == data.period_start,
+                Settlement.period_end == data.period_end,
             )
-            result = self.create_settlement(single, paid_by_user_id)
-            results.append(result)
+        )
+        existing = sorted(result.scalars().all())
+        if existing:
+            raise ValueError(
+                "Ya existe una liquidación para este período (role_id "
+                f"{', '.join(str(r) for r in existing)})"
+            )
+        
+        collectors = await self._collectors_by_role(role_ids)
+        missing = [r for r in role_ids if r not in collectors]
+        if missing:
+            raise ValueError(
+                f"Cobrador con role_id {', '.join(str(r) for r in missing)} no encontrado"
+            )
+        
+        previews = await self._build_previews(
+            [collectors[r] for r in role_ids], data.period_start, data.period_end
+        )
+        
+        # Crear settlements (RETURNING en el orden de los previews)
+        result = await self.db.scalars(
+            insert(Settlement).returning(Settlement, sort_by_parameter_order=True),
+            [
+                self._settlement_values(
+                    preview,
+                    payment_method=data.payment_method,
+                    notes=data.notes,
+                    paid_by_user_id=paid_by_user_id,
+                )
+                for preview in previews
+            ],
+        )
+        settlements = result.all()
+        
+        # Trazabilidad de todo el lote
+        await self._record_commission_payments(role_ids, data.period_start, data.period_end)
+        
+        # Registrar deducciones detalladas
+        deductions = [
+            {
+                "settlement_id": settlement.id,
+                "deduction_type": deduction.type,
+                "concept": deduction.concept,
+                "amount": deduction.amount,
+                "loan_id": deduction.loan_id,
+            }
+            for settlement, preview in zip(settlements, previews)
+            for deduction in preview.deductions.items
+        ]
+        if deductions:
+            await self.db.execute(insert(SettlementDeduction), deductions)
+        
+        # Cobrar cuotas de préstamos de los que se pagaron completo
+        paid_ids = [s.id for s in settlements if s.status == SettlementStatus.PAID]
+        if paid_ids:
+            await self._post_loan_installments(paid_ids)
         
-        return results
+        await self.db.commit()
+        await self._invalidate_previews(*(preview.employee.code for preview in previews))
+        
+        return [
+            await self._to_response(settlement, preview.employee)
+            for settlement, preview in zip(settlements, previews)
+        ]
+    
+    def _settlement_values(
+        self,
+        preview: SettlementPreview,
+        payment_method: SettlementMethod,
+        paid_by_user_id: int,
+        amount: Optional[Decimal] = None,
+        notes: Optional[str] = None,
+    ) -> dict:
+        """Columnas de un settlement nuevo a partir de su preview y el monto a pagar."""
+        
+        # Determinar monto a pagar
+        pay_amount = amount if amount else preview.net_amount
+        
+        # Determinar status
+        if pay_amount >= preview.net_amount:
+            status = SettlementStatus.PAID
+            amount_paid = preview.net_amount
+        elif pay_amount > 0:
+            status = SettlementStatus.PARTIAL
+            amount_paid = pay_amount
+        else:
+            status = SettlementStatus.PENDING
+            amount_paid = Decimal("0")
+        
+        items = preview.deductions.items
+        return {
+            "employee_role_id": preview.employee.employee_role_id,
+            "period_start": preview.period.start,
+            "period_end": preview.period.end,
+            "commission_regular": preview.commissions.regular.commission,
+            "commission_cash": preview.commissions.cash.commission,
+            "commission_delivery": preview.commissions.delivery.commission,
+            "deduction_fuel": sum(d.amount for d in items if d.type == DeductionType.FUEL),
+            "deduction_loan": sum(d.amount for d in items if d.type == DeductionType.LOAN),
+            "deduction_shortage": sum(d.amount for d in items if d.type == DeductionType.SHORTAGE),
+            "deduction_other": sum(d.amount for d in items if d.type in [DeductionType.ADVANCE, DeductionType.OTHER]),
+            "amount_paid": amount_paid,
+            "status": status,
+            "payment_method": payment_method,
+            "paid_at": datetime.utcnow() if status != SettlementStatus.PENDING else None,
+            "paid_by": paid_by_user_id,
+            "notes": notes,
+        }
     
     # ─── Pay Settlement ────────────────────────────────────────────────────────
     
-    def pay_settlement(
+    async def pay_settlement(
         self,
         settlement_id: int,
         data: SettlementPayRequest,
@@ -278,7 +499,7 @@ class SettlementService:
     ) -> SettlementResponse:
         """Registra un pago (parcial o total) en una liquidación existente."""
         
-        settlement = self.db.get(Settlement, settlement_id)
+        settlement = await self.db.get(Settlement, settlement_id)
         if not settlement:
             raise ValueError("Liquidación no encontrada")
         
@@ -301,37 +522,72 @@ class SettlementService:
         if new_amount_paid >= settlement.net_amount:
             settlement.status = SettlementStatus.PAID
             settlement.paid_at = datetime.utcnow()
-            # Actualizar préstamos
-            employee_data = self._get_collector_by_role(settlement.employee_role_id)
-            if employee_data:
-                self._update_loan_payments(employee_data['employee_id'], settlement.period_start, settlement.period_end)
+            # Cobrar cuotas de préstamos
+            await self.db.flush()
+            await self._post_loan_installments([settlement.id])
         else:
             settlement.status = SettlementStatus.PARTIAL
         
-        self.db.commit()
-        self.db.refresh(settlement)
+        await self.db.commit()
+        await self.db.refresh(settlement)
+        if settlement.status == SettlementStatus.PAID and self.cache is not None:
+            employee_data = await self._get_collector_by_role(settlement.employee_role_id)
+            if employee_data:
+                await self._invalidate_previews(employee_data['code'])
         
-        return self._to_response(settlement)
+        return await self._to_response(settlement)
     
     # ─── History ───────────────────────────────────────────────────────────────
     
-    def get_history(
+    async def get_history(
         self,
         employee_role_id: int,
         limit: int = 10,
+        cursor: Optional[str] = None,
+        year: Optional[int] = None,
     ) -> SettlementHistoryResponse:
-        """Obtiene el historial de liquidaciones de un cobrador."""
+        """
+        Obtiene el historial de liquidaciones de un cobrador.
         
-        employee_data = self._get_collector_by_role(employee_role_id)
+        Paginación por cursor sobre (period_end, id), más recientes primero:
+        cada página cuesta lo mismo sin importar cuántas quincenas tenga el
+        cobrador. total_paid es un agregado en SQL sobre todo el historial
+        (year_total_paid, el del año filtrado).
+        """
+        
+        after = _decode_history_cursor(cursor) if cursor else None
+        
+        employee_data = await self._get_collector_by_role(employee_role_id)
         if not employee_data:
             raise ValueError(f"Cobrador con role_id {employee_role_id} no encontrado")
         
-        settlements = self.db.execute(
+        in_year = None
+        if year is not None:
+            # Rango sobre (period_start, period_end): usa idx_settlement_period
+            in_year = and_(
+                Settlement.period_start >= date(year, 1, 1),
+                Settlement.period_end <= date(year, 12, 31),
+            )
+        
+        query = (
             select(Settlement)
             .where(Settlement.employee_role_id == employee_role_id)
-            .order_by(Settlement.period_end.desc())
-            .limit(limit)
-        ).scalars().all()
+            .order_by(Settlement.period_end.desc(), Settlement.id.desc())
+            .limit(limit + 1)
+        )
+        if in_year is not None:
+            query = query.where(in_year)
+        if after is not None:
+            query = query.where(tuple_(Settlement.period_end, Settlement.id) < after)
+        
+        result = await self.db.execute(query)
+        settlements = result.scalars().all()
+        
+        next_cursor = None
+        if len(settlements) > limit:
+            settlements = settlements[:limit]
+            last = settlements[-1]
+            next_cursor = _encode_history_cursor(last.period_end, last.id)
         
         items = [
             SettlementHistoryItem(
@@ -347,7 +603,17 @@ class SettlementService:
             for s in settlements
         ]
         
-        total_paid = sum(s.amount_paid for s in settlements)
+        # Totales de todo el historial (no solo de la página)
+        totals = (await self.db.execute(
+            select(
+                func.coalesce(func.sum(Settlement.amount_paid), 0).label("total_paid"),
+                (
+                    func.coalesce(func.sum(Settlement.amount_paid).filter(in_year), 0)
+                    if in_year is not None else literal(None)
+                ).label("year_total_paid"),
+            )
+            .where(Settlement.employee_role_id == employee_role_id)
+        )).one()
         
         return SettlementHistoryResponse(
             employee=EmployeeBasic(
@@ -357,15 +623,17 @@ class SettlementService:
                 full_name=employee_data['full_name'],
             ),
             items=items,
-            total_paid=total_paid,
+            total_paid=totals.total_paid,
+            year_total_paid=totals.year_total_paid,
+            next_cursor=next_cursor,
         )
     
     # ─── Manual Deduction ──────────────────────────────────────────────────────
     
-    def add_manual_deduction(self, data: ManualDeductionCreate) -> SettlementDeduction:
+    async def add_manual_deduction(self, data: ManualDeductionCreate) -> SettlementDeduction:
         """Agrega una deducción manual a una liquidación existente."""
         
-        settlement = self.db.get(Settlement, data.settlement_id)
+        settlement = await self.db.get(Settlement, data.settlement_id)
         if not settlement:
             raise ValueError("Liquidación no encontrada")
         
@@ -392,14 +660,30 @@ class SettlementService:
         else:
             settlement.deduction_other += data.amount
         
-        self.db.commit()
-        self.db.refresh(deduction)
+        await self.db.commit()
+        await self.db.refresh(deduction)
+        
+        if self.cache is not None:
+            employee_data = await self._get_collector_by_role(settlement.employee_role_id)
+            if employee_data:
+                await self._invalidate_previews(employee_data['code'])
         
         return deduction
     
     # ─── Private Helpers ───────────────────────────────────────────────────────
     
-    def _get_collector_by_role(self, employee_role_id: int) -> Optional[dict]:
+    async def _rate_snapshot(self) -> RateSnapshot:
+        """Tasas y metas en memoria (ver rates.py); sin consultas salvo al refrescar."""
+        
+        return await rate_provider.get(self.db)
+    
+    async def _invalidate_previews(self, *collector_codes: str) -> None:
+        """Descarta los previews cacheados de los cobradores (después del commit)."""
+        
+        if self.cache is not None:
+            await self.cache.invalidate(*collector_codes)
+    
+    async def _get_collector_by_role(self, employee_role_id: int) -> Optional[dict]:
         """Obtiene datos de un cobrador por su employee_role_id."""
         
         query = (
@@ -409,7 +693,7 @@ class SettlementService:
             .where(EmployeeRole.id == employee_role_id)
         )
         
-        result = self.db.execute(query).first()
+        result = (await self.db.execute(query)).first()
         
         if result:
             role, emp, profile = result
@@ -421,40 +705,207 @@ class SettlementService:
             }
         return None
     
-    def _calculate_commissions(
+    async def _collectors_by_role(self, employee_role_ids: List[int]) -> Dict[int, EmployeeBasic]:
+        """Datos de varios cobradores por employee_role_id en una sola consulta."""
+        
+        query = (
+            select(EmployeeRole, Employee, CollectorProfile)
+            .join(Employee, EmployeeRole.employee_id == Employee.id)
+            .join(CollectorProfile, EmployeeRole.id == CollectorProfile.employee_role_id)
+            .where(EmployeeRole.id.in_(employee_role_ids))
+        )
+        
+        results = (await self.db.execute(query)).all()
+        
+        return {
+            role.id: EmployeeBasic(
+                employee_id=emp.id,
+                employee_role_id=role.id,
+                code=profile.code,
+                full_name=emp.full_name,
+            )
+            for role, emp, profile in results
+        }
+    
+    def _commission_payments(
+        self,
+        period_start: date,
+        period_end: date,
+        rates: SettlementRates,
+        employee_role_ids: Optional[List[int]] = None,
+    ) -> Select:
+        """
+        Cobros que generan comisión en el período, uno por fila:
+        (employee_role_id, payment_id, commission_type, amount, commission, delivered).
+
+        El cobrador de un pago se liga a su rol por collector.code_name =
+        collector_profile.code (igual que la vista v_collector). Se excluyen
+        pagos ya incluidos en la liquidación de otro período o cobrador.
+        Usa idx_payment_collector_paid (collector_id, actual_date).
+        """
+        is_cash = Policy.payment_plan.in_(CASH_PAYMENT_PLANS)
+        rate = case((is_cash, literal(rates.commission_cash)), else_=literal(rates.commission_regular))
+        amount = func.coalesce(Payment.amount, 0)
+
+        settled_elsewhere = (
+            select(SettlementPayment.id)
+            .join(Settlement, SettlementPayment.settlement_id == Settlement.id)
+            .where(SettlementPayment.payment_id == Payment.id)
+            .where(or_(
+                Settlement.employee_role_id.is_distinct_from(CollectorProfile.employee_role_id),
+                Settlement.period_start != period_start,
+                Settlement.period_end != period_end,
+            ))
+            .exists()
+        )
+
+        query = (
+            select(
+                CollectorProfile.employee_role_id,
+                Payment.id.label("payment_id"),
+                case((is_cash, literal("cash")), else_=literal("regular")).label("commission_type"),
+                amount.label("amount"),
+                func.round(amount * rate, 2).label("commission"),
+                func.coalesce(Payment.policy_delivered, False).label("delivered"),
+            )
+            .join(Policy, Payment.policy_id == Policy.id)
+            .join(Collector, Payment.collector_id == Collector.id)
+            .join(CollectorProfile, CollectorProfile.code == Collector.code_name)
+            .where(
+                Payment.status == "paid",
+                Payment.actual_date >= period_start,
+                Payment.actual_date <= period_end,
+                ~settled_elsewhere,
+            )
+        )
+        if employee_role_ids is not None:
+            query = query.where(CollectorProfile.employee_role_id.in_(employee_role_ids))
+        return query
+
+    async def _calculate_commissions(
         self,
         employee_role_id: int,
         period_start: date,
         period_end: date,
     ) -> CommissionBreakdown:
-        """Calcula las comisiones del período."""
+        """Calcula las comisiones del período con un solo agregado sobre payment."""
+        
+        commissions = await self._commissions_by_role([employee_role_id], period_start, period_end)
+        return commissions[employee_role_id]
+    
+    async def _commissions_by_role(
+        self,
+        employee_role_ids: List[int],
+        period_start: date,
+        period_end: date,
+    ) -> Dict[int, CommissionBreakdown]:
+        """Comisiones de varios cobradores en un solo agregado agrupado por rol."""
+        
+        rates = (await self._rate_snapshot()).rates_on(period_end)
+        p = self._commission_payments(period_start, period_end, rates, employee_role_ids).subquery()
+        is_cash = p.c.commission_type == "cash"
+        
+        result = await self.db.execute(
+            select(
+                p.c.employee_role_id,
+                func.count().filter(~is_cash).label("regular_count"),
+                func.coalesce(func.sum(p.c.amount).filter(~is_cash), 0).label("regular_amount"),
+                func.coalesce(func.sum(p.c.commission).filter(~is_cash), 0).label("regular_commission"),
+                func.count().filter(is_cash).label("cash_count"),
+                func.coalesce(func.sum(p.c.amount).filter(is_cash), 0).label("cash_amount"),
+                func.coalesce(func.sum(p.c.commission).filter(is_cash), 0).label("cash_commission"),
+                func.count().filter(p.c.delivered).label("delivery_count"),
+            )
+            .group_by(p.c.employee_role_id)
+        )
+        rows = result.all()
         
-        # TODO: Implementar query real a payments
-        # Por ahora retornamos datos de ejemplo
+        by_role = {row.employee_role_id: row for row in rows}
+        return {
+            role_id: self._commission_breakdown(by_role.get(role_id, _NO_COMMISSIONS), rates)
+            for role_id in employee_role_ids
+        }
+    
+    def _commission_breakdown(self, row, rates: SettlementRates) -> CommissionBreakdown:
+        """Arma el desglose a partir de una fila del agregado de comisiones."""
+        
+        delivery_commission = rates.commission_delivery * row.delivery_count
+        regular = CommissionDetail(
+            count=row.regular_count,
+            amount_collected=Decimal(row.regular_amount),
+            percentage=float(rates.commission_regular * 100),
+            commission=Decimal(row.regular_commission),
+        )
+        cash = CommissionDetail(
+            count=row.cash_count,
+            amount_collected=Decimal(row.cash_amount),
+            percentage=float(rates.commission_cash * 100),
+            commission=Decimal(row.cash_commission),
+        )
+        delivery = CommissionDetail(
+            count=row.delivery_count,
+            amount_collected=Decimal("0"),
+            percentage=None,
+            commission=delivery_commission,
+        )
         
         return CommissionBreakdown(
-            regular=CommissionDetail(
-                count=12,
-                amount_collected=Decimal("13200.00"),
-                percentage=10.0,
-                commission=Decimal("1320.00"),
-            ),
-            cash=CommissionDetail(
-                count=3,
-                amount_collected=Decimal("8500.00"),
-                percentage=5.0,
-                commission=Decimal("425.00"),
-            ),
-            delivery=CommissionDetail(
-                count=5,
-                amount_collected=Decimal("0"),
-                percentage=None,
-                commission=Decimal("250.00"),
-            ),
-            total=Decimal("1995.00"),
+            regular=regular,
+            cash=cash,
+            delivery=delivery,
+            total=regular.commission + cash.commission + delivery.commission,
+        )
+
+    async def _record_commission_payments(
+        self,
+        employee_role_ids: List[int],
+        period_start: date,
+        period_end: date,
+    ) -> None:
+        """
+        Guarda en settlement_payment la aportación de cada pago (cobro y, si
+        hubo entrega de póliza, entrega) con un INSERT ... SELECT.
+        
+        Cada pago se liga a la liquidación de su rol en el período, así un
+        solo statement cubre una liquidación o un lote completo.
+        """
+        
+        rates = (await self._rate_snapshot()).rates_on(period_end)
+        p = self._commission_payments(period_start, period_end, rates, employee_role_ids).cte("commission_payments")
+        s = (
+            select(Settlement.id, Settlement.employee_role_id)
+            .where(
+                Settlement.employee_role_id.in_(employee_role_ids),
+                Settlement.period_start == period_start,
+                Settlement.period_end == period_end,
+            )
+            .cte("settlements")
+        )
+        
+        rows = union_all(
+            select(
+                s.c.id, p.c.payment_id, p.c.commission_type,
+                p.c.amount, p.c.commission,
+            )
+            .join(s, s.c.employee_role_id == p.c.employee_role_id),
+            select(
+                s.c.id, p.c.payment_id, literal("delivery"),
+                literal(Decimal("0")), literal(rates.commission_delivery),
+            )
+            .join(s, s.c.employee_role_id == p.c.employee_role_id)
+            .where(p.c.delivered),
+        )
+        
+        await self.db.execute(
+            insert(SettlementPayment).from_select(
+                ["settlement_id", "payment_id", "commission_type",
+                 "amount_collected", "commission_amount"],
+                rows,
+                include_defaults=False,  # created_at: DEFAULT NOW() en BD
+            )
         )
     
-    def _calculate_deductions(
+    async def _calculate_deductions(
         self,
         employee_id: int,
         period_start: date,
@@ -462,34 +913,93 @@ class SettlementService:
     ) -> DeductionBreakdown:
         """Calcula las deducciones del período."""
         
+        loans = (await self._active_loans_by_employee([employee_id])).get(employee_id, [])
+        fuel = (await self._fuel_by_employee([employee_id], period_start, period_end)).get(employee_id, _NO_FUEL)
+        rates = (await self._rate_snapshot()).rates_on(period_end)
+        return self._deduction_breakdown(loans, fuel, rates)
+    
+    async def _fuel_by_employee(
+        self,
+        employee_ids: List[int],
+        period_start: date,
+        period_end: date,
+    ) -> Dict[int, object]:
+        """
+        Cargas de combustible del período por empleado, en un solo agregado
+        agrupado (idx_fuel_load_employee_date).
+        """
+        
+        result = await self.db.execute(
+            select(
+                FuelLoad.employee_id,
+                func.count().label("load_count"),
+                func.sum(FuelLoad.amount).label("total"),
+            )
+            .where(
+                FuelLoad.employee_id.in_(employee_ids),
+                FuelLoad.load_date >= period_start,
+                FuelLoad.load_date <= period_end,
+            )
+            .group_by(FuelLoad.employee_id)
+        )
+        return {row.employee_id: row for row in result.all()}
+    
+    async def _active_loans_by_employee(self, employee_ids: List[int]) -> Dict[int, List[LoanBalance]]:
+        """
+        Préstamos activos de varios empleados en una sola consulta, con
+        cuotas pagadas y saldo tomados del ledger (idx_loan_installment_loan).
+        """
+        
+        ledger = select(LoanInstallment).where(LoanInstallment.loan_id == EmployeeLoan.id)
+        paid_installments = (
+            ledger.with_only_columns(func.coalesce(func.max(LoanInstallment.installment_number), 0))
+            .scalar_subquery()
+        )
+        paid_amount = (
+            ledger.with_only_columns(func.coalesce(func.sum(LoanInstallment.amount), 0))
+            .scalar_subquery()
+        )
+        
+        result = await self.db.execute(
+            select(EmployeeLoan, paid_installments, paid_amount)
+            .where(
+                EmployeeLoan.employee_id.in_(employee_ids),
+                EmployeeLoan.status == LoanStatus.ACTIVE,
+            )
+            .order_by(EmployeeLoan.id)
+        )
+        
+        by_employee: Dict[int, List[LoanBalance]] = {}
+        for loan, paid, amount in result.all():
+            by_employee.setdefault(loan.employee_id, []).append(
+                LoanBalance(loan, paid, loan.total_amount - amount)
+            )
+        return by_employee
+    
+    def _deduction_breakdown(self, loans: List[LoanBalance], fuel, rates: SettlementRates) -> DeductionBreakdown:
+        """Arma las deducciones del período a partir de gasolina y préstamos activos."""
+        
         items = []
         
-        # 1. Gasolina (50% del gasto)
-        # TODO: Query a cargas_combustible
-        fuel_total = Decimal("800.00")  # Mock
+        # 1. Gasolina (porcentaje vigente del gasto en fuel_load del período)
+        fuel_total = Decimal(fuel.total)
         if fuel_total > 0:
             items.append(DeductionItem(
                 type=DeductionType.FUEL,
-                concept="Gasolina (50%)",
-                description=f"6 cargas · ${fuel_total} total",
-                amount=fuel_total * FUEL_DEDUCTION_RATE,
+                concept=f"Gasolina ({rates.fuel_deduction * 100:.0f}%)",
+                description=f"{fuel.load_count} cargas · ${fuel_total} total",
+                amount=(fuel_total * rates.fuel_deduction).quantize(Decimal("0.01")),
             ))
         
-        # 2. Préstamos activos
-        loans = self.db.execute(
-            select(EmployeeLoan)
-            .where(
-                EmployeeLoan.employee_id == employee_id,
-                EmployeeLoan.status == LoanStatus.ACTIVE,
-            )
-        ).scalars().all()
-        
-        for loan in loans:
+        # 2. Préstamos activos (la última cuota no pasa del saldo)
+        for loan, paid_installments, outstanding in loans:
+            if outstanding <= 0:
+                continue
             items.append(DeductionItem(
                 type=DeductionType.LOAN,
                 concept=loan.concept,
-                description=f"Cuota {loan.paid_installments + 1} de {loan.total_installments}",
-                amount=loan.installment_amount,
+                description=f"Cuota {paid_installments + 1} de {loan.total_installments}",
+                amount=min(loan.installment_amount, outstanding),
                 loan_id=loan.id,
             ))
         
@@ -497,29 +1007,120 @@ class SettlementService:
         
         return DeductionBreakdown(items=items, total=total)
     
-    def _update_loan_payments(
-        self,
-        employee_id: int,
-        period_start: date,
-        period_end: date,
-    ):
-        """Actualiza el progreso de préstamos al liquidar."""
+    async def _post_loan_installments(self, settlement_ids: List[int]) -> None:
+        """
+        Cobra las cuotas de préstamo de liquidaciones pagadas, en un solo
+        statement para todo el lote:
+        
+        0. Bloquea (FOR UPDATE, en orden de id) los préstamos del lote: dos
+           pagos concurrentes de liquidaciones distintas del mismo préstamo
+           no pueden calcular el mismo número de cuota.
+        1. Agrupa las deducciones de préstamo por (préstamo, liquidación) que
+           aún no están en loan_installment y las numera por préstamo: el
+           mismo préstamo puede venir en varias liquidaciones del lote.
+        2. INSERT en loan_installment; ON CONFLICT DO NOTHING solo sobre
+           (préstamo, liquidación), por si otra transacción la registró
+           primero. Un choque de número de cuota es un error y aborta: nunca
+           se pierde una deducción en silencio.
+        3. Suma por préstamo lo recién insertado (cuotas y monto) y hace
+           UPDATE employee_loan ... FROM esos totales (cuotas pagadas, saldo
+           y, si terminó, paid_off).
+        
+        Volver a aplicar una liquidación no inserta nada y no toca el préstamo.
+        """
         
-        loans = self.db.execute(
-            select(EmployeeLoan)
+        loan_ids = (
+            select(SettlementDeduction.loan_id)
             .where(
-                EmployeeLoan.employee_id == employee_id,
-                EmployeeLoan.status == LoanStatus.ACTIVE,
+                SettlementDeduction.settlement_id.in_(settlement_ids),
+                SettlementDeduction.deduction_type == DeductionType.LOAN,
+            )
+        )
+        await self.db.execute(
+            select(EmployeeLoan.id)
+            .where(EmployeeLoan.id.in_(loan_ids))
+            .order_by(EmployeeLoan.id)
+            .with_for_update()
+        )
+        
+        already_posted = (
+            select(LoanInstallment.id)
+            .where(
+                LoanInstallment.loan_id == SettlementDeduction.loan_id,
+                LoanInstallment.settlement_id == SettlementDeduction.settlement_id,
             )
-        ).scalars().all()
+            .exists()
+        )
+        pending = (
+            select(
+                SettlementDeduction.loan_id,
+                SettlementDeduction.settlement_id,
+                func.sum(SettlementDeduction.amount).label("amount"),
+            )
+            .where(
+                SettlementDeduction.settlement_id.in_(settlement_ids),
+                SettlementDeduction.deduction_type == DeductionType.LOAN,
+                ~already_posted,
+            )
+            .group_by(SettlementDeduction.loan_id, SettlementDeduction.settlement_id)
+            .cte("pending")
+        )
         
-        for loan in loans:
-            loan.paid_installments += 1
-            loan.remaining_balance -= loan.installment_amount
-            
-            if loan.paid_installments >= loan.total_installments:
-                loan.status = LoanStatus.PAID_OFF
-                loan.end_date = period_end
+        posted = (
+            pg_insert(LoanInstallment)
+            .from_select(
+                ["loan_id", "settlement_id", "installment_number", "amount"],
+                select(
+                    pending.c.loan_id,
+                    pending.c.settlement_id,
+                    EmployeeLoan.paid_installments + func.row_number().over(
+                        partition_by=pending.c.loan_id,
+                        order_by=pending.c.settlement_id,
+                    ),
+                    pending.c.amount,
+                )
+                .join(EmployeeLoan, pending.c.loan_id == EmployeeLoan.id)
+                .where(EmployeeLoan.status == LoanStatus.ACTIVE),
+                include_defaults=False,  # created_at: DEFAULT NOW() en BD
+            )
+            .on_conflict_do_nothing(constraint="uq_loan_installment_settlement")
+            .returning(LoanInstallment.loan_id, LoanInstallment.settlement_id, LoanInstallment.amount)
+            .cte("posted")
+        )
+        
+        totals = (
+            select(
+                posted.c.loan_id,
+                func.count().label("installments"),
+                func.sum(posted.c.amount).label("amount"),
+                func.max(Settlement.period_end).label("period_end"),
+            )
+            .join(Settlement, Settlement.id == posted.c.settlement_id)
+            .group_by(posted.c.loan_id)
+            .cte("loan_totals")
+        )
+        
+        paid_installments = EmployeeLoan.paid_installments + totals.c.installments
+        remaining = EmployeeLoan.remaining_balance - totals.c.amount
+        paid_off = or_(
+            paid_installments >= EmployeeLoan.total_installments,
+            remaining <= 0,
+        )
+        
+        await self.db.execute(
+            update(EmployeeLoan)
+            .where(EmployeeLoan.id == totals.c.loan_id)
+            .values(
+                paid_installments=paid_installments,
+                remaining_balance=remaining,
+                status=case(
+                    (paid_off, literal(LoanStatus.PAID_OFF, EmployeeLoan.status.type)),
+                    else_=EmployeeLoan.status,
+                ),
+                end_date=case((paid_off, totals.c.period_end), else_=EmployeeLoan.end_date),
+            )
+            .execution_options(synchronize_session=False)
+        )
     
     def _format_period_label(self, start: date, end: date) -> str:
         """Formatea el label del período: '2da Quincena · Febrero 2026'."""
@@ -535,19 +1136,25 @@ class SettlementService:
         
         return f"{quincena} Quincena · {month} {year}"
     
-    def _to_response(self, settlement: Settlement) -> SettlementResponse:
-        """Convierte un Settlement a SettlementResponse."""
-        
-        employee_data = self._get_collector_by_role(settlement.employee_role_id)
+    async def _to_response(
+        self,
+        settlement: Settlement,
+        employee: Optional[EmployeeBasic] = None,
+    ) -> SettlementResponse:
+        """Convierte un Settlement a SettlementResponse (consulta el cobrador si no se da)."""
         
-        return SettlementResponse(
-            id=settlement.id,
-            employee=EmployeeBasic(
+        if employee is None:
+            employee_data = await self._get_collector_by_role(settlement.employee_role_id)
+            employee = EmployeeBasic(
                 employee_id=employee_data['employee_id'],
                 employee_role_id=employee_data['employee_role_id'],
                 code=employee_data['code'],
                 full_name=employee_data['full_name'],
-            ),
+            )
+        
+        return SettlementResponse(
+            id=settlement.id,
+            employee=employee,
             period_start=settlement.period_start,
             period_end=settlement.period_end,
             commission_regular=settlement.commission_regular,
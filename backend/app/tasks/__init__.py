@@ -0,0 +1,3 @@
+from .worker import celery_app
+
+__all__ = ["celery_app"]
@@ -0,0 +1,41 @@
+"""
+Celery task: DailyCounterReconciler
+Runs nightly at 00:10 (see app.tasks.scheduler) to rebuild collector_daily_counter for the
+day that just ended from the payment table, correcting any drift in the
+incrementally maintained dashboard counters.
+
+Also runnable by hand: python -m app.tasks.counters [YYYY-MM-DD]
+"""
+import asyncio
+import logging
+import sys
+from datetime import date, timedelta
+from typing import Optional
+
+from app.core.database import async_session_factory
+from app.modules.collections.repository import CollectionRepository
+from .worker import celery_app, run_async
+
+logger = logging.getLogger(__name__)
+
+
+async def reconcile_daily_counters(day: Optional[date] = None) -> int:
+    """Reconcile `day` (default: yesterday). Returns the number of rows corrected."""
+    day = day or date.today() - timedelta(days=1)
+    async with async_session_factory() as session:
+        fixed = await CollectionRepository(session).reconcile_daily_counters(day)
+        await session.commit()
+    if fixed:
+        logger.warning("Contadores diarios %s: %d cobradores corregidos", day, fixed)
+    return fixed
+
+
+@celery_app.task(name="counters.reconcile_daily_counters")
+def reconcile_daily_counters_task(day: Optional[str] = None) -> int:
+    """Beat entry point; `day` is an ISO date (default: yesterday)."""
+    return run_async(reconcile_daily_counters(date.fromisoformat(day) if day else None))
+
+
+if __name__ == "__main__":
+    target = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    print(asyncio.run(reconcile_daily_counters(target)))
@@ -0,0 +1,34 @@
+"""
+Celery task: IdempotencyKeyPurge
+Runs nightly at 03:00 (see app.tasks.scheduler) to delete idempotency_key rows older than IDEMPOTENCY_TTL.
+Lookups already ignore them and a reused key replaces its expired row; the
+purge only keeps the table from growing.
+
+Also runnable by hand: python -m app.tasks.idempotency
+"""
+import asyncio
+import logging
+
+from app.core.database import async_session_factory
+from app.core.idempotency import purge_expired
+from .worker import celery_app, run_async
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_idempotency_keys() -> int:
+    """Delete expired keys. Returns the number of rows removed."""
+    async with async_session_factory() as session:
+        removed = await purge_expired(session)
+        await session.commit()
+    logger.info("Idempotency keys vencidas eliminadas: %d", removed)
+    return removed
+
+
+@celery_app.task(name="idempotency.purge_idempotency_keys")
+def purge_idempotency_keys_task() -> int:
+    return run_async(purge_idempotency_keys())
+
+
+if __name__ == "__main__":
+    print(asyncio.run(purge_idempotency_keys()))
@@ -1,3 +1,122 @@
 """
 Celery tasks for generating heavy reports in background.
+
+SettlementReceipts: renders the printable PDF receipts of a settlement
+period range to EXPORT_DIR on the Celery worker, never in the API
+process. The API enqueues it (POST /settlements/export/receipts) and
+answers 202 with a job id; the job state lives in Redis
+(`reports:job:{id}`, REPORT_JOB_TTL) so any API worker can report progress
+and serve the finished file. EXPORT_DIR must be a volume shared by the API
+and the worker.
+
+ExportCleanup: hourly, deletes files in EXPORT_DIR older than
+REPORT_JOB_TTL (finished receipts whose job expired, XLSX exports whose
+download was interrupted).
+
+Also runnable by hand: python -m app.tasks.reports YYYY-MM-DD YYYY-MM-DD
 """
+import asyncio
+import logging
+import os
+import sys
+import time
+import uuid
+from datetime import date
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import get_settings
+from app.core.database import async_session_factory
+from app.core.redis import get_redis
+from app.modules.settlements.export import remove_expired_files, write_receipts_pdf
+from .worker import celery_app, run_async
+
+logger = logging.getLogger(__name__)
+
+JOB_PREFIX = "reports:job:"
+
+
+async def create_job(kind: str, **params) -> str:
+    """Register a pending job in Redis and return its id."""
+    job_id = uuid.uuid4().hex
+    key = JOB_PREFIX + job_id
+    fields = {"kind": kind, "status": "pending", **{k: str(v) for k, v in params.items()}}
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, get_settings().REPORT_JOB_TTL)
+        await pipe.execute()
+    return job_id
+
+
+async def get_job(job_id: str) -> Optional[dict]:
+    job = await get_redis().hgetall(JOB_PREFIX + job_id)
+    return job or None
+
+
+async def _set_job(job_id: str, **fields) -> None:
+    try:
+        await get_redis().hset(JOB_PREFIX + job_id, mapping={k: str(v) for k, v in fields.items()})
+    except RedisError:
+        logger.warning("No se pudo actualizar el job %s en Redis", job_id)
+
+
+async def render_settlement_receipts(job_id: str, date_from: date, date_to: date) -> str:
+    """Render the receipts PDF for the range. Returns the file path."""
+    settings = get_settings()
+    os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+    path = os.path.join(settings.EXPORT_DIR, f"recibos-{date_from}-{date_to}-{job_id}.pdf")
+
+    await _set_job(job_id, status="running")
+    t0 = time.perf_counter()
+    try:
+        async with async_session_factory() as session:
+            count = await write_receipts_pdf(session, date_from, date_to, path)
+    except Exception as e:
+        logger.exception("Recibos de liquidación %s..%s fallaron", date_from, date_to)
+        if os.path.exists(path):
+            os.unlink(path)
+        await _set_job(job_id, status="failed", error=str(e))
+        raise
+
+    await _set_job(
+        job_id,
+        status="done",
+        path=path,
+        count=count,
+        render_ms=round((time.perf_counter() - t0) * 1000, 1),
+    )
+    logger.info("Recibos %s..%s: %d en %s", date_from, date_to, count, path)
+    return path
+
+
+@celery_app.task(name="reports.render_settlement_receipts")
+def render_settlement_receipts_task(job_id: str, date_from: str, date_to: str) -> str:
+    """Worker entry point; dates are ISO strings."""
+    return run_async(render_settlement_receipts(
+        job_id, date.fromisoformat(date_from), date.fromisoformat(date_to),
+    ))
+
+
+def cleanup_exports() -> int:
+    """Delete export files older than REPORT_JOB_TTL. Returns how many."""
+    settings = get_settings()
+    removed = remove_expired_files(settings.EXPORT_DIR, settings.REPORT_JOB_TTL)
+    if removed:
+        logger.info("Exportaciones: %d archivos vencidos borrados", removed)
+    return removed
+
+
+@celery_app.task(name="reports.cleanup_exports")
+def cleanup_exports_task() -> int:
+    return cleanup_exports()
+
+
+if __name__ == "__main__":
+    start, end = (date.fromisoformat(arg) for arg in sys.argv[1:3])
+
+    async def _main():
+        job_id = await create_job("settlement_receipts", date_from=start, date_to=end)
+        return await render_settlement_receipts(job_id, start, end)
+
+    print(asyncio.run(_main()))
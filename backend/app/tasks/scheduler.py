@@ -1,4 +1,35 @@
 """
 Celery Beat scheduler configuration.
-Defines periodic tasks (status updater, report generation, etc.)
+Defines periodic tasks (status updater, report generation, etc.);
+loaded by app.tasks.worker. Times are UTC.
+
+Nightly:
+- 00:10  counters.reconcile_daily_counters (previous day)
+- 03:00  idempotency.purge_idempotency_keys (older than IDEMPOTENCY_TTL)
+
+Hourly:
+- :30    reports.cleanup_exports (files in EXPORT_DIR older than REPORT_JOB_TTL)
+
+Every 5 minutes:
+- sessions.revoke_inactive_sessions (device sessions of deactivated users)
 """
+from celery.schedules import crontab
+
+beat_schedule = {
+    "reconcile-daily-counters": {
+        "task": "counters.reconcile_daily_counters",
+        "schedule": crontab(hour=0, minute=10),
+    },
+    "purge-idempotency-keys": {
+        "task": "idempotency.purge_idempotency_keys",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "cleanup-exports": {
+        "task": "reports.cleanup_exports",
+        "schedule": crontab(minute=30),
+    },
+    "revoke-inactive-sessions": {
+        "task": "sessions.revoke_inactive_sessions",
+        "schedule": crontab(minute="*/5"),
+    },
+}
@@ -0,0 +1,36 @@
+"""
+Celery task: InactiveUserSessionRevoker
+Runs every 5 minutes (see app.tasks.scheduler) to close the device sessions
+of deactivated users. Refresh never touches Postgres, so without this a
+disabled user would keep rotating refresh tokens until they expire.
+
+Also runnable by hand: python -m app.tasks.sessions
+"""
+import asyncio
+import logging
+
+from app.core.database import async_session_factory
+from app.core.redis import get_redis
+from app.modules.auth.service import revoke_inactive_user_sessions
+from app.modules.auth.sessions import RefreshTokenStore
+from .worker import celery_app, run_async
+
+logger = logging.getLogger(__name__)
+
+
+async def revoke_inactive_sessions() -> int:
+    """Revoke sessions of inactive users. Returns how many were closed."""
+    async with async_session_factory() as session:
+        revoked = await revoke_inactive_user_sessions(session, RefreshTokenStore(get_redis()))
+    if revoked:
+        logger.info("Sesiones de usuarios inactivos cerradas: %d", revoked)
+    return revoked
+
+
+@celery_app.task(name="sessions.revoke_inactive_sessions")
+def revoke_inactive_sessions_task() -> int:
+    return run_async(revoke_inactive_sessions())
+
+
+if __name__ == "__main__":
+    print(asyncio.run(revoke_inactive_sessions()))
@@ -0,0 +1,48 @@
+"""
+Celery application for the background worker and beat.
+
+    celery -A app.tasks worker -l info
+    celery -A app.tasks beat -l info
+
+Task bodies are async and share the API's engine and Redis client. Each
+task runs in its own event loop (`run_async`), so pooled connections are
+closed before the loop ends instead of leaking into the next task.
+"""
+import asyncio
+from typing import Awaitable, TypeVar
+
+from celery import Celery
+
+from app.core.config import get_settings
+from app.core.database import engine
+from app.core.redis import close_redis
+from .scheduler import beat_schedule
+
+T = TypeVar("T")
+
+settings = get_settings()
+
+celery_app = Celery(
+    "protegrt",
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND,
+    include=["app.tasks.counters", "app.tasks.idempotency", "app.tasks.reports", "app.tasks.sessions"],
+)
+celery_app.conf.update(
+    beat_schedule=beat_schedule,
+    timezone="UTC",  # same clock as date.today() in the containers
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+)
+
+
+def run_async(coro: Awaitable[T]) -> T:
+    """Run an async task body to completion on a fresh event loop."""
+    async def _run() -> T:
+        try:
+            return await coro
+        finally:
+            await engine.dispose()
+            await close_redis()
+
+    return asyncio.run(_run())
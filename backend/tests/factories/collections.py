@@ -0,0 +1,78 @@
+"""Builders for a collector's card book (client, policy, payments, card)."""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.client import Client
+from app.models.policy import Card, Collector, Payment, Policy
+
+
+async def create_collector(session: AsyncSession, code: str, collector_id: int = 1) -> Collector:
+    collector = Collector(id=collector_id, code_name=code, full_name=f"Cobrador {code}", status="active")
+    session.add(collector)
+    await session.flush()
+    return collector
+
+
+async def create_card(
+    session: AsyncSession,
+    folio: int,
+    holder: str,
+    payments: int = 7,
+    paid: int = 1,
+    first_due: date | None = None,
+    amount: Decimal = Decimal("500.00"),
+    location: tuple[float, float] | None = None,
+    updated_at: datetime | None = None,
+) -> Card:
+    """
+    One active card held by `holder` with `payments` monthly installments.
+    `location` is (lat, lng) of the client's address; `updated_at` stamps
+    every row created (defaults to the database clock).
+    """
+    first_due = first_due or date.today() - timedelta(days=30)
+    stamps = {"created_at": updated_at, "updated_at": updated_at} if updated_at else {}
+
+    # Explicit ids: BIGINT keys do not autoincrement on SQLite
+    address_id = None
+    if location is not None:
+        lat, lng = location
+        await session.execute(
+            text("INSERT INTO address (id, street, geom) VALUES (:id, 'Calle', :geom)"),
+            {"id": folio, "geom": f"POINT({lng} {lat})"},
+        )
+        address_id = folio
+    client = Client(
+        id=folio, first_name="Cliente", paternal_surname=str(folio),
+        address_id=address_id, **stamps,
+    )
+    session.add(client)
+    await session.flush()
+
+    policy = Policy(
+        id=folio, folio=folio, client_id=client.id, vehicle_id=1, coverage_id=1,
+        payment_plan="monthly_7", **stamps,
+    )
+    session.add(policy)
+    await session.flush()
+
+    session.add_all(
+        Payment(
+            policy_id=policy.id,
+            payment_number=n,
+            due_date=first_due + timedelta(days=30 * (n - 1)),
+            amount=amount,
+            status="paid" if n <= paid else "pending",
+            **stamps,
+        )
+        for n in range(1, payments + 1)
+    )
+    card = Card(
+        policy_id=policy.id, current_holder=holder,
+        assignment_date=date.today(), status="active", **stamps,
+    )
+    session.add(card)
+    await session.flush()
+    return card
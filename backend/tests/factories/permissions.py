@@ -0,0 +1,42 @@
+"""Builders for roles, permissions and users with a role."""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import AppUser, Permission, PermissionVersion, Role, RolePermission
+
+
+async def _permission(session: AsyncSession, name: str) -> Permission:
+    permission = await session.scalar(select(Permission).where(Permission.name == name))
+    if permission is None:
+        count = len((await session.scalars(select(Permission.id))).all())
+        permission = Permission(id=count + 1, name=name)
+        session.add(permission)
+        await session.flush()
+    return permission
+
+
+async def create_role(session: AsyncSession, role_id: int, *permissions: str) -> Role:
+    role = Role(id=role_id, name=f"rol-{role_id}")
+    session.add(role)
+    await session.flush()
+    for name in permissions:
+        permission = await _permission(session, name)
+        session.add(RolePermission(role_id=role_id, permission_id=permission.id))
+    await session.flush()
+    return role
+
+
+async def create_user(session: AsyncSession, user_id: int, role_id: int | None) -> AppUser:
+    user = AppUser(
+        id=user_id, employee_id=user_id, username=f"user{user_id}",
+        password_hash="-", role_id=role_id,
+    )
+    session.add(user)
+    await session.flush()
+    return user
+
+
+async def set_permission_version(session: AsyncSession, version: int) -> None:
+    """What the migration 016 triggers do on Postgres."""
+    await session.merge(PermissionVersion(id=1, version=version))
+    await session.flush()
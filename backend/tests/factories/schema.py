@@ -0,0 +1,78 @@
+"""
+SQLite stand-in for the collections schema (plus users, device sessions,
+roles and permissions), used by the integration tests and the benchmarks
+under tests/perf.
+
+PostGIS is not available here: `address.geom` holds WKT text
+("POINT(lng lat)") and ST_X / ST_Y are registered as Python functions that
+parse it. `greatest` is registered the same way. Tables with types SQLite
+cannot render (geometry, JSONB) are created from plain DDL.
+
+Interval arithmetic on the database clock (`now() - interval`) does not
+work on SQLite, so TTL cut-offs are not exercised here.
+"""
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.models.base import Base
+from app.models.client import Client
+from app.models.policy import (
+    Card, CollectionAssignment, Collector, CollectorDailyCounter, Payment, Policy,
+)
+from app.models.user import (
+    AppUser, DeviceSession, Permission, PermissionVersion, Role, RolePermission,
+)
+
+
+RAW_DDL = (
+    "CREATE TABLE municipality (id INTEGER PRIMARY KEY, name VARCHAR(100), "
+    "short_name VARCHAR(50), siga_code VARCHAR(100))",
+    "CREATE TABLE address (id INTEGER PRIMARY KEY, street VARCHAR(150), "
+    "exterior_number VARCHAR(10), interior_number VARCHAR(10), "
+    "cross_street_1 VARCHAR(100), cross_street_2 VARCHAR(100), "
+    "neighborhood VARCHAR(100), municipality_id INTEGER, postal_code VARCHAR(10), "
+    "geom TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+    "CREATE TABLE idempotency_key (scope VARCHAR(100) NOT NULL, key VARCHAR(255) NOT NULL, "
+    "request_hash CHAR(64) NOT NULL, response JSON NOT NULL, "
+    "created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (scope, key))",
+)
+
+COLLECTION_TABLES = [
+    Client.__table__, Policy.__table__, Payment.__table__, Card.__table__,
+    CollectionAssignment.__table__, Collector.__table__, CollectorDailyCounter.__table__,
+]
+
+USER_TABLES = [
+    Role.__table__, Permission.__table__, RolePermission.__table__,
+    PermissionVersion.__table__, AppUser.__table__, DeviceSession.__table__,
+]
+
+
+def _point_coord(index: int):
+    def coord(wkt):
+        if wkt is None:
+            return None
+        return float(wkt[wkt.index("(") + 1:wkt.index(")")].split()[index])
+    return coord
+
+
+def _greatest(*values):
+    present = [v for v in values if v is not None]
+    return max(present) if present else None
+
+
+def _register_functions(dbapi_connection, _record):
+    dbapi_connection.create_function("ST_X", 1, _point_coord(0))
+    dbapi_connection.create_function("ST_Y", 1, _point_coord(1))
+    dbapi_connection.create_function("greatest", -1, _greatest)
+
+
+async def create_engine(url: str = "sqlite+aiosqlite://") -> AsyncEngine:
+    """Engine with the collections and permission tables created and the SQL shims registered."""
+    engine = create_async_engine(url)
+    event.listen(engine.sync_engine, "connect", _register_functions)
+    async with engine.begin() as conn:
+        for ddl in RAW_DDL:
+            await conn.execute(text(ddl))
+        await conn.run_sync(Base.metadata.create_all, tables=COLLECTION_TABLES + USER_TABLES)
+    return engine
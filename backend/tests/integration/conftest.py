@@ -0,0 +1,45 @@
+"""
+Integration fixtures: an in-memory SQLite database with the collections
+tables (see tests/factories/schema.py), plus a statement counter on its
+engine.
+"""
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from tests.factories.schema import create_engine
+
+
+class StatementCounter:
+    """Counts statements sent to the database through an engine."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def reset(self):
+        self.count = 0
+
+
+@pytest.fixture
+async def engine():
+    engine = await create_engine()
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def session(engine):
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as session:
+        yield session
+
+
+@pytest.fixture
+def statements(engine):
+    counter = StatementCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(engine.sync_engine, "before_cursor_execute", counter)
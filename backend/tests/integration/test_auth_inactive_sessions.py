@@ -0,0 +1,39 @@
+import fakeredis
+import pytest
+from sqlalchemy import select
+
+from app.core.exceptions import AppException
+from app.models.user import AppUser, DeviceSession
+from app.modules.auth.service import revoke_inactive_user_sessions
+from app.modules.auth.sessions import RefreshTokenStore
+from tests.factories.permissions import create_user
+
+
+async def _device(session, store, user_id, token):
+    session.add(DeviceSession(
+        user_id=user_id, device_id=f"dev-{token}", device_type="android",
+        app_type="collector_app", token=token,
+    ))
+    await session.flush()
+    return await store.issue(token, {"sub": str(user_id), "sid": "1"}, 3600)
+
+
+async def test_deactivated_user_can_no_longer_refresh(session):
+    store = RefreshTokenStore(fakeredis.FakeAsyncRedis(decode_responses=True))
+    await create_user(session, 1, None)
+    await create_user(session, 2, None)
+    disabled = await _device(session, store, 1, "tok-1")
+    active = await _device(session, store, 2, "tok-2")
+    (await session.get(AppUser, 1)).is_active = False
+
+    assert await revoke_inactive_user_sessions(session, store) == 1
+
+    with pytest.raises(AppException):
+        await store.rotate(disabled)
+    await store.rotate(active)
+    open_sessions = (await session.scalars(
+        select(DeviceSession.token).where(DeviceSession.is_active.is_(True))
+    )).all()
+    assert open_sessions == ["tok-2"]
+    # Nothing left to revoke on the next run
+    assert await revoke_inactive_user_sessions(session, store) == 0
@@ -0,0 +1,82 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from app.modules.collections.service import CollectionService
+from tests.factories.collections import create_card
+
+
+async def _folios_statements(session, statements, holder, limit=200):
+    session.expunge_all()
+    statements.reset()
+    page = await CollectionService(session).get_folios(holder, limit=limit)
+    return page, statements.count
+
+
+async def test_get_folios_returns_counters_per_card(session, statements):
+    await create_card(session, folio=1001, holder="C1", payments=7, paid=2)
+    await create_card(session, folio=1002, holder="C1", payments=4, paid=0)
+    await create_card(session, folio=2001, holder="C2")
+
+    page, _ = await _folios_statements(session, statements, "C1")
+
+    by_folio = {card.folio: card for card in page.items}
+    assert set(by_folio) == {"1001", "1002"}
+    assert (by_folio["1001"].payment_number, by_folio["1001"].total_payments,
+            by_folio["1001"].paid_payments) == (3, 7, 2)
+    assert (by_folio["1002"].payment_number, by_folio["1002"].total_payments,
+            by_folio["1002"].paid_payments) == (1, 4, 0)
+    assert page.total == 2
+
+
+async def test_get_folios_query_count_is_constant(session, statements):
+    for folio in range(1, 4):
+        await create_card(session, folio=folio, holder="C1")
+    _, small = await _folios_statements(session, statements, "C1")
+
+    for folio in range(4, 61):
+        await create_card(session, folio=folio, holder="C1")
+    page, large = await _folios_statements(session, statements, "C1")
+
+    assert len(page.items) == 60
+    assert large == small <= 2
+
+
+async def test_get_folios_paged_query_count_is_constant(session, statements):
+    for folio in range(1, 11):
+        await create_card(session, folio=folio, holder="C1")
+    _, small = await _folios_statements(session, statements, "C1", limit=5)
+
+    for folio in range(11, 101):
+        await create_card(session, folio=folio, holder="C1")
+    page, large = await _folios_statements(session, statements, "C1", limit=5)
+
+    assert len(page.items) == 5 and page.total == 100
+    assert large == small <= 2
+
+
+async def test_keyset_pages_cover_every_card_once_in_order(session):
+    today = date.today()
+    for folio in range(1, 24):
+        # Repeated due dates and amounts exercise the policy.id tie-break
+        await create_card(
+            session, folio=folio, holder="C1",
+            first_due=today - timedelta(days=folio % 5),
+            amount=Decimal(100 * (folio % 4 + 1)),
+        )
+    service = CollectionService(session)
+
+    for sort in ("due_date", "amount"):
+        seen, cursor = [], None
+        while True:
+            page = await service.get_folios("C1", sort=sort, cursor=cursor, limit=5)
+            seen.extend(page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        assert sorted(int(card.folio) for card in seen) == list(range(1, 24))
+        if sort == "amount":
+            keys = [(-Decimal(card.amount), int(card.folio)) for card in seen]
+        else:
+            keys = [(card.due_date, int(card.folio)) for card in seen]
+        assert keys == sorted(keys)
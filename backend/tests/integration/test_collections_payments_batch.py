@@ -0,0 +1,26 @@
+import pytest
+
+from app.modules.collections.service import CollectionService
+from tests.factories.collections import create_card, create_collector
+
+
+def _item(amount, payment_number=2, folio="1001"):
+    return {
+        "folio": folio, "payment_number": payment_number, "amount": amount,
+        "method": "cash", "receipt_number": "R-1",
+    }
+
+
+@pytest.mark.parametrize("amount", ["NaN", "Infinity", "-Infinity", "sNaN", "0", "-5", "abc"])
+async def test_batch_reports_invalid_amount_per_item(session, amount):
+    await create_collector(session, "C1")
+    await create_card(session, folio=1001, holder="C1", payments=3, paid=1)
+
+    results = await CollectionService(session).register_payments_batch(
+        "C1", [_item(amount), _item("500.00", payment_number=99)]
+    )
+
+    assert results[0]["status"] == "error"
+    assert results[0]["message"] == "Monto inválido"
+    # The rest of the batch is still processed
+    assert results[1]["message"] == "Pago #99 no encontrado para folio 1001"
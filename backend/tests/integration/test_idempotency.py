@@ -0,0 +1,119 @@
+import fakeredis
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.exceptions import ConflictError, ValidationError
+from app.core.idempotency import IdempotencyStore, request_hash
+from app.models.policy import Collector
+from tests.factories.schema import create_engine
+
+SCOPE = "proposals:C1"
+RESPONSE = {"id": 7, "status": "paid", "message": "Pago #2 registrado exitosamente"}
+
+
+@pytest.fixture
+async def factory(tmp_path):
+    # A file database: each session gets its own connection and transaction
+    engine = await create_engine(f"sqlite+aiosqlite:///{tmp_path}/idempotency.db")
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture
+def redis_down():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    return fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+
+
+async def _first_attempt(factory, redis, key, req_hash, response=RESPONSE):
+    """Run a request to completion: reserve, stage with the work, commit, publish."""
+    async with factory() as session:
+        store = IdempotencyStore(redis, session)
+        assert await store.begin(SCOPE, key, req_hash) is None
+        assert await store.stage(SCOPE, key, req_hash, response) is None
+        await session.commit()
+        await store.publish(SCOPE, key, req_hash, response)
+
+
+async def test_retry_replays_the_first_response(factory, redis):
+    req_hash = request_hash(1001, 2, "450.00", "cash", "R1")
+    await _first_attempt(factory, redis, "k1", req_hash)
+
+    async with factory() as session:
+        assert await IdempotencyStore(redis, session).begin(SCOPE, "k1", req_hash) == RESPONSE
+
+
+async def test_key_reused_for_another_payload_is_rejected(factory, redis):
+    await _first_attempt(factory, redis, "k1", request_hash(1001, 2))
+
+    async with factory() as session:
+        with pytest.raises(ValidationError):
+            await IdempotencyStore(redis, session).begin(SCOPE, "k1", request_hash(1001, 3))
+
+
+async def test_concurrent_retry_gets_409_while_first_runs(factory, redis):
+    req_hash = request_hash(1001, 2)
+    async with factory() as first, factory() as second:
+        assert await IdempotencyStore(redis, first).begin(SCOPE, "k1", req_hash) is None
+        with pytest.raises(ConflictError):
+            await IdempotencyStore(redis, second).begin(SCOPE, "k1", req_hash)
+
+
+async def test_released_key_can_be_retried(factory, redis):
+    req_hash = request_hash(1001, 2)
+    async with factory() as session:
+        store = IdempotencyStore(redis, session)
+        assert await store.begin(SCOPE, "k1", req_hash) is None
+        await store.release(SCOPE, "k1")
+        assert await store.begin(SCOPE, "k1", req_hash) is None
+
+
+async def test_replay_falls_back_to_postgres_and_backfills_redis(factory, redis):
+    req_hash = request_hash(1001, 2)
+    await _first_attempt(factory, redis, "k1", req_hash)
+    await redis.flushall()
+
+    async with factory() as session:
+        assert await IdempotencyStore(redis, session).begin(SCOPE, "k1", req_hash) == RESPONSE
+    assert await redis.get("idempotency:proposals:C1:k1") is not None
+
+
+async def test_without_redis_the_loser_rolls_back_and_replays(factory, redis_down):
+    req_hash = request_hash(1001, 2)
+    async with factory() as winner, factory() as loser:
+        winner_store = IdempotencyStore(redis_down, winner)
+        loser_store = IdempotencyStore(redis_down, loser)
+        # No in-progress marker without Redis: both attempts proceed
+        assert await winner_store.begin(SCOPE, "k1", req_hash) is None
+        assert await loser_store.begin(SCOPE, "k1", req_hash) is None
+
+        assert await winner_store.stage(SCOPE, "k1", req_hash, RESPONSE) is None
+        await winner.commit()
+
+        loser.add(Collector(id=99, code_name="WORK", status="active"))
+        await loser.flush()
+        replay = await loser_store.stage(SCOPE, "k1", req_hash, {"id": 8, "status": "paid"})
+
+    assert replay == RESPONSE
+    async with factory() as session:
+        # The loser's work was discarded with its transaction
+        assert await session.scalar(select(func.count()).select_from(Collector)) == 0
+
+
+async def test_without_redis_the_loser_with_another_payload_gets_422(factory, redis_down):
+    async with factory() as winner, factory() as loser:
+        winner_store = IdempotencyStore(redis_down, winner)
+        assert await winner_store.stage(SCOPE, "k1", request_hash(1001, 2), RESPONSE) is None
+        await winner.commit()
+
+        with pytest.raises(ValidationError):
+            await IdempotencyStore(redis_down, loser).stage(
+                SCOPE, "k1", request_hash(1001, 3), {"id": 8},
+            )
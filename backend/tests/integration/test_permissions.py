@@ -0,0 +1,72 @@
+import pytest
+from fastapi import HTTPException
+
+from app.core.permissions import PermissionProvider, load_index, require_permission
+from tests.factories.permissions import create_role, create_user, set_permission_version
+
+ADMIN, COLLECTIONS, CASHIER = 1, 2, 3
+
+
+@pytest.fixture
+async def roles(session):
+    await create_role(session, ADMIN, "*")
+    await create_role(session, COLLECTIONS, "collections.*", "users.sessions")
+    await create_role(session, CASHIER, "payments.edit")
+    for user_id, role_id in ((10, ADMIN), (20, COLLECTIONS), (30, CASHIER), (40, None)):
+        await create_user(session, user_id, role_id)
+    await set_permission_version(session, 1)
+
+
+@pytest.mark.parametrize(
+    "user_id, permission, allowed",
+    [
+        (10, "anything.at_all", True),
+        (20, "collections.assign", True),
+        (20, "users.sessions", True),
+        (20, "users.lockouts", False),
+        (30, "payments.edit", True),
+        (30, "payments.delete", False),
+        (40, "payments.edit", False),  # no role
+        (99, "payments.edit", False),  # unknown user
+    ],
+)
+async def test_grants(session, roles, user_id, permission, allowed):
+    index = await load_index(session, 1)
+
+    assert index.grants_for(user_id).allows(permission, permission.split(".")[0]) is allowed
+
+
+async def test_index_is_reused_until_the_version_changes(session, roles, statements):
+    provider = PermissionProvider(refresh_seconds=3600)
+    first = await provider.get(session)
+
+    statements.reset()
+    assert await provider.get(session) is first
+    assert statements.count == 0
+
+    # Once the interval is over, a version check with no change keeps the index
+    provider.refresh_seconds = 0
+    assert await provider.get(session) is first
+    assert statements.count == 1
+
+    await create_role(session, 4, "reports.view")
+    await create_user(session, 50, 4)
+    await set_permission_version(session, 2)
+    second = await provider.get(session)
+
+    assert second.version == 2
+    assert second.grants_for(50).allows("reports.view", "reports")
+    assert provider.reloads == 2
+
+
+async def test_require_permission_dependency(session, roles, monkeypatch):
+    provider = PermissionProvider(refresh_seconds=3600)
+    monkeypatch.setattr("app.core.permissions.permission_provider", provider)
+    check = require_permission("collections.assign")
+
+    user = {"sub": "20"}
+    assert await check(current_user=user, db=session) is user
+
+    with pytest.raises(HTTPException) as exc:
+        await check(current_user={"sub": "30"}, db=session)
+    assert exc.value.status_code == 403
@@ -0,0 +1,69 @@
+"""
+Benchmark: affinity.assign_cards at city scale.
+
+Synthetic book: cards drawn around `--collectors` neighbourhood hubs, each
+currently held by a random collector (the worst case: no spatial affinity
+yet), plus a second pass starting from the first pass's result (a routine
+rebalance, where stickiness keeps most cards in place).
+
+    python -m tests.perf.bench_affinity --cards 100000 --collectors 25
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from app.modules.collections.affinity import KM_PER_DEG_LAT, assign_cards
+
+
+def mean_km_to_center(lat, lng, assignment, centers) -> float:
+    placed = assignment >= 0
+    c = centers[assignment[placed]]
+    dlat = (lat[placed] - c[:, 0]) * KM_PER_DEG_LAT
+    dlng = (lng[placed] - c[:, 1]) * KM_PER_DEG_LAT * np.cos(np.radians(lat[placed]))
+    return float(np.sqrt(dlat ** 2 + dlng ** 2).mean())
+
+
+def main(cards: int, collectors: int, slack: float, repeat: int) -> None:
+    rng = np.random.default_rng(7)
+    hubs = np.column_stack((
+        20.67 + rng.uniform(-0.2, 0.2, collectors),
+        -103.35 + rng.uniform(-0.2, 0.2, collectors),
+    ))
+    hub = rng.integers(0, collectors, cards)
+    lat = hubs[hub, 0] + rng.normal(0, 0.03, cards)
+    lng = hubs[hub, 1] + rng.normal(0, 0.03, cards)
+    current = rng.integers(0, collectors, cards)
+    capacity = np.full(collectors, int(np.ceil(cards / collectors * slack)))
+
+    print(f"{cards:,} cards x {collectors} collectors, capacity {capacity[0]:,} each, "
+          f"median of {repeat} runs")
+    print(f"{'pass':<24}{'ms':>9}{'iters':>7}{'moved':>10}{'unplaced':>10}{'km to centre':>14}")
+
+    for name in ("random holders", "rebalance of result"):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = assign_cards(lat, lng, current, capacity)
+            samples.append((time.perf_counter() - started) * 1000)
+
+        counts = np.bincount(result.assignment[result.assignment >= 0], minlength=collectors)
+        assert (counts <= capacity).all()
+        moved = int((result.assignment != current).sum())
+        print(
+            f"{name:<24}{statistics.median(samples):>9.0f}{result.iterations:>7}{moved:>10,}"
+            f"{int((result.assignment < 0).sum()):>10,}"
+            f"{mean_km_to_center(lat, lng, result.assignment, result.centers):>14.2f}"
+        )
+        current = result.assignment
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=100_000)
+    parser.add_argument("--collectors", type=int, default=25)
+    parser.add_argument("--slack", type=float, default=1.1, help="capacity / (cards / collectors)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.cards, args.collectors, args.slack, args.repeat)
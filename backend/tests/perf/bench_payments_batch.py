@@ -0,0 +1,172 @@
+"""
+Benchmark: POST /collections/proposals/batch vs one /proposals call per item.
+
+Runs CollectionService against an in-memory repository that counts the
+statements each repository method sends (get_policy_by_folio is two: the
+policy and its selectin-loaded payments) and can add a simulated round
+trip per statement (`--rtt-ms`, e.g. 1.0 for app → PgBouncer → Postgres
+on the same network). With `--rtt-ms 0` it measures the service-side
+processing alone. Neither mode includes Postgres execution time.
+
+    python -m tests.perf.bench_payments_batch --items 100 1000 --rtt-ms 0 1
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime
+from decimal import Decimal
+from types import MappingProxyType, SimpleNamespace
+
+from app.modules.collections.service import CollectionService
+from app.modules.settlements.rates import RateSnapshot, rate_provider
+
+PLANS = ("monthly_7", "cash", "cash_2_installments")
+METHODS = ("cash", "transfer", "deposit")
+
+
+class StubRepository:
+    """Book of `folios` policies x 7 pending payments, held in dicts."""
+
+    def __init__(self, folios: int, rtt: float):
+        self.rtt = rtt
+        self.statements = 0
+        self.collector = SimpleNamespace(id=1, code_name="BENCH")
+        self.policies = {
+            folio: SimpleNamespace(id=folio, folio=folio, payment_plan=PLANS[folio % 3])
+            for folio in range(1, folios + 1)
+        }
+        self.payments = {
+            (folio, n): SimpleNamespace(
+                id=folio * 10 + n, policy_id=folio, payment_number=n, status="pending",
+            )
+            for folio in self.policies for n in range(1, 8)
+        }
+        self.by_id = {p.id: p for p in self.payments.values()}
+
+    async def _trip(self, statements: int = 1) -> None:
+        self.statements += statements
+        if self.rtt:
+            await asyncio.sleep(self.rtt * statements)
+
+    # Single registration path
+    async def get_policy_by_folio(self, folio):
+        await self._trip(2)
+        return self.policies.get(folio)
+
+    async def get_collector_by_code(self, code):
+        await self._trip()
+        return self.collector
+
+    async def get_payment_by_policy_and_number(self, policy_id, number):
+        await self._trip()
+        return self.payments.get((policy_id, number))
+
+    async def create_payment_proposal(self, payment, amount, method, receipt_number, collector_id):
+        await self._trip()
+        payment.status = "paid"
+        return payment
+
+    async def apply_counter_delta(self, collector_id, day, delta):
+        await self._trip()
+
+    # Batch path
+    async def get_payments_by_folio_number(self, pairs):
+        await self._trip()
+        rows = []
+        for folio, number in pairs:
+            policy = self.policies.get(folio)
+            if policy is None:
+                continue
+            payment = self.payments.get((folio, number))
+            rows.append(SimpleNamespace(
+                policy_id=policy.id, folio=folio, payment_plan=policy.payment_plan,
+                payment_id=payment.id if payment else None,
+                payment_number=number, status=payment.status if payment else None,
+            ))
+        return rows
+
+    async def apply_payments(self, payment_ids, amounts, methods, receipt_numbers, collector_id):
+        await self._trip()
+        applied = []
+        for payment_id in payment_ids:
+            payment = self.by_id[payment_id]
+            if payment.status != "paid":
+                payment.status = "paid"
+                applied.append(payment_id)
+        return applied
+
+
+def day_of_receipts(count: int) -> list:
+    return [
+        {
+            "folio": str(1 + i // 7),
+            "payment_number": 1 + i % 7,
+            "amount": "450.00",
+            "method": METHODS[i % 3],
+            "receipt_number": f"R{i:05d}",
+        }
+        for i in range(count)
+    ]
+
+
+def prime_rates() -> None:
+    """Serve the default rates from memory, as a warm worker does."""
+    rate_provider.refresh_seconds = float("inf")
+    rate_provider._snapshot = RateSnapshot(
+        version=0, loaded_at=datetime.utcnow(),
+        settlement_rates=MappingProxyType({}), collector_goals=MappingProxyType({}),
+        seller_levels=(), seller_commissions=MappingProxyType({}),
+        commission_percentages=MappingProxyType({}),
+    )
+    rate_provider._checked_at = time.monotonic()
+
+
+async def one_by_one(items: list, rtt: float) -> tuple[float, int]:
+    repo = StubRepository(len(items) // 7 + 1, rtt)
+    service = CollectionService(session=None)
+    service.repo = repo
+    started = time.perf_counter()
+    for item in items:
+        await service.register_payment(
+            int(item["folio"]), item["payment_number"], Decimal(item["amount"]),
+            item["method"], item["receipt_number"], "BENCH",
+        )
+    return (time.perf_counter() - started) * 1000, repo.statements
+
+
+async def batched(items: list, rtt: float) -> tuple[float, int]:
+    repo = StubRepository(len(items) // 7 + 1, rtt)
+    service = CollectionService(session=None)
+    service.repo = repo
+    started = time.perf_counter()
+    results = await service.register_payments_batch("BENCH", items)
+    elapsed = (time.perf_counter() - started) * 1000
+    assert all(r["status"] == "paid" for r in results), results[:3]
+    return elapsed, repo.statements
+
+
+async def main(sizes: list[int], rtts: list[float], repeat: int) -> None:
+    prime_rates()
+    print(f"median of {repeat} runs; statements = database round trips")
+    print(f"{'items':>6}{'rtt ms':>8}{'1-by-1 ms':>11}{'stmts':>7}{'batch ms':>10}{'stmts':>7}{'speedup':>9}")
+    for size in sizes:
+        items = day_of_receipts(size)
+        for rtt_ms in rtts:
+            single = [await one_by_one(items, rtt_ms / 1000) for _ in range(repeat)]
+            batch = [await batched(items, rtt_ms / 1000) for _ in range(repeat)]
+            single_ms = statistics.median(ms for ms, _ in single)
+            batch_ms = statistics.median(ms for ms, _ in batch)
+            print(
+                f"{size:>6}{rtt_ms:>8.1f}{single_ms:>11.1f}{single[0][1]:>7}"
+                f"{batch_ms:>10.1f}{batch[0][1]:>7}{single_ms / batch_ms:>8.0f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--rtt-ms", type=float, nargs="+", default=[0.0, 1.0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.rtt_ms, args.repeat))
@@ -0,0 +1,83 @@
+"""
+Benchmark: route length vs computation time of routing.plan_route.
+
+Random stops around Guadalajara, scored against the previous behaviour
+(visiting in due-date order) and against the nearest-neighbour seed alone.
+The endpoint budget is ~200 ms for 300 stops; plan_route stops improving
+at TIME_BUDGET_S.
+
+    python -m tests.perf.bench_route --stops 50 100 200 300 --weights 0 1
+"""
+import argparse
+import statistics
+
+import numpy as np
+
+from app.modules.collections import routing
+
+
+def path_km(dist: np.ndarray, order) -> float:
+    order = np.asarray(order)
+    return float(dist[order[:-1], order[1:]].sum())
+
+
+def objective(dist: np.ndarray, urgency: np.ndarray, weight: float, order) -> float:
+    """plan_route's objective: km + weight * Σ position * urgency."""
+    order = np.asarray(order)
+    return path_km(dist, order) + weight * float((np.arange(len(order)) * urgency[order]).sum())
+
+
+def run(n: int, weight: float, seeds: int) -> dict:
+    stats = {"ms": [], "due_km": [], "nn_km": [], "km": [], "nn_obj": [], "obj": []}
+    for seed in range(seeds):
+        rng = np.random.default_rng(seed)
+        lat = 20.67 + rng.uniform(-0.15, 0.15, n)
+        lng = -103.35 + rng.uniform(-0.15, 0.15, n)
+        days = rng.integers(0, 120, n)
+        start = (20.67, -103.35)
+
+        planned = routing.plan_route(list(zip(lat, lng)), list(days), start, weight)
+
+        # Same matrix plan_route builds: node 0 is the start position
+        points = np.vstack([start, np.column_stack((lat, lng))])
+        dist = routing.distance_matrix(points[:, 0], points[:, 1])
+        urgency = np.concatenate(([0.0], np.minimum(days, routing.MAX_URGENCY_DAYS) / 30.0))
+        by_due = np.concatenate(([0], 1 + np.argsort(-days, kind="stable")))
+        seed_tour = routing._nearest_neighbour(dist, urgency, weight)
+
+        stats["ms"].append(planned.compute_ms)
+        stats["due_km"].append(path_km(dist, by_due))
+        stats["nn_km"].append(path_km(dist, seed_tour))
+        tour = [0] + [k + 1 for k in planned.order]
+        stats["km"].append(path_km(dist, tour))
+        stats["nn_obj"].append(objective(dist, urgency, weight, seed_tour))
+        stats["obj"].append(objective(dist, urgency, weight, tour))
+    return {key: statistics.median(values) for key, values in stats.items()} | {
+        "max_ms": max(stats["ms"]),
+    }
+
+
+def main(stops: list[int], weights: list[float], seeds: int) -> None:
+    print(f"median of {seeds} random instances per row")
+    print("objective = km + weight * sum(position * months overdue); equals km at weight 0")
+    print(
+        f"{'stops':>6}{'weight':>8}{'ms':>8}{'max ms':>8}{'due-date km':>13}"
+        f"{'NN km':>9}{'2-opt km':>10}{'NN obj':>10}{'2-opt obj':>11}"
+    )
+    for n in stops:
+        for weight in weights:
+            r = run(n, weight, seeds)
+            print(
+                f"{n:>6}{weight:>8.1f}{r['ms']:>8.1f}{r['max_ms']:>8.1f}"
+                f"{r['due_km']:>13.1f}{r['nn_km']:>9.1f}{r['km']:>10.1f}"
+                f"{r['nn_obj']:>10.1f}{r['obj']:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stops", type=int, nargs="+", default=[50, 100, 200, 300])
+    parser.add_argument("--weights", type=float, nargs="+", default=[0.0, 1.0])
+    parser.add_argument("--seeds", type=int, default=5)
+    args = parser.parse_args()
+    main(args.stops, args.weights, args.seeds)
@@ -0,0 +1,148 @@
+"""
+Benchmark: /collections/sync deltas vs re-fetching the full lists.
+
+The collector app used to refresh by re-reading /collections/cards (every
+page), /collections/route and /collections/dashboard. This seeds one
+collector's book in SQLite (tests/factories/schema.py), then compares
+response bytes and latency of that refresh against a full /sync snapshot
+and a /sync delta after `--changed` payments were collected.
+
+Requests go through the FastAPI router with httpx's ASGI transport, so
+JSON serialization is included. SQLite is not PgBouncer + Postgres: read
+the latencies as relative, the byte counts as exact.
+
+    python -m tests.perf.bench_sync --cards 400 --changed 10
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.policy import Payment
+from app.modules.collections.router import get_service, router
+from app.modules.collections.service import CollectionService
+from tests.factories.collections import create_card, create_collector
+from tests.factories.schema import create_engine
+
+COLLECTOR = "BENCH"
+
+
+async def seed(factory, cards: int) -> None:
+    rng = random.Random(7)
+    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+    async with factory() as session:
+        await create_collector(session, COLLECTOR)
+        for folio in range(1, cards + 1):
+            await create_card(
+                session, folio=folio, holder=COLLECTOR,
+                paid=rng.randint(0, 5),
+                first_due=date.today() - timedelta(days=rng.randint(0, 120)),
+                location=(20.67 + rng.uniform(-0.1, 0.1), -103.35 + rng.uniform(-0.1, 0.1)),
+                updated_at=yesterday,
+            )
+        await session.commit()
+
+
+async def collect_payments(factory, count: int) -> None:
+    """What a day of collections touches: `count` payments marked paid now."""
+    async with factory() as session:
+        await session.execute(
+            update(Payment)
+            .where(Payment.id.in_(
+                Payment.__table__.select()
+                .with_only_columns(Payment.id)
+                .where(Payment.status == "pending")
+                .limit(count)
+                .scalar_subquery()
+            ))
+            .values(status="paid", actual_date=date.today(), updated_at=datetime.now(timezone.utc))
+        )
+        await session.commit()
+
+
+async def full_refresh(client: httpx.AsyncClient) -> int:
+    """Bytes of dashboard + every card page + route."""
+    size = len((await client.get("/collections/dashboard", params={"collector_code": COLLECTOR})).content)
+    cursor = None
+    while True:
+        params = {"collector_code": COLLECTOR, "limit": 200}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/collections/cards", params=params)
+        size += len(response.content)
+        cursor = response.json()["meta"]["next_cursor"]
+        if cursor is None:
+            break
+    size += len((await client.get("/collections/route", params={"collector_code": COLLECTOR})).content)
+    return size
+
+
+async def sync(client: httpx.AsyncClient, since: str | None) -> tuple[int, dict]:
+    params = {"collector_code": COLLECTOR}
+    if since:
+        params["since"] = since
+    response = await client.get("/collections/sync", params=params)
+    response.raise_for_status()
+    return len(response.content), response.json()["data"]
+
+
+async def timed(repeat: int, call) -> tuple[float, object]:
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+async def main(cards: int, changed: int, repeat: int) -> None:
+    engine = await create_engine()
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await seed(factory, cards)
+
+    async def service():
+        async with factory() as session:
+            yield CollectionService(session)
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_service] = service
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        full_ms, full_bytes = await timed(repeat, lambda: full_refresh(client))
+        snap_ms, (snap_bytes, snapshot) = await timed(repeat, lambda: sync(client, None))
+
+        await collect_payments(factory, changed)
+        delta_ms, (delta_bytes, delta) = await timed(repeat, lambda: sync(client, snapshot["cursor"]))
+
+    await engine.dispose()
+
+    assert len(snapshot["cards"]) == cards
+    assert len(delta["payments"]) == changed, delta["payments"]
+
+    print(f"{cards} cards, {changed} payments changed, median of {repeat} runs")
+    print(f"{'request':<40}{'bytes':>12}{'ms':>10}")
+    for name, size, ms in (
+        ("full lists (dashboard+cards+route)", full_bytes, full_ms),
+        ("/sync snapshot (no since)", snap_bytes, snap_ms),
+        ("/sync delta", delta_bytes, delta_ms),
+    ):
+        print(f"{name:<40}{size:>12,}{ms:>10.1f}")
+    print(f"delta / full lists: {delta_bytes / full_bytes:.2%} of the bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=400)
+    parser.add_argument("--changed", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.cards, args.changed, args.repeat))
@@ -0,0 +1,91 @@
+import fakeredis
+import pytest
+
+from app.core.config import get_settings
+from app.core.exceptions import TooManyRequestsError
+from app.modules.auth.ratelimit import LoginRateLimiter
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_USER", 3)
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_IP", 5)
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_WINDOW", 900)
+    monkeypatch.setattr(settings, "LOGIN_LOCKOUT_ATTEMPTS", 4)
+    monkeypatch.setattr(settings, "LOGIN_LOCKOUT_DURATION", 1800)
+    return LoginRateLimiter(fakeredis.FakeAsyncRedis(decode_responses=True))
+
+
+async def _fail(limiter, username, ip="10.0.0.1"):
+    await limiter.check(username, ip)
+    await limiter.record_failure(username)
+
+
+async def test_username_limit(limiter):
+    for _ in range(3):
+        await _fail(limiter, "ana")
+
+    with pytest.raises(TooManyRequestsError) as exc:
+        await limiter.check("ANA ", "10.0.0.2")
+    assert exc.value.code == "rate_limited"
+    assert 1 <= int(exc.value.headers["Retry-After"]) <= 900
+
+
+async def test_ip_limit_counts_failures_of_any_user(limiter):
+    for name in ("a", "b", "c", "d", "e"):
+        await _fail(limiter, name)
+
+    with pytest.raises(TooManyRequestsError):
+        await limiter.check("f", "10.0.0.1")
+    await limiter.check("f", "10.0.0.2")
+
+
+async def test_successful_logins_do_not_count(limiter):
+    for _ in range(20):
+        attempt = await limiter.check("ana", "10.0.0.1")
+        await limiter.reset("ana", "10.0.0.1", attempt)
+
+    status = await limiter.status("ana")
+    assert status["attempts_in_window"] == 0
+    assert await limiter.redis.zcard("auth:login:ip:10.0.0.1") == 0
+
+
+async def test_released_attempt_does_not_count(limiter):
+    attempt = await limiter.check("ana", "10.0.0.1")
+    await limiter.release("ana", "10.0.0.1", attempt)
+
+    assert (await limiter.status("ana"))["attempts_in_window"] == 0
+
+
+async def test_lockout_after_failures(limiter, monkeypatch):
+    # Raise the window limits so only the lockout applies
+    monkeypatch.setattr(limiter.settings, "LOGIN_RATE_LIMIT_USER", 100)
+    for _ in range(4):
+        await _fail(limiter, "ana")
+
+    with pytest.raises(TooManyRequestsError) as exc:
+        await limiter.check("ana", "10.0.0.9")
+    assert exc.value.code == "account_locked"
+    assert await limiter.locked_usernames() == ["ana"]
+
+    assert await limiter.unlock("ana")
+    await limiter.check("ana", "10.0.0.9")
+
+
+async def test_success_clears_failures(limiter):
+    await _fail(limiter, "ana")
+    attempt = await limiter.check("ana", "10.0.0.1")
+    await limiter.reset("ana", "10.0.0.1", attempt)
+
+    assert (await limiter.status("ana"))["failed_attempts"] == 0
+
+
+async def test_redis_down_lets_login_through():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    limiter = LoginRateLimiter(fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+
+    assert await limiter.check("ana", "10.0.0.1") is None
+    await limiter.record_failure("ana")
+    await limiter.reset("ana", "10.0.0.1", None)
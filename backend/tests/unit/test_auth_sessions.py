@@ -0,0 +1,82 @@
+import fakeredis
+import pytest
+
+from app.core.exceptions import AppException
+from app.modules.auth.sessions import KEY_PREFIX, RefreshTokenStore
+
+CLAIMS = {"sub": "7", "username": "ana", "employee_id": None, "sid": "12"}
+TTL = 3600
+
+
+@pytest.fixture
+def store():
+    return RefreshTokenStore(fakeredis.FakeAsyncRedis(decode_responses=True))
+
+
+async def test_rotate_returns_new_token_and_claims(store):
+    token = await store.issue("dev1", CLAIMS, TTL)
+
+    new_token, claims, ttl = await store.rotate(token)
+
+    assert new_token.startswith("dev1.") and new_token != token
+    assert claims == CLAIMS
+    assert ttl == TTL
+    assert await store.owns(new_token) == "dev1"
+    assert await store.owns(token) is None
+
+
+async def test_rotate_restarts_the_ttl(store):
+    token = await store.issue("dev1", CLAIMS, TTL)
+    await store.redis.expire(KEY_PREFIX + "dev1", 10)
+
+    await store.rotate(token)
+
+    assert await store.redis.ttl(KEY_PREFIX + "dev1") > 10
+
+
+async def test_reusing_a_rotated_token_revokes_the_session(store):
+    token = await store.issue("dev1", CLAIMS, TTL)
+    new_token, _, _ = await store.rotate(token)
+
+    with pytest.raises(AppException) as exc:
+        await store.rotate(token)
+    assert exc.value.code == "token_reused"
+
+    # The legitimate holder is logged out too
+    assert (await store.alive(["dev1"])) == {"dev1": False}
+    with pytest.raises(AppException) as exc:
+        await store.rotate(new_token)
+    assert exc.value.code == "invalid_token"
+
+
+async def test_unknown_secret_does_not_revoke(store):
+    token = await store.issue("dev1", CLAIMS, TTL)
+
+    with pytest.raises(AppException) as exc:
+        await store.rotate("dev1.not-the-secret")
+    assert exc.value.code == "invalid_token"
+
+    await store.rotate(token)
+
+
+@pytest.mark.parametrize("token", ["", "dev1", "dev1.", ".secret"])
+async def test_malformed_token(store, token):
+    with pytest.raises(AppException) as exc:
+        await store.rotate(token)
+    assert exc.value.status_code == 401
+
+
+async def test_reissue_replaces_the_previous_secret(store):
+    first = await store.issue("dev1", CLAIMS, TTL)
+    second = await store.issue("dev1", CLAIMS, TTL)
+
+    assert await store.owns(first) is None
+    assert await store.owns(second) == "dev1"
+
+
+async def test_revoke(store):
+    await store.issue("dev1", CLAIMS, TTL)
+    await store.issue("dev2", CLAIMS, TTL)
+
+    assert await store.revoke(["dev1", "dev1", ""]) == 1
+    assert await store.alive(["dev1", "dev2"]) == {"dev1": False, "dev2": True}
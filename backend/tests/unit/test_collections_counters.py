@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+import pytest
+
+from app.modules.collections import counters
+from app.modules.settlements.rates import DEFAULT_RATES, SettlementRates
+from app.tasks import celery_app
+
+RATES = SettlementRates(**DEFAULT_RATES)
+
+
+@pytest.mark.parametrize("plan, commission", [
+    ("cash", Decimal("22.53")),
+    ("cash_2_installments", Decimal("22.53")),
+    ("monthly_7", Decimal("45.05")),
+    (None, Decimal("45.05")),
+])
+def test_registered_uses_cash_rate_for_contado_plans(plan, commission):
+    delta = counters.registered("450.50", "transfer", plan, RATES)
+    assert delta.collections_count == 1
+    assert delta.collected_amount == Decimal("450.50")
+    assert delta.cash_amount == 0
+    assert delta.commission_amount == commission
+
+
+def test_total_adds_every_field():
+    result = counters.total([
+        counters.registered(100, "cash", "cash", RATES),
+        counters.registered(200, "deposit", "monthly_7", RATES),
+    ])
+    assert result == counters.CounterDelta(
+        collections_count=2,
+        collected_amount=Decimal("300.00"),
+        cash_amount=Decimal("100.00"),
+        commission_amount=Decimal("25.00"),
+    )
+
+
+def test_beat_schedule_points_at_registered_tasks():
+    celery_app.loader.import_default_modules()
+    for entry in celery_app.conf.beat_schedule.values():
+        assert entry["task"] in celery_app.tasks
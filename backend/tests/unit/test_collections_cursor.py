@@ -0,0 +1,47 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.modules.collections.repository import NO_DUE_DATE, card_sort_key
+from app.modules.collections.service import _decode_cursor, _encode_cursor
+from app.models.policy import Payment
+
+
+def test_due_date_cursor_round_trip():
+    cursor = _encode_cursor(date(2026, 3, 15), 42)
+    assert _decode_cursor(cursor, "due_date") == (date(2026, 3, 15), 42)
+    assert _decode_cursor(cursor, None) == (date(2026, 3, 15), 42)
+
+
+def test_amount_cursor_round_trip_keeps_decimal_precision():
+    cursor = _encode_cursor(Decimal("1234.50"), 7)
+    key, policy_id = _decode_cursor(cursor, "amount")
+    assert key == Decimal("1234.50") and isinstance(key, Decimal)
+    assert policy_id == 7
+
+
+def test_cursor_is_url_safe():
+    cursor = _encode_cursor(Decimal("99999.99"), 123456789)
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor, sort", [
+    ("not-base64!!", None),
+    (_encode_cursor("abc", 1), "amount"),
+    (_encode_cursor("abc", 1), "due_date"),
+    (_encode_cursor(date(2026, 1, 1), "x"), None),
+])
+def test_malformed_cursor_raises_value_error(cursor, sort):
+    with pytest.raises(ValueError, match="Cursor inválido"):
+        _decode_cursor(cursor, sort)
+
+
+def test_sort_key_matches_sql_sentinels():
+    undated = Payment(due_date=None, amount=None)
+    assert card_sort_key("due_date", undated) == NO_DUE_DATE
+    assert card_sort_key("amount", undated) == 0
+
+    dated = Payment(due_date=date(2026, 2, 1), amount=Decimal("500.00"))
+    assert _decode_cursor(_encode_cursor(card_sort_key(None, dated), 1), None)[0] == date(2026, 2, 1)
+    assert _decode_cursor(_encode_cursor(card_sort_key("amount", dated), 1), "amount")[0] == Decimal("500.00")
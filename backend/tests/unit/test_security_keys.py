@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import JWTError, jwt
+
+from app.core import security
+from app.core.security import JWTKeyStore
+
+
+def _write_key(directory, name):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private = directory / f"{name}.key"
+    public = directory / f"{name}.pem"
+    private.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    ))
+    public.write_bytes(key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+    ))
+    return private, public
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    private, public = _write_key(tmp_path, "current")
+    rotated = tmp_path / "rotated"
+    rotated.mkdir()
+    monkeypatch.setattr(security.settings, "JWT_PRIVATE_KEY_PATH", str(private))
+    monkeypatch.setattr(security.settings, "JWT_PUBLIC_KEY_PATH", str(public))
+    monkeypatch.setattr(security.settings, "JWT_PUBLIC_KEYS_DIR", str(rotated))
+    monkeypatch.setattr(security.settings, "JWT_KEYS_RELOAD_SECONDS", 3600)
+    monkeypatch.setattr(security.settings, "JWT_KEYS_FORCE_RELOAD_SECONDS", 3600)
+
+    store = JWTKeyStore()
+    store.calls = {"scans": 0}
+    mtimes = store._mtimes
+
+    def counted():
+        store.calls["scans"] += 1
+        return mtimes()
+
+    monkeypatch.setattr(store, "_mtimes", counted)
+    store.rotated_dir = rotated
+    return store
+
+
+def test_known_kid_does_not_rescan(store):
+    kid = store.get().signing_kid
+
+    assert len(store.verification_keys(kid)) == 1
+    assert store.calls["scans"] == 1
+
+
+def test_unknown_kid_is_rejected_and_reload_throttled(store):
+    store.get()
+
+    for _ in range(50):
+        with pytest.raises(JWTError):
+            store.verification_keys("forged")
+
+    assert store.forced_reloads == 1
+    assert store.calls["scans"] == 2
+
+
+def test_unknown_kid_picks_up_a_rotated_key(store, tmp_path):
+    store.get()
+    old_private, old_public = _write_key(tmp_path, "old")
+    (store.rotated_dir / "old.pem").write_bytes(old_public.read_bytes())
+    token = jwt.encode(
+        {"sub": "1", "exp": datetime.now(timezone.utc) + timedelta(minutes=5)},
+        old_private.read_text(), algorithm="RS256",
+        headers={"kid": security._kid(serialization.load_pem_public_key(old_public.read_bytes()))},
+    )
+
+    kid = jwt.get_unverified_header(token)["kid"]
+    claims = jwt.decode(token, store.verification_keys(kid), algorithms=["RS256"])
+
+    assert claims["sub"] == "1"
+    assert store.forced_reloads == 1
@@ -0,0 +1,84 @@
+import io
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.modules.settlements import export
+from app.modules.settlements.pdf import LINE_HEIGHT, MARGIN, PAGE_HEIGHT, PdfWriter
+
+
+def _header(**overrides):
+    fields = dict(
+        id=42, code="C001", full_name="Ana López", period_start=None, period_end=None,
+        commission_regular=100, commission_cash=0, commission_delivery=0,
+        total_commissions=100, total_deductions=0, net_amount=100, amount_paid=0,
+        status="pending", payment_method=None, paid_at=None,
+    )
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def _height(page):
+    return sum(LINE_HEIGHT + line.gap for line in page)
+
+
+def test_short_receipt_fits_one_page():
+    pages = export._receipt_pages(_header(), [("Gasolina", 50)])
+
+    assert len(pages) == 1
+
+
+def test_many_deductions_continue_on_next_pages():
+    deductions = [(f"Deducción {i}", i) for i in range(120)]
+
+    pages = export._receipt_pages(_header(), deductions)
+
+    assert len(pages) > 2
+    assert all(_height(page) <= PAGE_HEIGHT - 2 * MARGIN for page in pages)
+    assert all(page[0].text == "Recibo de liquidación 42 (continuación)" for page in pages[1:])
+    concepts = [line.text for page in pages for line in page if line.text.startswith("Deducción ")]
+    assert concepts == [concept for concept, _ in deductions]
+    assert pages[-1][-1].text == "Firma de recibido"
+
+
+def test_writer_counts_every_page():
+    buffer = io.BytesIO()
+    writer = PdfWriter(buffer)
+    for page in export._receipt_pages(_header(), [(f"D{i}", i) for i in range(120)]):
+        writer.add_page(page)
+    writer.close()
+
+    assert b"/Count %d" % len(writer.pages) in buffer.getvalue()
+    assert len(writer.pages) > 2
+
+
+def test_remove_expired_files_keeps_recent(tmp_path):
+    old, recent = tmp_path / "old.pdf", tmp_path / "recent.xlsx"
+    old.write_bytes(b"x")
+    recent.write_bytes(b"x")
+    stale = time.time() - 7200
+    os.utime(old, (stale, stale))
+
+    assert export.remove_expired_files(str(tmp_path), max_age=3600) == 1
+    assert not old.exists()
+    assert recent.exists()
+
+
+def test_remove_expired_files_missing_dir(tmp_path):
+    assert export.remove_expired_files(str(tmp_path / "missing"), max_age=0) == 0
+
+
+async def test_write_xlsx_removes_the_file_when_save_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(export.get_settings(), "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(export, "SECTIONS", {})
+
+    def broken_save(self, path):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(export.Workbook, "save", broken_save)
+
+    with pytest.raises(OSError):
+        await export.write_xlsx(None, None, None)
+    assert list(tmp_path.iterdir()) == []
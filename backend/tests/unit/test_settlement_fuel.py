@@ -0,0 +1,24 @@
+import pytest
+from pydantic import ValidationError
+
+from app.modules.settlements.schemas import FuelLoadBatch, FuelLoadItem
+
+LOAD = {"code": "C1", "load_date": "2026-10-01", "amount": "350.00"}
+
+
+@pytest.mark.parametrize("ticket", [None, "", "   "])
+def test_mobile_batch_requires_ticket(ticket):
+    item = dict(LOAD) if ticket is None else {**LOAD, "ticket": ticket}
+
+    with pytest.raises(ValidationError):
+        FuelLoadBatch(items=[item])
+
+
+def test_mobile_batch_accepts_ticket():
+    batch = FuelLoadBatch(items=[{**LOAD, "ticket": "GAS-0001"}])
+
+    assert batch.items[0].ticket == "GAS-0001"
+
+
+def test_csv_row_ticket_stays_optional():
+    assert FuelLoadItem.model_validate(LOAD).ticket is None
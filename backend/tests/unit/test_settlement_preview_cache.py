@@ -0,0 +1,86 @@
+from datetime import date
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+import fakeredis
+import pytest
+
+from app.models.settlement import Settlement, SettlementMethod
+from app.modules.settlements.cache import KEY_PREFIX, PreviewCache
+from app.modules.settlements.schemas import (
+    CommissionBreakdown, CommissionDetail, DeductionBreakdown, SettlementCreate,
+)
+from app.modules.settlements.service import SettlementService
+
+PERIOD = (date(2026, 10, 1), date(2026, 10, 15))
+COLLECTOR = {"employee_id": 10, "employee_role_id": 20, "code": "C1", "full_name": "Cobrador Uno"}
+
+
+def _commissions(regular: str) -> CommissionBreakdown:
+    none = CommissionDetail(count=0, amount_collected=Decimal("0"), commission=Decimal("0"))
+    detail = CommissionDetail(count=3, amount_collected=Decimal(regular) * 10, commission=Decimal(regular))
+    return CommissionBreakdown(regular=detail, cash=none, delivery=none, total=Decimal(regular))
+
+
+@pytest.fixture
+def service():
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(scalar_one_or_none=MagicMock(return_value=None)))
+    db.flush = db.commit = db.refresh = AsyncMock()
+
+    snapshot = MagicMock(version=1)
+    snapshot.goal_for.return_value = Decimal("15000")
+
+    svc = SettlementService(db, cache=PreviewCache(fakeredis.FakeAsyncRedis(decode_responses=True)))
+    svc._get_collector_by_role = AsyncMock(return_value=COLLECTOR)
+    svc._calculate_commissions = AsyncMock(return_value=_commissions("100.00"))
+    svc._calculate_deductions = AsyncMock(return_value=DeductionBreakdown(items=[], total=Decimal("0")))
+    svc._rate_snapshot = AsyncMock(return_value=snapshot)
+    svc._record_commission_payments = AsyncMock()
+    svc._post_loan_installments = AsyncMock()
+    svc._to_response = AsyncMock()
+    return svc
+
+
+async def _cache_stale_preview(service):
+    """A preview cached before a payment whose invalidation was missed."""
+    service._calculate_commissions.return_value = _commissions("10.00")
+    stale = await service.get_preview(COLLECTOR["employee_role_id"], *PERIOD)
+    service._calculate_commissions.return_value = _commissions("100.00")
+    return stale
+
+
+async def test_get_preview_serves_the_cache(service):
+    stale = await _cache_stale_preview(service)
+    assert (await service.get_preview(COLLECTOR["employee_role_id"], *PERIOD)) == stale
+    assert stale.net_amount == Decimal("10.00")
+
+
+async def test_rate_change_skips_cached_previews(service):
+    await _cache_stale_preview(service)
+    (await service._rate_snapshot()).version = 2
+
+    fresh = await service.get_preview(COLLECTOR["employee_role_id"], *PERIOD)
+
+    assert fresh.net_amount == Decimal("100.00")
+
+
+async def test_create_settlement_recomputes_instead_of_using_the_cache(service):
+    await _cache_stale_preview(service)
+
+    await service.create_settlement(
+        SettlementCreate(
+            employee_role_id=COLLECTOR["employee_role_id"],
+            period_start=PERIOD[0], period_end=PERIOD[1],
+            payment_method=SettlementMethod.CASH,
+        ),
+        paid_by_user_id=1,
+    )
+
+    settlement = next(
+        call.args[0] for call in service.db.add.call_args_list if isinstance(call.args[0], Settlement)
+    )
+    assert settlement.commission_regular == Decimal("100.00")
+    assert settlement.amount_paid == Decimal("100.00")
+    # Written previews are dropped after commit
+    assert not await service.cache.redis.exists(KEY_PREFIX + "C1")
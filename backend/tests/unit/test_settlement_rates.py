@@ -0,0 +1,38 @@
+from datetime import date
+from decimal import Decimal
+from unittest.mock import AsyncMock
+
+from app.modules.settlements import rates
+from app.modules.settlements.rates import RateProvider, RateSnapshot
+
+
+def _snapshot(version):
+    return RateSnapshot(
+        version=version, loaded_at=None,
+        settlement_rates={"commission_regular": ((date(2026, 1, 1), Decimal("0.12")),)},
+        collector_goals={20: ((date(2026, 10, 1), Decimal("18000")),)},
+    )
+
+
+def test_rates_fall_back_to_defaults():
+    snapshot = _snapshot(1)
+
+    assert snapshot.rates_on(date(2025, 12, 31)).commission_regular == Decimal("0.10")
+    assert snapshot.rates_on(date(2026, 1, 1)).commission_regular == Decimal("0.12")
+    assert snapshot.goal_for(20, date(2026, 10, 15)) == Decimal("18000")
+    assert snapshot.goal_for(21, date(2026, 10, 15)) == Decimal("15000.00")
+
+
+async def test_reloads_when_the_version_changes(monkeypatch):
+    session = AsyncMock()
+    session.scalar.side_effect = [1, 2]
+    monkeypatch.setattr(rates, "load_snapshot", AsyncMock(side_effect=lambda _, v: _snapshot(v)))
+    provider = RateProvider(refresh_seconds=10 ** 9)
+
+    assert (await provider.get(session)).version == 1
+    assert (await provider.get(session)).version == 1
+    # Refresh interval over: the next lookup checks rate_version
+    provider.refresh_seconds = 0
+
+    assert (await provider.get(session)).version == 2
+    assert provider.reloads == 2
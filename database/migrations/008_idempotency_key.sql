@@ -0,0 +1,29 @@
+-- ============================================================================
+-- Migration 008: Idempotency keys
+-- Fecha: 2026-10-17
+--
+-- Respuestas guardadas por Idempotency-Key (POST /collections/proposals).
+-- Redis es la copia rápida; esta tabla es la copia durable, escrita en la
+-- misma transacción que el pago, y se consulta si Redis no la tiene.
+-- Rollback: instrucciones al final del archivo.
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS idempotency_key (
+    scope           VARCHAR(100) NOT NULL,
+    key             VARCHAR(255) NOT NULL,
+    request_hash    CHAR(64) NOT NULL,
+    response        JSONB NOT NULL,
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (scope, key)
+);
+
+-- Purga nocturna de llaves vencidas (IDEMPOTENCY_TTL): app.tasks.idempotency.
+-- Una llave vencida reutilizada reemplaza su fila (INSERT ... ON CONFLICT).
+CREATE INDEX IF NOT EXISTS idx_idempotency_key_created ON idempotency_key(created_at);
+
+COMMIT;
+
+-- ROLLBACK (emergencia):
+-- DROP TABLE IF EXISTS idempotency_key;
@@ -0,0 +1,48 @@
+-- ============================================================================
+-- Migration 009: Contadores diarios por cobrador
+-- Fecha: 2026-10-17
+--
+-- Contadores del dashboard de cobranza (cobros, monto, efectivo, comisión,
+-- pendientes de aprobación) por cobrador y día. La app los actualiza en la
+-- misma transacción que cada pago; el job nocturno los reconcilia contra
+-- la tabla payment.
+-- Rollback: instrucciones al final del archivo.
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS collector_daily_counter (
+    collector_id        INT NOT NULL REFERENCES collector(id) ON DELETE CASCADE,
+    day                 DATE NOT NULL,
+    collections_count   INT NOT NULL DEFAULT 0,
+    collected_amount    NUMERIC(12,2) NOT NULL DEFAULT 0,
+    cash_amount         NUMERIC(12,2) NOT NULL DEFAULT 0,
+    commission_amount   NUMERIC(12,2) NOT NULL DEFAULT 0,
+    pending_approval    INT NOT NULL DEFAULT 0,
+    updated_at          TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (collector_id, day)
+);
+
+-- Reconciliación: cobros de un día agrupados por cobrador
+CREATE INDEX IF NOT EXISTS idx_payment_collected_day
+    ON payment(actual_date, collector_id)
+    WHERE status = 'paid' AND collector_id IS NOT NULL;
+
+-- Backfill del día en curso. Contado = CASH_PAYMENT_PLANS del backend
+-- ('cash', 'cash_2_installments'); 5% / 10% son las tasas por defecto, y la
+-- reconciliación nocturna recalcula con las tasas vigentes (migración 014).
+INSERT INTO collector_daily_counter (collector_id, day, collections_count, collected_amount, cash_amount, commission_amount)
+SELECT p.collector_id, p.actual_date, COUNT(*), SUM(p.amount),
+       COALESCE(SUM(p.amount) FILTER (WHERE p.payment_method = 'cash'), 0),
+       SUM(ROUND(p.amount * CASE WHEN pol.payment_plan IN ('cash', 'cash_2_installments') THEN 0.05 ELSE 0.10 END, 2))
+FROM payment p
+JOIN policy pol ON pol.id = p.policy_id
+WHERE p.status = 'paid' AND p.collector_id IS NOT NULL AND p.actual_date = CURRENT_DATE
+GROUP BY p.collector_id, p.actual_date
+ON CONFLICT (collector_id, day) DO NOTHING;
+
+COMMIT;
+
+-- ROLLBACK (emergencia):
+-- DROP INDEX IF EXISTS idx_payment_collected_day;
+-- DROP TABLE IF EXISTS collector_daily_counter;
@@ -0,0 +1,34 @@
+-- ============================================================================
+-- Migration 010: Comisiones de liquidación desde payment
+-- Fecha: 2026-10-17
+--
+-- 1. Índice para el agregado de comisiones por cobrador y período
+--    (cobros pagados de un cobrador entre dos fechas, sin tocar el heap).
+-- 2. settlement_payment guarda una fila por pago y tipo de comisión: un
+--    pago con póliza entregada aporta su comisión de cobro ('regular' o
+--    'cash') y además la de entrega ('delivery').
+-- Rollback: instrucciones al final del archivo.
+-- ============================================================================
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_payment_collector_paid
+    ON payment(collector_id, actual_date)
+    INCLUDE (amount, policy_id, policy_delivered)
+    WHERE status = 'paid';
+
+ALTER TABLE settlement_payment DROP CONSTRAINT IF EXISTS uq_settlement_payment;
+DO $$ BEGIN
+    ALTER TABLE settlement_payment
+        ADD CONSTRAINT uq_settlement_payment_type UNIQUE (payment_id, commission_type);
+EXCEPTION
+    WHEN duplicate_object THEN null;
+END $$;
+
+COMMIT;
+
+-- ROLLBACK (emergencia):
+-- DROP INDEX IF EXISTS idx_payment_collector_paid;
+-- ALTER TABLE settlement_payment DROP CONSTRAINT IF EXISTS uq_settlement_payment_type;
+-- DELETE FROM settlement_payment WHERE commission_type = 'delivery';
+-- ALTER TABLE settlement_payment ADD CONSTRAINT uq_settlement_payment UNIQUE (payment_id);
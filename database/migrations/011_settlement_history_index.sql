@@ -0,0 +1,22 @@
+-- ============================================================================
+-- Migration 011: Índice para el historial de liquidaciones
+-- Fecha: 2026-10-17
+--
+-- El historial de un cobrador se pagina por (period_end, id) descendente y
+-- su total_paid es SUM(amount_paid) de todas sus liquidaciones. Con este
+-- índice cada página es un rango del índice y el total un index-only scan,
+-- sin importar cuántos años de quincenas tenga el cobrador.
+-- El filtro por año sigue usando idx_settlement_period.
+-- Rollback: instrucciones al final del archivo.
+-- ============================================================================
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_settlement_role_history
+    ON settlement(employee_role_id, period_end, id)
+    INCLUDE (amount_paid);
+
+COMMIT;
+
+-- ROLLBACK (emergencia):
+-- DROP INDEX IF EXISTS idx_settlement_role_history;
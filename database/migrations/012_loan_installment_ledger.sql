@@ -0,0 +1,44 @@
+-- ============================================================================
+-- Migration 012: Ledger de cuotas de préstamos (loan_installment)
+-- Fecha: 2026-10-17
+--
+-- Una fila por cuota cobrada en una liquidación. UNIQUE (loan_id,
+-- settlement_id) hace idempotente el cierre de quincena: aplicar de nuevo
+-- una liquidación no vuelve a cobrar la cuota. El saldo de un préstamo es
+-- total_amount - SUM(amount), leído con idx_loan_installment_loan.
+--
+-- Backfill: los préstamos con cuotas pagadas antes del ledger reciben una
+-- fila de apertura (settlement_id NULL) con lo ya pagado; installment_number
+-- es acumulado, así que la siguiente cuota sigue la numeración.
+-- Rollback: instrucciones al final del archivo.
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS loan_installment (
+    id                  SERIAL PRIMARY KEY,
+    loan_id             INTEGER NOT NULL REFERENCES employee_loan(id),
+    settlement_id       INTEGER REFERENCES settlement(id),
+    installment_number  INTEGER NOT NULL,
+    amount              NUMERIC(12, 2) NOT NULL,
+    created_at          TIMESTAMP NOT NULL DEFAULT NOW(),
+    CONSTRAINT uq_loan_installment_settlement UNIQUE (loan_id, settlement_id),
+    CONSTRAINT uq_loan_installment_number UNIQUE (loan_id, installment_number)
+);
+
+CREATE INDEX IF NOT EXISTS idx_loan_installment_loan
+    ON loan_installment(loan_id) INCLUDE (installment_number, amount);
+CREATE INDEX IF NOT EXISTS idx_loan_installment_settlement
+    ON loan_installment(settlement_id);
+
+-- Apertura: lo pagado antes del ledger
+INSERT INTO loan_installment (loan_id, settlement_id, installment_number, amount)
+SELECT id, NULL, paid_installments, total_amount - remaining_balance
+FROM employee_loan
+WHERE paid_installments > 0
+ON CONFLICT DO NOTHING;
+
+COMMIT;
+
+-- ROLLBACK (emergencia):
+-- DROP TABLE IF EXISTS loan_installment;
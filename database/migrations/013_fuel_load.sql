@@ -0,0 +1,35 @@
+-- ============================================================================
+-- Migration 013: Cargas de combustible (fuel_load)
+-- Fecha: 2026-10-17
+--
+-- Tickets de gasolina por empleado, capturados desde la app móvil o por
+-- CSV. La deducción de gasolina de la liquidación es el 50% de la suma del
+-- período; idx_fuel_load_employee_date resuelve ese agregado para todos los
+-- cobradores con un index-only scan.
+-- UNIQUE (employee_id, ticket): un reintento con el mismo ticket se omite.
+-- Rollback: instrucciones al final del archivo.
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS fuel_load (
+    id              SERIAL PRIMARY KEY,
+    employee_id     INTEGER NOT NULL REFERENCES employee(id),
+    load_date       DATE NOT NULL,
+    amount          NUMERIC(12, 2) NOT NULL,
+    liters          NUMERIC(8, 2),
+    odometer        INTEGER,
+    ticket          VARCHAR(50),
+    source          VARCHAR(10) NOT NULL,
+    created_at      TIMESTAMP NOT NULL DEFAULT NOW(),
+    CONSTRAINT uq_fuel_load_ticket UNIQUE (employee_id, ticket),
+    CONSTRAINT ck_fuel_load_amount CHECK (amount > 0)
+);
+
+CREATE INDEX IF NOT EXISTS idx_fuel_load_employee_date
+    ON fuel_load(employee_id, load_date) INCLUDE (amount);
+
+COMMIT;
+
+-- ROLLBACK (emergencia):
+-- DROP TABLE IF EXISTS fuel_load;
@@ -0,0 +1,93 @@
+-- ============================================================================
+-- Migration 014: Tasas de liquidación y metas con vigencia (settlement_rate)
+-- Fecha: 2026-10-17
+--
+-- Las tasas del cobrador (10% normal, 5% contado, $50 por entrega, 50% de
+-- gasolina) y la meta de $15,000 estaban fijas en el código. Pasan a
+-- settlement_rate / collector_goal con effective_from, así un cambio de
+-- tasa rige desde una fecha sin tocar liquidaciones anteriores.
+--
+-- rate_version: una fila que los triggers suben en cada cambio de
+-- settlement_rate o collector_goal. El backend tiene un snapshot en memoria
+-- y solo lo recarga cuando ve otra versión (RATES_REFRESH_SECONDS); la
+-- versión también es parte de la llave del cache de previews. Las tablas de
+-- vendedor no entran: ni el snapshot ni los previews las leen.
+-- Rollback: instrucciones al final del archivo.
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS settlement_rate (
+    id              SERIAL PRIMARY KEY,
+    name            VARCHAR(30) NOT NULL,
+    effective_from  DATE NOT NULL,
+    value           NUMERIC(12, 4) NOT NULL,
+    created_at      TIMESTAMP NOT NULL DEFAULT NOW(),
+    CONSTRAINT uq_settlement_rate UNIQUE (name, effective_from),
+    CONSTRAINT ck_settlement_rate_name CHECK (name IN (
+        'commission_regular', 'commission_cash', 'commission_delivery',
+        'fuel_deduction', 'goal_amount'
+    ))
+);
+
+CREATE TABLE IF NOT EXISTS collector_goal (
+    id                SERIAL PRIMARY KEY,
+    employee_role_id  INTEGER NOT NULL REFERENCES employee_role(id),
+    effective_from    DATE NOT NULL,
+    amount            NUMERIC(12, 2) NOT NULL,
+    created_at        TIMESTAMP NOT NULL DEFAULT NOW(),
+    CONSTRAINT uq_collector_goal UNIQUE (employee_role_id, effective_from)
+);
+
+CREATE TABLE IF NOT EXISTS rate_version (
+    id          INTEGER PRIMARY KEY,
+    version     BIGINT NOT NULL DEFAULT 0,
+    updated_at  TIMESTAMP NOT NULL DEFAULT NOW(),
+    CONSTRAINT ck_rate_version_single CHECK (id = 1)
+);
+
+INSERT INTO rate_version (id, version) VALUES (1, 0)
+ON CONFLICT (id) DO NOTHING;
+
+-- Valores vigentes hasta hoy
+INSERT INTO settlement_rate (name, effective_from, value) VALUES
+    ('commission_regular',  '2000-01-01', 0.10),
+    ('commission_cash',     '2000-01-01', 0.05),
+    ('commission_delivery', '2000-01-01', 50.00),
+    ('fuel_deduction',      '2000-01-01', 0.50),
+    ('goal_amount',         '2000-01-01', 15000.00)
+ON CONFLICT (name, effective_from) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION fn_bump_rate_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE rate_version SET version = version + 1, updated_at = NOW() WHERE id = 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Un trigger por sentencia (no por fila): una carga masiva sube la versión una vez
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['settlement_rate', 'collector_goal'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_rate_version ON %I', t, t);
+        EXECUTE format(
+            'CREATE TRIGGER trg_%s_rate_version '
+            'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION fn_bump_rate_version()',
+            t, t
+        );
+    END LOOP;
+END;
+$$;
+
+COMMIT;
+
+-- ROLLBACK (emergencia):
+-- DROP TRIGGER IF EXISTS trg_settlement_rate_rate_version ON settlement_rate;
+-- DROP TRIGGER IF EXISTS trg_collector_goal_rate_version ON collector_goal;
+-- DROP FUNCTION IF EXISTS fn_bump_rate_version();
+-- DROP TABLE IF EXISTS rate_version;
+-- DROP TABLE IF EXISTS collector_goal;
+-- DROP TABLE IF EXISTS settlement_rate;
@@ -0,0 +1,20 @@
+-- ============================================================================
+-- Migration 015: Índice de sesiones activas por dispositivo
+-- Fecha: 2026-10-17
+--
+-- Los refresh tokens viven en Redis (auth:session:{token}); device_session
+-- registra qué dispositivo tiene sesión abierta. Un nuevo login en el mismo
+-- dispositivo y el cierre de sesiones de un usuario buscan las sesiones
+-- activas por (user_id, device_id).
+-- Rollback: instrucciones al final del archivo.
+-- ============================================================================
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_device_session_user_active
+    ON device_session(user_id, device_id) WHERE is_active;
+
+COMMIT;
+
+-- ROLLBACK (emergencia):
+-- DROP INDEX IF EXISTS idx_device_session_user_active;
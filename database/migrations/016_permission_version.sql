@@ -0,0 +1,95 @@
+-- ============================================================================
+-- Migration 016: Roles y permisos versionados (permission_version)
+-- Fecha: 2026-10-17
+--
+-- require_permission resuelve los permisos con un índice en memoria
+-- (rol -> permisos) en lugar de la lista congelada en el JWT. El índice se
+-- recarga cuando cambia permission_version, que suben estos triggers en
+-- cualquier cambio de role, permission, role_permission o del rol de un
+-- usuario (app_user.role_id).
+-- Rollback: instrucciones al final del archivo.
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS role (
+    id          SERIAL PRIMARY KEY,
+    name        VARCHAR(50) NOT NULL,
+    description TEXT,
+    created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    CONSTRAINT uq_role_name UNIQUE (name)
+);
+
+CREATE TABLE IF NOT EXISTS permission (
+    id          SERIAL PRIMARY KEY,
+    name        VARCHAR(100) NOT NULL,
+    description TEXT,
+    created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    CONSTRAINT uq_permission_name UNIQUE (name)
+);
+
+CREATE TABLE IF NOT EXISTS role_permission (
+    role_id       INT NOT NULL REFERENCES role(id) ON DELETE CASCADE,
+    permission_id INT NOT NULL REFERENCES permission(id) ON DELETE CASCADE,
+    PRIMARY KEY (role_id, permission_id)
+);
+
+ALTER TABLE app_user
+    ADD COLUMN IF NOT EXISTS role_id INT REFERENCES role(id) ON DELETE SET NULL;
+
+-- Permisos que ya revisa el backend
+INSERT INTO permission (name, description) VALUES
+    ('*',                  'Todos los permisos'),
+    ('collections.assign', 'Reasignar tarjetas entre cobradores'),
+    ('users.lockouts',     'Consultar y levantar bloqueos de login'),
+    ('users.sessions',     'Cerrar las sesiones de otros usuarios')
+ON CONFLICT (name) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS permission_version (
+    id          INTEGER PRIMARY KEY,
+    version     BIGINT NOT NULL DEFAULT 0,
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    CONSTRAINT ck_permission_version_single CHECK (id = 1)
+);
+
+INSERT INTO permission_version (id, version) VALUES (1, 0)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION fn_bump_permission_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE permission_version SET version = version + 1, updated_at = NOW() WHERE id = 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_role_permission_version ON role;
+CREATE TRIGGER trg_role_permission_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON role
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_bump_permission_version();
+
+DROP TRIGGER IF EXISTS trg_permission_permission_version ON permission;
+CREATE TRIGGER trg_permission_permission_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON permission
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_bump_permission_version();
+
+DROP TRIGGER IF EXISTS trg_role_permission_permission_version ON role_permission;
+CREATE TRIGGER trg_role_permission_permission_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON role_permission
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_bump_permission_version();
+
+-- Solo cambios de rol: el UPDATE de last_login en cada login no sube la versión
+DROP TRIGGER IF EXISTS trg_app_user_permission_version ON app_user;
+CREATE TRIGGER trg_app_user_permission_version
+    AFTER INSERT OR DELETE OR UPDATE OF role_id ON app_user
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_bump_permission_version();
+
+COMMIT;
+
+-- ROLLBACK (emergencia):
+-- DROP TRIGGER IF EXISTS trg_app_user_permission_version ON app_user;
+-- DROP TRIGGER IF EXISTS trg_role_permission_permission_version ON role_permission;
+-- DROP TRIGGER IF EXISTS trg_permission_permission_version ON permission;
+-- DROP TRIGGER IF EXISTS trg_role_permission_version ON role;
+-- DROP FUNCTION IF EXISTS fn_bump_permission_version();
+-- DROP TABLE IF EXISTS permission_version;
+-- (role, permission, role_permission y app_user.role_id pueden venir de schema.sql; no se borran)
@@ -0,0 +1,25 @@
+-- ============================================================================
+-- Migration 017: Ticket obligatorio en cargas de combustible del móvil
+-- Fecha: 2026-10-17
+--
+-- La deduplicación de fuel_load es UNIQUE (employee_id, ticket) y NULL no
+-- choca, así que una carga móvil sin ticket se duplicaba en cada reintento.
+-- La API ya exige ticket en los lotes móviles; este CHECK lo garantiza en BD.
+-- Las cargas por CSV pueden seguir sin ticket.
+-- Rollback: instrucciones al final del archivo.
+-- ============================================================================
+
+BEGIN;
+
+-- Cargas móviles previas sin ticket: id propio para que pasen el CHECK
+UPDATE fuel_load SET ticket = 'legacy-' || id
+WHERE source = 'mobile' AND ticket IS NULL;
+
+ALTER TABLE fuel_load DROP CONSTRAINT IF EXISTS ck_fuel_load_mobile_ticket;
+ALTER TABLE fuel_load
+    ADD CONSTRAINT ck_fuel_load_mobile_ticket CHECK (source <> 'mobile' OR ticket IS NOT NULL);
+
+COMMIT;
+
+-- ROLLBACK (emergencia):
+-- ALTER TABLE fuel_load DROP CONSTRAINT IF EXISTS ck_fuel_load_mobile_ticket;